@@ -3,6 +3,9 @@
 Script: get_course_pending_reports.py
 Propósito: Obtener lista de REPORTES INDIVIDUALES pendientes de feedback para un curso/materia
 Uso: python scripts/get_course_pending_reports.py "5to A" "Física"
+     python scripts/get_course_pending_reports.py --run "5to A:Física" "4to C:Química"
+     python scripts/get_course_pending_reports.py --run --all [--max-connections 4]
+     python scripts/get_course_pending_reports.py --run --single-query [--all | "5to A:Física" ...]
 
 INTEGRACIÓN: Workflow 002 - Eslabón 1 (Selección de Scope)
 ARQUITECTURA: Propuesta B - Control + Automatización
@@ -11,12 +14,93 @@ IMPORTANTE:
 - Retorna REPORTES individuales (NO alumnos agrupados)
 - Un alumno con 5 reportes sin feedback = 5 elementos en el array
 - Cada reporte se procesa independientemente por un agente
-- Normalización de fechas crítica (DATE() en queries)
+- Normalización de fechas crítica (semana normalizada del lado de ProgressReport,
+  comparación por rango sobre Feedback.weekStart para que use el índice)
+
+MODO --run:
+- Ejecuta la query directamente contra Turso (TURSO_DATABASE_URL / TURSO_AUTH_TOKEN)
+- Acepta varios pares "curso:materia" (o --all: todos los cursos activos × Física/Química)
+- Las queries corren en paralelo (asyncio) sobre un pool acotado de conexiones
+- Emite un único JSON combinado con el mismo formato que el modo manual
+- --single-query: una sola query para todos los cursos, particionada por curso/materia
+  (índice recomendado: prisma/migrations/add_pending_reports_indexes.sql)
 """
 
+import argparse
+import asyncio
+import os
+import re
 import sys
 import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import groupby
+
+# Módulos compartidos de scripts/ (turso_http, week_keys)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from week_keys import week_key
+
+MATERIAS_VALIDAS = ["Física", "Química"]
+
+# Anti-join sargable: la clave de semana se normaliza solo del lado de
+# ProgressReport (una vez por reporte) y Feedback se compara por rango sobre la
+# columna cruda, de modo que el probe usa idx_feedback_pending_lookup
+# (studentId, subject, weekStart) en lugar de escanear DATE(f.weekStart).
+PENDING_REPORTS_BASE = """
+    SELECT
+        pr.id as progressReportId,
+        pr.userId as studentId,
+        u.name as studentName,
+        pr.subject as materia,
+        DATE(pr.weekStart) as weekStart,
+        DATE(pr.weekEnd) as weekEnd,
+        pr.submittedAt,
+        u.academicYear,
+        u.division,
+        NULL as feedback_id
+    FROM ProgressReport pr
+    INNER JOIN User u ON pr.userId = u.id
+    WHERE u.role = 'STUDENT'
+        AND u.status = 'ACTIVE'{filters}
+        AND NOT EXISTS (
+            SELECT 1 FROM Feedback f
+            WHERE f.studentId = pr.userId
+                AND f.subject = pr.subject
+                AND f.weekStart >= DATE(pr.weekStart)
+                AND f.weekStart < DATE(pr.weekStart, '+1 day')
+        )
+    ORDER BY {order_by}
+    """
+
+PENDING_REPORTS_QUERY = PENDING_REPORTS_BASE.format(
+    filters="""
+        AND u.academicYear = :academicYear
+        AND u.division = :division
+        AND pr.subject = :materia""",
+    order_by="pr.submittedAt ASC, u.name ASC"
+)
+
+# Todos los cursos activos en una sola query, ordenada por partición
+# (curso, materia) para poder agrupar el resultado en un solo recorrido. Los
+# mismos cursos que ACTIVE_COURSES_QUERY: sin año o división no hay curso
+ALL_PENDING_REPORTS_QUERY = PENDING_REPORTS_BASE.format(
+    filters="""
+        AND u.academicYear IS NOT NULL
+        AND u.division IS NOT NULL""",
+    order_by="u.academicYear ASC, u.division ASC, pr.subject ASC, pr.submittedAt ASC, u.name ASC"
+)
+
+ACTIVE_COURSES_QUERY = """
+    SELECT DISTINCT academicYear, division
+    FROM User
+    WHERE role = 'STUDENT'
+        AND status = 'ACTIVE'
+        AND academicYear IS NOT NULL
+        AND division IS NOT NULL
+    ORDER BY academicYear, division
+    """
 
 def format_curso(curso_input):
     """
@@ -38,6 +122,265 @@ def format_curso(curso_input):
 
     return academic_year, division
 
+def render_query(query, params):
+    """Reemplaza los parámetros :nombre por literales SQL (para ejecución manual vía MCP)"""
+    def literal(match):
+        value = str(params[match.group(1)]).replace("'", "''")
+        return f"'{value}'"
+
+    return re.sub(r':(\w+)', literal, query)
+
+def pending_reports_params(academic_year, division, materia):
+    """Parámetros nombrados de PENDING_REPORTS_QUERY"""
+    return {"academicYear": academic_year, "division": division, "materia": materia}
+
+def summarize_pending_reports(curso, materia, reportes, query):
+    """
+    Arma el output estructurado (mismo formato que FORMATO DE OUTPUT ESPERADO)
+
+    Args:
+        curso: Curso en formato "5to A"
+        materia: "Física" o "Química"
+        reportes: Filas de PENDING_REPORTS_QUERY como dicts
+        query: Query ejecutada (para trazabilidad)
+    """
+    reportes_pendientes = []
+    agrupacion = OrderedDict()
+
+    for index, row in enumerate(reportes):
+        reportes_pendientes.append({
+            "progressReportId": row["progressReportId"],
+            "studentId": row["studentId"],
+            "studentName": row["studentName"],
+            "materia": row["materia"],
+            "weekStart": row["weekStart"],
+            "weekEnd": row["weekEnd"],
+            "submittedAt": row["submittedAt"],
+            "tiene_feedback": False,
+            "index_en_lista": index
+        })
+
+        alumno = agrupacion.setdefault(row["studentId"], {
+            "nombre": row["studentName"],
+            "reportes_pendientes": 0,
+            "semanas": []
+        })
+        alumno["reportes_pendientes"] += 1
+        alumno["semanas"].append(row["weekStart"])
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "curso": curso,
+        "materia": materia,
+        "query_ejecutada": query.strip(),
+        "reportes_pendientes": reportes_pendientes,
+        "resumen": {
+            "total_reportes_pendientes": len(reportes_pendientes),
+            "alumnos_unicos": len(agrupacion),
+            "semanas_distintas": len({week_key(r["weekStart"]) for r in reportes_pendientes})
+        },
+        "agrupacion_por_alumno": agrupacion
+    }
+
+async def fetch_pending_reports(pairs, max_connections=4):
+    """
+    Ejecuta la query de reportes pendientes para todos los pares en paralelo
+
+    Cada query corre en un thread con su propio TursoHttpClient, tomado de un
+    pool acotado a `max_connections`; así el tiempo total es aproximadamente el
+    de un round trip por cada `max_connections` pares, no la suma de todos.
+
+    Args:
+        pairs: Lista de tuplas (curso, materia), por ejemplo ("5to A", "Física")
+        max_connections: Conexiones simultáneas a Turso
+
+    Returns:
+        Lista de outputs estructurados, en el mismo orden que `pairs`
+
+    Raises:
+        TursoError: Si falla alguna query (después de que terminen todas, para
+            no cerrar clientes que un thread todavía usa)
+    """
+    from turso_http import TursoHttpClient
+
+    loop = asyncio.get_running_loop()
+    pool_size = max(1, min(max_connections, len(pairs)))
+    clients = asyncio.Queue()
+
+    async def run_pair(executor, curso, materia):
+        academic_year, division = format_curso(curso)
+        params = pending_reports_params(academic_year, division, materia)
+
+        client = await clients.get()
+        try:
+            result = await loop.run_in_executor(
+                executor, client.execute_columnar, PENDING_REPORTS_QUERY, params
+            )
+        finally:
+            clients.put_nowait(client)
+
+        return summarize_pending_reports(
+            curso, materia, result.rows(), render_query(PENDING_REPORTS_QUERY, params)
+        )
+
+    try:
+        for _ in range(pool_size):
+            clients.put_nowait(TursoHttpClient())
+
+        # return_exceptions: gather espera a todas las queries, así cada cliente
+        # volvió a la cola antes de cerrarlos
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            resultados = await asyncio.gather(*(
+                run_pair(executor, curso, materia) for curso, materia in pairs
+            ), return_exceptions=True)
+    finally:
+        while not clients.empty():
+            clients.get_nowait().close()
+
+    for resultado in resultados:
+        if isinstance(resultado, Exception):
+            raise resultado
+
+    return resultados
+
+def course_label(academic_year, division):
+    """Inverso de format_curso: ("5to Año", "A") → 5to A"""
+    return f"{academic_year.replace(' Año', '')} {division}"
+
+def active_course_pairs(rows):
+    """Filas de ACTIVE_COURSES_QUERY → pares (curso, materia) para Física/Química"""
+    pairs = []
+    for academic_year, division in rows:
+        curso = course_label(academic_year, division)
+        for materia in MATERIAS_VALIDAS:
+            pairs.append((curso, materia))
+    return pairs
+
+def get_active_course_pairs():
+    """Todos los cursos con alumnos activos × Física/Química"""
+    from turso_http import TursoHttpClient
+
+    with TursoHttpClient() as client:
+        return active_course_pairs(client.execute(ACTIVE_COURSES_QUERY))
+
+def fetch_all_pending_reports(pairs=None):
+    """
+    Reportes pendientes de todos los cursos activos con una sola query
+
+    La lista de cursos activos y los reportes pendientes viajan en el mismo
+    batch (un único round trip). El resultado viene ordenado por
+    (curso, materia), así que se particiona con groupby sin reordenar.
+
+    Args:
+        pairs: Pares (curso, materia) a incluir; None = todos los cursos activos
+
+    Returns:
+        Lista de outputs estructurados, uno por par (incluidos los que no
+        tienen pendientes), en el orden de `pairs` o de los cursos activos
+    """
+    from turso_http import TursoHttpClient
+
+    with TursoHttpClient() as client:
+        courses, pending = client.batch([ACTIVE_COURSES_QUERY, ALL_PENDING_REPORTS_QUERY])
+
+    for result in (courses, pending):
+        if not result.ok:
+            raise RuntimeError(f"Error en query de reportes pendientes: {result.error}")
+
+    if pairs is None:
+        pairs = active_course_pairs(courses.rows)
+
+    def partition_key(row):
+        return course_label(row["academicYear"], row["division"]), row["materia"]
+
+    rows = (dict(zip(pending.columns, row)) for row in pending.rows)
+    partitions = {pair: list(group) for pair, group in groupby(rows, key=partition_key)}
+
+    query = ALL_PENDING_REPORTS_QUERY.strip()
+    return [
+        summarize_pending_reports(curso, materia, partitions.get((curso, materia), []), query)
+        for curso, materia in pairs
+    ]
+
+def parse_pair(value):
+    """Convierte "5to A:Física" en ("5to A", "Física")"""
+    if ':' not in value:
+        raise ValueError(f"Par inválido: '{value}'. Use formato: '5to A:Física'")
+
+    curso, materia = (part.strip() for part in value.split(':', 1))
+    format_curso(curso)
+    if materia not in MATERIAS_VALIDAS:
+        raise ValueError(f"Materia inválida '{materia}'. Materias válidas: {', '.join(MATERIAS_VALIDAS)}")
+    return curso, materia
+
+def main_run(argv):
+    """Modo --run: ejecuta la query para varios cursos/materias y emite el JSON combinado"""
+    parser = argparse.ArgumentParser(
+        prog="get_course_pending_reports.py --run",
+        description="Reportes pendientes de feedback para varios cursos/materias en paralelo"
+    )
+    parser.add_argument('pairs', nargs='*', help='Pares "curso:materia", por ejemplo "5to A:Física"')
+    parser.add_argument('--all', action='store_true',
+                        help='Todos los cursos con alumnos activos × Física/Química')
+    parser.add_argument('--max-connections', type=int, default=4,
+                        help='Conexiones simultáneas a Turso (default: 4)')
+    parser.add_argument('--single-query', action='store_true',
+                        help='Una sola query para todos los cursos, particionada por curso/materia')
+    parser.add_argument('--output', help='Archivo donde guardar el JSON (default: stdout)')
+    args = parser.parse_args(argv)
+
+    if args.max_connections < 1:
+        parser.error("--max-connections debe ser mayor que 0")
+
+    try:
+        pairs = [parse_pair(value) for value in args.pairs]
+    except ValueError as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        return 1
+
+    if not args.single_query and not args.all and not pairs:
+        parser.error('Indique al menos un par "curso:materia" o use --all')
+
+    try:
+        from turso_http import TursoError
+    except ImportError:
+        print("❌ Error: requests no está instalado (pip install requests)", file=sys.stderr)
+        return 1
+
+    # Crear los clientes (ValueError sin credenciales) y consultar, con un único manejo de errores
+    try:
+        if args.single_query:
+            pairs = None if args.all or not pairs else pairs
+            print("🔍 Ejecutando query única para todos los cursos activos...", file=sys.stderr)
+            resultados = fetch_all_pending_reports(pairs)
+        else:
+            if args.all:
+                pairs += [pair for pair in get_active_course_pairs() if pair not in pairs]
+
+            print(f"🔍 Ejecutando {len(pairs)} consultas con hasta {args.max_connections} conexiones...",
+                  file=sys.stderr)
+            resultados = asyncio.run(fetch_pending_reports(pairs, args.max_connections))
+    except (ValueError, RuntimeError, TursoError) as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        return 1
+
+    output = {
+        "timestamp": datetime.now().isoformat(),
+        "total_consultas": len(resultados),
+        "total_reportes_pendientes": sum(r["resumen"]["total_reportes_pendientes"] for r in resultados),
+        "resultados": resultados
+    }
+
+    output_json = json.dumps(output, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output_json)
+        print(f"💾 JSON guardado en: {args.output}", file=sys.stderr)
+    else:
+        print(output_json)
+
+    return 0
+
 def print_header(title, width=80):
     """Imprime encabezado formateado"""
     print("\n" + "=" * width)
@@ -49,12 +392,18 @@ def print_section(title):
     print(f"\n┌─ {title} " + "─" * (78 - len(title)))
 
 def main():
+    # Modo de ejecución directa contra Turso
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        return main_run(sys.argv[2:])
+
     # Verificar argumentos
     if len(sys.argv) < 3:
         print("❌ Error: Faltan argumentos")
         print("\nUso:")
         print('  python scripts/get_course_pending_reports.py "5to A" "Física"')
         print('  python scripts/get_course_pending_reports.py "4to C" "Química"')
+        print('  python scripts/get_course_pending_reports.py --run "5to A:Física" "4to C:Química"')
+        print('  python scripts/get_course_pending_reports.py --run --all')
         print("\nEjemplos:")
         print('  python scripts/get_course_pending_reports.py "5to A" "Física"')
         sys.exit(1)
@@ -63,7 +412,7 @@ def main():
     materia = sys.argv[2]
 
     # Validar materia
-    if materia not in ["Física", "Química"]:
+    if materia not in MATERIAS_VALIDAS:
         print(f"❌ Error: Materia inválida '{materia}'")
         print("   Materias válidas: Física, Química")
         sys.exit(1)
@@ -87,31 +436,7 @@ def main():
 
     print_section("📊 EJECUTANDO QUERY OPTIMIZADA")
 
-    query = f"""
-    SELECT
-        pr.id as progressReportId,
-        pr.userId as studentId,
-        u.name as studentName,
-        pr.subject as materia,
-        DATE(pr.weekStart) as weekStart,
-        DATE(pr.weekEnd) as weekEnd,
-        pr.submittedAt,
-        u.academicYear,
-        u.division,
-        f.id as feedback_id
-    FROM ProgressReport pr
-    INNER JOIN User u ON pr.userId = u.id
-    LEFT JOIN Feedback f ON pr.userId = f.studentId
-        AND DATE(pr.weekStart) = DATE(f.weekStart)
-        AND pr.subject = f.subject
-    WHERE u.role = 'STUDENT'
-        AND u.status = 'ACTIVE'
-        AND u.academicYear = '{academic_year}'
-        AND u.division = '{division}'
-        AND pr.subject = '{materia}'
-        AND f.id IS NULL
-    ORDER BY pr.submittedAt ASC, u.name ASC
-    """
+    query = render_query(PENDING_REPORTS_QUERY, pending_reports_params(academic_year, division, materia))
 
     print("\n🔍 Query SQL:")
     print("─" * 80)
@@ -0,0 +1,6 @@
+-- Index for the keyset-paginated feedback export (scripts/fetch-and-export-feedbacks-2025.py)
+-- Each page seeks to (studentId, subject, weekStart, id) > last row and reads the
+-- next rows in index order: no temp B-tree sort and no OFFSET scan per page.
+-- Parallel partitions split on studentId (the leading column), so each one reads a
+-- disjoint slice of the index.
+CREATE INDEX IF NOT EXISTS idx_feedback_export_keyset ON Feedback(studentId, subject, weekStart, id);
@@ -0,0 +1,8 @@
+-- Indexes for the weekly pending-reports scan (AI_integrations_haiku/get_course_pending_reports.py)
+-- Covering index for the Feedback anti-join: equality on (studentId, subject),
+-- range on weekStart. The probe is answered from the index without touching the table.
+CREATE INDEX IF NOT EXISTS idx_feedback_pending_lookup ON Feedback(studentId, subject, weekStart);
+
+-- Covering index for the ProgressReport side: reports are read per student and
+-- subject with every selected column available in the index.
+CREATE INDEX IF NOT EXISTS idx_progressreport_pending_scan ON ProgressReport(userId, subject, weekStart, weekEnd, submittedAt, id);
@@ -9,37 +9,333 @@ Este script:
 4. Genera un reporte detallado de los problemas encontrados
 
 Uso:
-    python check_feedback_json.py [--fix]
+    python check_feedback_json.py [--fix] [--batch-size N] [--page-size N] [--workers N]
+                                  [--since-last-run] [--state-file PATH] [--driver {cli,http}]
 
 Opciones:
-    --fix    Corregir automáticamente los registros con doble escape
+    --fix         Corregir automáticamente los registros con doble escape
+    --batch-size  Correcciones por transacción al usar --fix (default: 100)
+    --page-size   Feedbacks leídos por página (keyset pagination, default: 500)
+    --workers     Procesos que validan el JSON en paralelo (default: 1)
+    --since-last-run
+                  Verificar solo los feedbacks nuevos o modificados desde la
+                  última ejecución (marca updatedAt/id + digest de skillsMetrics).
+                  Sale con código 1 si quedan problemas abiertos (uso en cron).
+    --state-file  Archivo donde se guarda la marca de agua (solo con --since-last-run)
+                  (default: scripts/.feedback_check_state.json)
+    --driver      Forma de conectarse a Turso:
+                    http  Una sola conexión HTTP persistente (requiere
+                          TURSO_DATABASE_URL y TURSO_AUTH_TOKEN)
+                    cli   Un proceso `turso db shell` por query (modo anterior)
+                  Por defecto se usa http si las variables de entorno están
+                  configuradas.
 """
 
+import argparse
+import copy
+import hashlib
+import os
+import re
 import subprocess
 import json
 import sys
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Dict, Any, Optional
+
+from week_keys import week_key, week_label
+
+try:
+    from turso_http import TursoHttpClient
+except ImportError:
+    # Sin `requests` solo está disponible el driver cli
+    TursoHttpClient = None
+
+
+TURSO_DATABASE_URL = os.environ.get("TURSO_DATABASE_URL")
+TURSO_AUTH_TOKEN = os.environ.get("TURSO_AUTH_TOKEN")
+
+
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.feedback_check_state.json')
+
+
+def skills_digest(skills_metrics: Any) -> str:
+    """Digest corto del contenido de skillsMetrics"""
+    return hashlib.sha1(str(skills_metrics).encode('utf-8')).hexdigest()[:16]
+
+
+def load_state(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Carga el estado de la última verificación
+
+    Returns:
+        Dict con watermark, digests y openProblems, o None si no existe
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️  No se pudo leer el estado {path}: {e}")
+        return None
+
+
+def save_state(path: str, state: Dict[str, Any]):
+    """Guarda el estado de forma atómica (archivo temporal + rename)"""
+    state['lastRun'] = datetime.now().isoformat()
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False)
+
+    os.replace(tmp_path, path)
+
+
+class FeedbackQueryError(Exception):
+    """Falla de una query durante el recorrido (el scan no se puede dar por completo)"""
+
+
+REQUIRED_SKILL_KEYS = ['comprehension', 'criticalThinking', 'selfRegulation',
+                       'practicalApplication', 'metacognition']
+
+
+def check_feedback(feedback: List[Any]) -> Optional[Dict[str, Any]]:
+    """
+    Verifica un feedback individual
+
+    Es una función de módulo (y no un método) para que pueda ejecutarse en los
+    procesos del pool de validación.
+
+    Args:
+        feedback: Lista con datos del feedback [id, studentId, subject, weekStart, skillsMetrics]
+
+    Returns:
+        Dict con detalles del problema o None si está OK
+    """
+    feedback_id = feedback[0]
+    student_id = feedback[1]
+    subject = feedback[2]
+    week_start = feedback[3]
+    skills_metrics = feedback[4] if len(feedback) > 4 else ""
+
+    # 1. Detectar doble escape
+    if has_double_escape(skills_metrics):
+        return {
+            'id': feedback_id,
+            'studentId': student_id,
+            'subject': subject,
+            'weekStart': week_start,
+            'type': 'double_escaped',
+            'raw': skills_metrics,
+            'description': 'JSON con doble escape (\\\\\")',
+            'fixable': True
+        }
+
+    # 2. Intentar parsear JSON
+    try:
+        data = json.loads(skills_metrics)
+    except json.JSONDecodeError as e:
+        return {
+            'id': feedback_id,
+            'studentId': student_id,
+            'subject': subject,
+            'weekStart': week_start,
+            'type': 'invalid_json',
+            'raw': skills_metrics[:100] + '...' if len(skills_metrics) > 100 else skills_metrics,
+            'description': f'JSON inválido: {str(e)}',
+            'fixable': False
+        }
+
+    # 3. Verificar que tenga las keys esperadas
+    missing_keys = [key for key in REQUIRED_SKILL_KEYS if key not in data]
+
+    if missing_keys:
+        return {
+            'id': feedback_id,
+            'studentId': student_id,
+            'subject': subject,
+            'weekStart': week_start,
+            'type': 'missing_keys',
+            'raw': skills_metrics,
+            'description': f'Faltan keys: {", ".join(missing_keys)}',
+            'missingKeys': missing_keys,
+            'fixable': False
+        }
+
+    # 4. Verificar que los valores sean numéricos
+    for key in REQUIRED_SKILL_KEYS:
+        if not isinstance(data[key], (int, float)):
+            return {
+                'id': feedback_id,
+                'studentId': student_id,
+                'subject': subject,
+                'weekStart': week_start,
+                'type': 'invalid_values',
+                'raw': skills_metrics,
+                'description': f'Valor no numérico en {key}: {data[key]}',
+                'fixable': False
+            }
+
+    return None
+
+def format_week(week_start: Any) -> str:
+    """Semana canónica (lunes, hora Argentina) para mostrar en el reporte"""
+    try:
+        return week_label(week_key(week_start)) or str(week_start)
+    except ValueError:
+        return str(week_start)
+
+
+def has_double_escape(json_str: str) -> bool:
+    """
+    Detecta si el JSON tiene doble escape
+
+    Args:
+        json_str: String JSON a verificar
+
+    Returns:
+        True si tiene doble escape
+    """
+    # Patrón para detectar doble escape: \\\"
+    return r'\\\"' in json_str or '\\\\\"' in json_str or '\\\\"' in json_str
 
 
 class FeedbackChecker:
     """Clase para verificar y corregir JSON en feedbacks"""
 
-    def __init__(self, db_name: str = "intellego-production"):
+    FIX_QUERY = """
+        UPDATE Feedback
+        SET skillsMetrics = ?,
+            updatedAt = strftime('%Y-%m-%dT%H:%M:%fZ', 'now')
+        WHERE id = ?
+    """
+
+    def __init__(
+        self,
+        db_name: str = "intellego-production",
+        driver: str = "cli",
+        db_url: Optional[str] = None,
+        auth_token: Optional[str] = None
+    ):
         """
         Inicializa el checker con el nombre de la base de datos
 
         Args:
-            db_name: Nombre de la base de datos Turso
+            db_name: Nombre de la base de datos Turso (driver cli)
+            driver: 'cli' (turso db shell) o 'http' (conexión persistente)
+            db_url: URL de la base de datos (driver http)
+            auth_token: Token de autenticación (driver http)
         """
         self.db_name = db_name
+        self.driver = driver
+        self.connection = None
         self.problems_found = []
 
-    def _execute_query(self, query: str) -> List[List[Any]]:
+        if driver == "http":
+            if not db_url or not auth_token:
+                raise ValueError("El driver http requiere TURSO_DATABASE_URL y TURSO_AUTH_TOKEN")
+            if TursoHttpClient is None:
+                raise RuntimeError("requests no está instalado (pip install requests)")
+            self.connection = TursoHttpClient(db_url, auth_token)
+
+    def close(self):
+        """Libera la conexión persistente (si existe)"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    @staticmethod
+    def _sql_literal(value: Any) -> str:
+        """Convierte un valor en un literal SQL (solo para el driver cli)"""
+        if value is None:
+            return "NULL"
+        if isinstance(value, (bool, int, float)):
+            return str(int(value)) if isinstance(value, bool) else str(value)
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def _execute_query(
+        self,
+        query: str,
+        params: Optional[List[Any]] = None,
+        strict: bool = False
+    ) -> List[List[Any]]:
+        """
+        Ejecuta una query SQL con el driver configurado
+
+        Args:
+            query: Query SQL a ejecutar (con placeholders `?`)
+            params: Valores para los placeholders
+            strict: Lanzar FeedbackQueryError ante un error en lugar de
+                devolver [] (un [] del recorrido significa fin de la tabla)
+
+        Returns:
+            Lista de filas con los resultados
+
+        Raises:
+            FeedbackQueryError: Si la query falla y `strict` es True
+        """
+        if self.connection:
+            try:
+                return self.connection.execute(query, params)
+            except Exception as e:
+                print(f"❌ Error ejecutando query: {e}")
+                if strict:
+                    raise FeedbackQueryError(str(e)) from e
+                return []
+
+        return self._execute_cli_query(self._inline_params(query, params), strict)
+
+    def _inline_params(self, query: str, params: Optional[List[Any]]) -> str:
+        """Inserta los parámetros como literales (turso db shell no soporta `?`)"""
+        if not params:
+            return query
+        values = iter(params)
+        return re.sub(r'\?', lambda _: self._sql_literal(next(values)), query)
+
+    def _execute_transaction(self, statements: List[tuple]) -> bool:
+        """
+        Ejecuta varios statements dentro de una única transacción
+
+        Args:
+            statements: Lista de tuplas (query, params)
+
+        Returns:
+            True si la transacción se confirmó
+        """
+        if self.connection:
+            try:
+                return self.connection.transaction(statements)
+            except Exception as e:
+                print(f"❌ Error ejecutando transacción: {e}")
+                return False
+
+        # Driver cli: un único `turso db shell` con BEGIN ... COMMIT
+        script = ";\n".join(
+            ["BEGIN"]
+            + [self._inline_params(query.strip(), params) for query, params in statements]
+            + ["COMMIT;"]
+        )
+        try:
+            subprocess.run(
+                ['turso', 'db', 'shell', self.db_name, script],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+            return True
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Error ejecutando transacción: {e.stderr}")
+            return False
+
+    def _execute_cli_query(self, query: str, strict: bool = False) -> List[List[Any]]:
         """
         Ejecuta una query SQL usando Turso CLI
 
         Args:
             query: Query SQL a ejecutar
+            strict: Lanzar FeedbackQueryError ante un error en lugar de devolver []
 
         Returns:
             Lista de filas con los resultados
@@ -69,7 +365,6 @@ class FeedbackChecker:
 
             # Encontrar las posiciones de cada columna basándose en los headers
             # Los headers están separados por múltiples espacios
-            import re
             # Dividir por múltiples espacios
             headers = [h.strip() for h in re.split(r'\s{2,}', headers_line) if h.strip()]
 
@@ -102,191 +397,320 @@ class FeedbackChecker:
 
         except subprocess.CalledProcessError as e:
             print(f"❌ Error ejecutando query: {e.stderr}")
+            if strict:
+                raise FeedbackQueryError(e.stderr or str(e)) from e
             return []
         except Exception as e:
             print(f"❌ Error inesperado: {e}")
+            if strict:
+                raise FeedbackQueryError(str(e)) from e
             return []
 
-    def check_all_feedbacks(self) -> Dict[str, Any]:
+    def iter_feedback_pages(
+        self,
+        page_size: int = 500,
+        since: Optional[tuple] = None
+    ) -> Iterator[List[List[Any]]]:
         """
-        Recorre todos los feedbacks y detecta problemas de JSON
+        Recorre la tabla Feedback por páginas usando keyset pagination
 
-        Returns:
-            Dict con estadísticas y lista de problemas encontrados
-        """
-        print("🔍 Iniciando verificación de feedbacks...")
+        Cada página continúa desde la última clave vista, por lo que el costo de
+        cada query no crece con el número de página y nunca se tiene más de una
+        página en memoria.
 
-        # Obtener todos los feedbacks con skillsMetrics
-        query = """
-            SELECT id, studentId, subject, weekStart, skillsMetrics
-            FROM Feedback
-            WHERE skillsMetrics IS NOT NULL
-            ORDER BY createdAt DESC;
+        - Sin `since`: toda la tabla, por (createdAt, id) descendente.
+        - Con `since`: solo los feedbacks modificados después de la marca
+          (updatedAt, id), por (updatedAt, id) ascendente.
+
+        Args:
+            page_size: Cantidad de filas por página
+            since: Marca (updatedAt, id) desde la cual continuar
+
+        Yields:
+            Listas de filas [createdAt|updatedAt, id, studentId, subject, weekStart, skillsMetrics]
+
+        Raises:
+            FeedbackQueryError: Si falla la lectura de una página (un error
+                nunca se confunde con el final de la tabla)
         """
+        if since is None:
+            first_page_query = """
+                SELECT createdAt, id, studentId, subject, weekStart, skillsMetrics
+                FROM Feedback
+                WHERE skillsMetrics IS NOT NULL
+                ORDER BY createdAt DESC, id DESC
+                LIMIT ?
+            """
 
-        feedbacks = self._execute_query(query)
+            next_page_query = """
+                SELECT createdAt, id, studentId, subject, weekStart, skillsMetrics
+                FROM Feedback
+                WHERE skillsMetrics IS NOT NULL
+                  AND (createdAt < ? OR (createdAt = ? AND id < ?))
+                ORDER BY createdAt DESC, id DESC
+                LIMIT ?
+            """
+            cursor = None
+        else:
+            first_page_query = None
+
+            next_page_query = """
+                SELECT updatedAt, id, studentId, subject, weekStart, skillsMetrics
+                FROM Feedback
+                WHERE skillsMetrics IS NOT NULL
+                  AND (updatedAt > ? OR (updatedAt = ? AND id > ?))
+                ORDER BY updatedAt ASC, id ASC
+                LIMIT ?
+            """
+            cursor = tuple(since)
 
-        print(f"📊 Total de feedbacks con skillsMetrics: {len(feedbacks)}")
+        while True:
+            if cursor is None:
+                page = self._execute_query(first_page_query, [page_size], strict=True)
+            else:
+                sort_value, feedback_id = cursor
+                page = self._execute_query(
+                    next_page_query, [sort_value, sort_value, feedback_id, page_size], strict=True
+                )
 
-        stats = {
-            'total': len(feedbacks),
-            'valid': 0,
-            'double_escaped': 0,
-            'invalid_json': 0,
-            'missing_keys': 0,
-            'problems': []
-        }
+            page = [row for row in page if len(row) >= 6]
 
-        for feedback in feedbacks:
-            if len(feedback) < 5:
-                continue
+            if not page:
+                return
 
-            problem = self._check_feedback(feedback)
+            yield page
 
-            if problem:
-                stats['problems'].append(problem)
+            if len(page) < page_size:
+                return
 
-                # Categorizar el problema
-                if problem['type'] == 'double_escaped':
-                    stats['double_escaped'] += 1
-                elif problem['type'] == 'invalid_json':
-                    stats['invalid_json'] += 1
-                elif problem['type'] == 'missing_keys':
-                    stats['missing_keys'] += 1
-            else:
-                stats['valid'] += 1
+            cursor = (page[-1][0], page[-1][1])
 
-        return stats
+    def get_watermark(self) -> Optional[tuple]:
+        """
+        Obtiene la marca (updatedAt, id) del último feedback modificado
 
-    def _check_feedback(self, feedback: List[str]) -> Optional[Dict[str, Any]]:
+        Returns:
+            Tupla (updatedAt, id) o None si la tabla está vacía
+
+        Raises:
+            FeedbackQueryError: Si la query falla
         """
-        Verifica un feedback individual
+        rows = self._execute_query("""
+            SELECT updatedAt, id
+            FROM Feedback
+            WHERE skillsMetrics IS NOT NULL
+            ORDER BY updatedAt DESC, id DESC
+            LIMIT 1
+        """, strict=True)
+
+        if not rows or len(rows[0]) < 2:
+            return None
+
+        return (rows[0][0], rows[0][1])
+
+    def _skip_unchanged(
+        self,
+        pages: Iterator[List[List[Any]]],
+        state: Dict[str, Any],
+        stats: Dict[str, Any],
+        incremental: bool
+    ) -> Iterator[List[List[Any]]]:
+        """
+        Filtra las filas cuyo skillsMetrics no cambió desde la última verificación
+
+        Compara el digest de cada fila con el guardado en el estado y lo
+        actualiza. En modo incremental además avanza la marca de agua.
 
         Args:
-            feedback: Lista con datos del feedback [id, studentId, subject, weekStart, skillsMetrics]
+            pages: Stream de páginas de filas
+            state: Estado persistido (se modifica in-place)
+            stats: Estadísticas de la verificación en curso
+            incremental: True si las páginas vienen ordenadas por (updatedAt, id)
 
-        Returns:
-            Dict con detalles del problema o None si está OK
+        Yields:
+            Páginas con solo las filas nuevas o modificadas
         """
-        feedback_id = feedback[0]
-        student_id = feedback[1]
-        subject = feedback[2]
-        week_start = feedback[3]
-        skills_metrics = feedback[4] if len(feedback) > 4 else ""
-
-        # 1. Detectar doble escape
-        if self._has_double_escape(skills_metrics):
-            return {
-                'id': feedback_id,
-                'studentId': student_id,
-                'subject': subject,
-                'weekStart': week_start,
-                'type': 'double_escaped',
-                'raw': skills_metrics,
-                'description': 'JSON con doble escape (\\\\\")',
-                'fixable': True
-            }
+        digests = state['digests']
 
-        # 2. Intentar parsear JSON
-        try:
-            data = json.loads(skills_metrics)
-        except json.JSONDecodeError as e:
-            return {
-                'id': feedback_id,
-                'studentId': student_id,
-                'subject': subject,
-                'weekStart': week_start,
-                'type': 'invalid_json',
-                'raw': skills_metrics[:100] + '...' if len(skills_metrics) > 100 else skills_metrics,
-                'description': f'JSON inválido: {str(e)}',
-                'fixable': False
-            }
+        for page in pages:
+            changed = []
 
-        # 3. Verificar que tenga las keys esperadas
-        required_keys = ['comprehension', 'criticalThinking', 'selfRegulation',
-                        'practicalApplication', 'metacognition']
+            for row in page:
+                digest = skills_digest(row[5])
 
-        missing_keys = [key for key in required_keys if key not in data]
+                if digests.get(row[1]) == digest:
+                    stats['unchanged'] += 1
+                else:
+                    digests[row[1]] = digest
+                    changed.append(row)
 
-        if missing_keys:
-            return {
-                'id': feedback_id,
-                'studentId': student_id,
-                'subject': subject,
-                'weekStart': week_start,
-                'type': 'missing_keys',
-                'raw': skills_metrics,
-                'description': f'Faltan keys: {", ".join(missing_keys)}',
-                'missingKeys': missing_keys,
-                'fixable': False
-            }
+            if incremental:
+                state['watermark'] = [page[-1][0], page[-1][1]]
 
-        # 4. Verificar que los valores sean numéricos
-        for key in required_keys:
-            if not isinstance(data[key], (int, float)):
-                return {
-                    'id': feedback_id,
-                    'studentId': student_id,
-                    'subject': subject,
-                    'weekStart': week_start,
-                    'type': 'invalid_values',
-                    'raw': skills_metrics,
-                    'description': f'Valor no numérico en {key}: {data[key]}',
-                    'fixable': False
-                }
+            yield changed
 
-        return None
+    def _validate_pages(
+        self,
+        pages: Iterator[List[List[Any]]],
+        workers: int = 1
+    ) -> Iterator[tuple]:
+        """
+        Valida cada página del stream, opcionalmente en un pool de procesos
+
+        Con workers > 1 cada página se reparte entre los procesos del pool y,
+        mientras se valida, se descarga la página siguiente. Los resultados se
+        devuelven en el mismo orden de las filas.
 
-    def _has_double_escape(self, json_str: str) -> bool:
+        Args:
+            pages: Stream de páginas de filas
+            workers: Cantidad de procesos de validación (1 = en el proceso actual)
+
+        Yields:
+            Tuplas (página, lista de resultados de check_feedback por fila)
+        """
+        if workers <= 1:
+            for page in pages:
+                # La primera columna (createdAt) solo se usa para paginar
+                yield page, [check_feedback(row[1:]) for row in page]
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = None
+
+            for page in pages:
+                # La primera columna (createdAt) solo se usa para paginar
+                chunksize = max(1, len(page) // (workers * 4))
+                results = executor.map(check_feedback, [row[1:] for row in page], chunksize=chunksize)
+
+                if pending is not None:
+                    yield pending[0], list(pending[1])
+
+                pending = (page, results)
+
+            if pending is not None:
+                yield pending[0], list(pending[1])
+
+    def check_all_feedbacks(
+        self,
+        page_size: int = 500,
+        workers: int = 1,
+        state: Optional[Dict[str, Any]] = None,
+        since_last_run: bool = False
+    ) -> Dict[str, Any]:
         """
-        Detecta si el JSON tiene doble escape
+        Recorre todos los feedbacks y detecta problemas de JSON
+
+        Los feedbacks se leen página por página y solo se conservan los que
+        tienen problemas, que se informan apenas aparecen.
+
+        Si se pasa `state`, se actualiza in-place con la marca de agua, los
+        digests de lo validado y los problemas abiertos, pero solo cuando el
+        recorrido termina completo: si una query falla, `state` queda como
+        estaba. Con `since_last_run` solo se revisan los feedbacks modificados
+        después de la marca guardada y cuyo skillsMetrics realmente cambió.
 
         Args:
-            json_str: String JSON a verificar
+            page_size: Cantidad de feedbacks por página
+            workers: Procesos de validación en paralelo (1 = sin pool)
+            state: Estado persistido entre ejecuciones (ver load_state)
+            since_last_run: Verificar solo lo nuevo desde la última ejecución
 
         Returns:
-            True si tiene doble escape
+            Dict con estadísticas y lista de problemas encontrados
+
+        Raises:
+            FeedbackQueryError: Si falla una query durante el recorrido
         """
-        # Patrón para detectar doble escape: \\\"
-        return r'\\\"' in json_str or '\\\\\"' in json_str or '\\\\"' in json_str
+        print("🔍 Iniciando verificación de feedbacks...")
 
-    def fix_double_escaped(self, feedback_id: str, skills_metrics: str) -> bool:
+        stats = {
+            'total': 0,
+            'valid': 0,
+            'unchanged': 0,
+            'double_escaped': 0,
+            'invalid_json': 0,
+            'missing_keys': 0,
+            'problems': []
+        }
+
+        # El recorrido trabaja sobre una copia; se vuelca en `state` al terminar
+        scan_state = copy.deepcopy(state) if state is not None else None
+
+        if scan_state is not None and not since_last_run:
+            # Verificación completa: se reinicia el estado. La marca se toma
+            # antes de recorrer, así lo modificado durante el scan se revisa
+            # en la próxima ejecución incremental.
+            watermark = self.get_watermark()
+            scan_state['watermark'] = list(watermark) if watermark else None
+            scan_state['digests'] = {}
+            scan_state['openProblems'] = {}
+
+        since = None
+        if since_last_run and scan_state and scan_state.get('watermark'):
+            since = tuple(scan_state['watermark'])
+            print(f"⏱️  Revisando cambios desde updatedAt={since[0]} (id={since[1]})")
+
+        pages = self.iter_feedback_pages(page_size, since)
+        if scan_state is not None:
+            pages = self._skip_unchanged(pages, scan_state, stats, since is not None)
+
+        for page_number, (page, results) in enumerate(self._validate_pages(pages, workers), 1):
+            for row, problem in zip(page, results):
+                stats['total'] += 1
+
+                if scan_state is not None:
+                    if problem:
+                        scan_state['openProblems'][row[1]] = problem['type']
+                    else:
+                        scan_state['openProblems'].pop(row[1], None)
+
+                if problem:
+                    stats['problems'].append(problem)
+                    print(f"   ⚠️  {problem['id']}: {problem['type']}")
+
+                    # Categorizar el problema
+                    if problem['type'] == 'double_escaped':
+                        stats['double_escaped'] += 1
+                    elif problem['type'] == 'invalid_json':
+                        stats['invalid_json'] += 1
+                    elif problem['type'] == 'missing_keys':
+                        stats['missing_keys'] += 1
+                else:
+                    stats['valid'] += 1
+
+            print(f"📄 Página {page_number}: {stats['total']} feedbacks revisados, "
+                  f"{len(stats['problems'])} con problemas")
+
+        # Recorrido completo: recién ahora avanza la marca de agua
+        if state is not None:
+            state.clear()
+            state.update(scan_state)
+
+        print(f"📊 Total de feedbacks con skillsMetrics revisados: {stats['total']}")
+        if stats['unchanged']:
+            print(f"⏭️  Omitidos sin cambios en skillsMetrics: {stats['unchanged']}")
+
+        return stats
+
+    def _repair_double_escape(self, skills_metrics: str) -> str:
         """
-        Corrige un feedback con doble escape
+        Remueve el doble escape de un JSON
 
         Args:
-            feedback_id: ID del feedback
             skills_metrics: JSON con doble escape
 
         Returns:
-            True si se corrigió exitosamente
+            JSON corregido
+
+        Raises:
+            json.JSONDecodeError: Si el JSON corregido sigue siendo inválido
         """
-        try:
-            # Remover el doble escape
-            fixed_json = skills_metrics.replace('\\\"', '"').replace('\\\\\\"', '\\"')
-
-            # Verificar que el JSON sea válido
-            data = json.loads(fixed_json)
-
-            # Escapar comillas para SQL
-            fixed_json_escaped = fixed_json.replace("'", "''")
-            feedback_id_escaped = feedback_id.replace("'", "''")
-
-            # Actualizar en la base de datos
-            query = f"""
-                UPDATE Feedback
-                SET skillsMetrics = '{fixed_json_escaped}',
-                    updatedAt = datetime('now')
-                WHERE id = '{feedback_id_escaped}';
-            """
+        fixed_json = skills_metrics.replace('\\\"', '"').replace('\\\\\\"', '\\"')
 
-            self._execute_query(query)
+        # Verificar que el JSON sea válido
+        json.loads(fixed_json)
 
-            return True
-
-        except Exception as e:
-            print(f"❌ Error corrigiendo {feedback_id}: {e}")
-            return False
+        return fixed_json
 
     def print_report(self, stats: Dict[str, Any]):
         """
@@ -299,6 +723,11 @@ class FeedbackChecker:
         print("📋 REPORTE DE VERIFICACIÓN DE FEEDBACKS")
         print("="*70)
 
+        if not stats['total']:
+            print("\n⚠️  No se encontraron feedbacks con skillsMetrics para verificar")
+            print("\n" + "="*70)
+            return
+
         print(f"\n📊 Estadísticas Generales:")
         print(f"   Total de feedbacks:        {stats['total']}")
         print(f"   ✅ Feedbacks válidos:      {stats['valid']} ({stats['valid']/stats['total']*100:.1f}%)")
@@ -317,7 +746,7 @@ class FeedbackChecker:
                 print(f"\n{i}. ID: {problem['id']}")
                 print(f"   Estudiante: {problem['studentId']}")
                 print(f"   Materia: {problem['subject']}")
-                print(f"   Semana: {problem['weekStart']}")
+                print(f"   Semana: {format_week(problem['weekStart'])}")
                 print(f"   Tipo: {problem['type']}")
                 print(f"   Descripción: {problem['description']}")
                 print(f"   Corregible: {'✅ Sí' if problem.get('fixable') else '❌ No'}")
@@ -329,12 +758,20 @@ class FeedbackChecker:
 
         print("\n" + "="*70)
 
-    def fix_all_double_escaped(self, problems: List[Dict[str, Any]]) -> Dict[str, int]:
+    def fix_all_double_escaped(
+        self,
+        problems: List[Dict[str, Any]],
+        batch_size: int = 100
+    ) -> Dict[str, int]:
         """
-        Corrige todos los feedbacks con doble escape
+        Corrige todos los feedbacks con doble escape en lotes transaccionales
+
+        Cada lote se envía como una única transacción (un round trip con el
+        driver http): o se aplican todas sus correcciones o ninguna.
 
         Args:
             problems: Lista de problemas encontrados
+            batch_size: Cantidad de UPDATEs por transacción
 
         Returns:
             Dict con contadores de éxitos y fallos
@@ -350,14 +787,30 @@ class FeedbackChecker:
         success = 0
         failed = 0
 
+        # Calcular las correcciones antes de tocar la base de datos
+        repairs = []
         for problem in double_escaped:
-            if self.fix_double_escaped(problem['id'], problem['raw']):
-                print(f"   ✅ Corregido: {problem['id']}")
-                success += 1
-            else:
-                print(f"   ❌ Falló: {problem['id']}")
+            try:
+                repairs.append((problem['id'], self._repair_double_escape(problem['raw'])))
+            except json.JSONDecodeError as e:
+                print(f"   ❌ No se puede corregir {problem['id']}: {e}")
                 failed += 1
 
+        total_batches = (len(repairs) + batch_size - 1) // batch_size
+
+        for batch_number, start in enumerate(range(0, len(repairs), batch_size), 1):
+            batch = repairs[start:start + batch_size]
+            statements = [(self.FIX_QUERY, [fixed_json, feedback_id]) for feedback_id, fixed_json in batch]
+
+            if self._execute_transaction(statements):
+                print(f"   ✅ Lote {batch_number}/{total_batches}: {len(batch)} corregidos (COMMIT)")
+                success += len(batch)
+            else:
+                print(f"   ❌ Lote {batch_number}/{total_batches}: {len(batch)} sin cambios (ROLLBACK)")
+                for feedback_id, _ in batch:
+                    print(f"      - {feedback_id}")
+                failed += len(batch)
+
         print(f"\n📊 Resultado:")
         print(f"   ✅ Corregidos: {success}")
         print(f"   ❌ Fallidos: {failed}")
@@ -367,17 +820,68 @@ class FeedbackChecker:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Verifica el JSON de skillsMetrics en Feedback")
+    parser.add_argument('--fix', action='store_true',
+                        help='Corregir automáticamente los registros con doble escape')
+    parser.add_argument('--driver', choices=['cli', 'http'],
+                        default='http' if TURSO_DATABASE_URL and TURSO_AUTH_TOKEN else 'cli',
+                        help='Conexión a Turso: http (persistente) o cli (turso db shell)')
+    parser.add_argument('--page-size', type=int, default=500,
+                        help='Feedbacks leídos por página durante la verificación (default: 500)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Procesos para validar el JSON en paralelo (default: 1)')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Cantidad de correcciones por transacción con --fix (default: 100)')
+    parser.add_argument('--since-last-run', action='store_true',
+                        help='Verificar solo los feedbacks nuevos o modificados desde la última ejecución')
+    parser.add_argument('--state-file', default=STATE_FILE,
+                        help=f'Archivo con la marca de agua de la última ejecución (default: {STATE_FILE})')
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error("--batch-size debe ser mayor que 0")
+    if args.page_size < 1:
+        parser.error("--page-size debe ser mayor que 0")
+    if args.workers < 1:
+        parser.error("--workers debe ser mayor que 0")
+
     # Verificar si se debe corregir automáticamente
-    auto_fix = '--fix' in sys.argv
+    auto_fix = args.fix
 
     print("🚀 Script de Verificación de Feedbacks")
     print("="*70)
 
     # Crear checker
-    checker = FeedbackChecker()
-
-    # Ejecutar verificación
-    stats = checker.check_all_feedbacks()
+    try:
+        checker = FeedbackChecker(
+            driver=args.driver,
+            db_url=TURSO_DATABASE_URL,
+            auth_token=TURSO_AUTH_TOKEN
+        )
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    print(f"🔌 Driver: {args.driver}")
+
+    # Cargar la marca de agua de la ejecución anterior (solo con --since-last-run)
+    state = None
+    incremental = False
+    if args.since_last_run:
+        state = load_state(args.state_file)
+        incremental = state is not None
+
+        if not incremental:
+            print("⚠️  No hay estado de una ejecución anterior: se hace una verificación completa")
+            state = {}
+
+    # Ejecutar verificación (si una query falla no se guarda el estado)
+    try:
+        stats = checker.check_all_feedbacks(args.page_size, args.workers, state, incremental)
+    except FeedbackQueryError as e:
+        checker.close()
+        print(f"\n❌ Verificación interrumpida, no se actualiza la marca de agua: {e}")
+        sys.exit(1)
 
     # Imprimir reporte
     checker.print_report(stats)
@@ -388,15 +892,34 @@ def main():
         response = input("\n⚠️  ¿Deseas corregir automáticamente los problemas de doble escape? (s/n): ")
 
         if response.lower() == 's':
-            result = checker.fix_all_double_escaped(stats['problems'])
+            result = checker.fix_all_double_escaped(stats['problems'], args.batch_size)
 
             if result['success'] > 0:
                 print("\n✅ Correcciones aplicadas. Ejecutando nueva verificación...")
-                new_stats = checker.check_all_feedbacks()
+                try:
+                    new_stats = checker.check_all_feedbacks(args.page_size, args.workers, state, incremental)
+                except FeedbackQueryError as e:
+                    checker.close()
+                    print(f"\n❌ Verificación interrumpida, no se actualiza la marca de agua: {e}")
+                    sys.exit(1)
                 checker.print_report(new_stats)
 
+    checker.close()
+
+    if args.since_last_run:
+        save_state(args.state_file, state)
+        print(f"\n💾 Marca de agua guardada en: {args.state_file}")
+
+        open_problems = state.get('openProblems', {})
+        print(f"📌 Problemas abiertos acumulados: {len(open_problems)}")
+
     print("\n✨ Verificación completada\n")
 
+    # Con --since-last-run (cron) el código de salida indica si hay problemas
+    # abiertos, también en la primera ejecución (sin estado previo)
+    if args.since_last_run and state.get('openProblems'):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
@@ -9,25 +9,82 @@ This script:
 4. Reports students with duplicate exams
 5. Reports students with exams from wrong courses
 
+All checks share one ExamCoverageIndex built in a single pass over the exam
+instances: (subject, normalized topic, date) -> students who have the exam, so
+auditing a whole year is linear in the number of evaluations.
+
+Topics are canonicalized per subject first (see topic_index.py), so typos like
+"Termoedinámica" don't split one exam into several.
+
+With NumPy installed, CoverageMatrix turns the index into a students x exams
+matrix so missing exams, duplicates, wrong-course exams, per-course
+completion, per-student gaps and the per-student exam columns (--export-csv)
+are vectorized reductions. Without NumPy the checks fall back to set lookups
+on the index and the completion summary and CSV are skipped.
+
+Students and evaluations are loaded straight from Turso (TURSO_DATABASE_URL /
+TURSO_AUTH_TOKEN); both queries run concurrently and go through the on-disk
+query cache (see query_cache.py), so the check can run unattended from cron.
+
 Usage:
-    python3 scripts/check_missing_exams.py [--export-json] [--show-details]
+    python3 scripts/check_missing_exams.py [--export-json] [--export-csv] [--show-details] [--refresh]
 
 Options:
     --export-json    Export results to JSON file
+    --export-csv     Export each student's exams (topic, score, date) to CSV
     --show-details   Show detailed student lists
+    --refresh        Ignore the query cache and re-download User/Evaluation
+    --exact-topics   Don't merge near-duplicate topics (only case/accents)
+
+Exit code is 1 when missing, duplicate or wrong-course exams are found.
 """
 
+import argparse
+import csv
 import os
 import sys
 import json
 import re
 from typing import List, Dict, Set, Optional, Tuple
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from topic_index import TopicCanonicalizer, canonicalizer_for
+
+try:
+    import numpy as np
+except ImportError:
+    # Without NumPy only the set-based checks are available
+    np = None
+
+try:
+    from query_cache import CachedTursoClient, QueryCache, add_cache_arguments, cache_from_args
+    from turso_http import TursoError
+except ImportError:
+    # Without `requests` only the analysis functions are available
+    CachedTursoClient = None
+    QueryCache = None
+    add_cache_arguments = cache_from_args = None
+    TursoError = Exception
+
+
+# Active student roster, only the columns the checks use
+STUDENTS_QUERY = """
+    SELECT id, name, studentId, academicYear, division, sede
+    FROM User
+    WHERE role = 'STUDENT' AND status = 'ACTIVE'
+    ORDER BY academicYear, division, name
+"""
 
-# For now, we'll use direct SQL queries via MCP
-# In the future, this can be adapted to use libsql_experimental
+# Exam instances, newest first (the first instance of an exam names its topic)
+EXAM_INSTANCES_QUERY = """
+    SELECT id, studentId, subject, examTopic, examDate, score
+    FROM Evaluation
+    ORDER BY examDate DESC, id
+"""
 
 @dataclass
 class Student:
@@ -83,6 +140,20 @@ class WrongCourseReport:
     exam_course: str
 
 
+ExamKey = Tuple[str, str, str]  # (subject, normalized topic, date)
+
+
+@dataclass
+class ExamCoverage:
+    """One unique exam and the instances of it, grouped by student."""
+    exam: Exam
+    instances_by_student: Dict[str, List[ExamInstance]] = field(default_factory=dict)
+
+    @property
+    def student_ids(self) -> Set[str]:
+        return set(self.instances_by_student)
+
+
 def parse_subject_course(subject: str) -> Tuple[Optional[str], Optional[str]]:
     """
     Parse subject string to extract academic year and division.
@@ -104,6 +175,7 @@ def parse_subject_course(subject: str) -> Tuple[Optional[str], Optional[str]]:
     return None, None
 
 
+@lru_cache(maxsize=None)
 def normalize_topic(topic: str) -> str:
     """
     Normalize exam topic for comparison.
@@ -121,27 +193,65 @@ def normalize_topic(topic: str) -> str:
 
 
 # =============================================================================
-# DATA FETCHING FUNCTIONS (To be replaced with actual DB queries)
+# DATA FETCHING FUNCTIONS
 # =============================================================================
 
-def get_all_students() -> List[Student]:
+def get_all_students(client: "CachedTursoClient") -> List[Student]:
+    """Fetch all active students from the database."""
+    rows = client.execute(STUDENTS_QUERY, depends_on=('User',))
+
+    return [
+        Student(
+            id=row[0],
+            name=row[1] or '',
+            student_id=row[2] or '',
+            academic_year=row[3] or '',
+            division=row[4] or '',
+            sede=row[5] or ''
+        )
+        for row in rows
+    ]
+
+
+def get_all_exam_instances(client: "CachedTursoClient") -> List[ExamInstance]:
+    """Fetch all exam instances from the database."""
+    rows = client.execute(EXAM_INSTANCES_QUERY, depends_on=('Evaluation',))
+
+    return [
+        ExamInstance(
+            id=row[0],
+            student_id=row[1],
+            subject=row[2],
+            topic=row[3],
+            date=row[4],
+            score=row[5]
+        )
+        for row in rows
+    ]
+
+
+def _fetch_with_own_client(fetch, cache: Optional["QueryCache"]):
+    """Run one loader with its own client (one client per thread)."""
+    with CachedTursoClient(cache=cache) as client:
+        return fetch(client)
+
+
+def load_coverage_data(
+    cache: Optional["QueryCache"] = None
+) -> Tuple[List[Student], List[ExamInstance]]:
     """
-    Fetch all students from database.
+    Fetch students and exam instances concurrently.
 
-    TODO: Replace with actual MCP query
+    Returns:
+        Tuple of (students, exam instances)
     """
-    print("⚠️  This is a template script. You need to run actual MCP queries.")
-    print("   See USAGE section below for SQL queries to use.\n")
-    return []
+    if CachedTursoClient is None:
+        raise RuntimeError("requests not installed (pip3 install -r scripts/requirements.txt)")
 
-
-def get_all_exam_instances() -> List[ExamInstance]:
-    """
-    Fetch all exam instances from database.
-
-    TODO: Replace with actual MCP query
-    """
-    return []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        students = executor.submit(_fetch_with_own_client, get_all_students, cache)
+        exam_instances = executor.submit(_fetch_with_own_client, get_all_exam_instances, cache)
+        return students.result(), exam_instances.result()
 
 
 # =============================================================================
@@ -157,44 +267,110 @@ def group_students_by_course(students: List[Student]) -> Dict[str, List[Student]
     return dict(courses)
 
 
-def identify_unique_exams(exam_instances: List[ExamInstance]) -> List[Exam]:
+class ExamCoverageIndex:
     """
-    Identify unique exams from exam instances.
-    Groups by subject, normalized topic, and date.
+    Index from exam key (subject, normalized topic, date) to the students who
+    have that exam, built in a single pass over the exam instances.
+
+    Instances whose subject has no course (e.g. "Matemática") are skipped,
+    since no check can assign them to a course.
+
+    Each exam keeps its instances grouped by student, so duplicate reports
+    read ids and the original topic straight from the group. The same pass
+    counts instances per course ("4to Año C").
+
+    With a fitted TopicCanonicalizer, topic variants of the same exam share
+    one key and the exam is named by the canonical topic.
     """
-    exam_set = set()
-    exams = []
 
-    for instance in exam_instances:
-        academic_year, division = parse_subject_course(instance.subject)
+    def __init__(self, exam_instances: List[ExamInstance],
+                 topics: Optional[TopicCanonicalizer] = None):
+        self.topics = topics
+        self.coverage: Dict[ExamKey, ExamCoverage] = {}
+        self.count_by_course: Counter = Counter()
 
-        if not academic_year or not division:
-            continue
+        for instance in exam_instances:
+            academic_year, division = parse_subject_course(instance.subject)
+
+            if not academic_year or not division:
+                continue
+
+            self.count_by_course[f"{academic_year} {division}"] += 1
+
+            topic = self.canonical_topic(instance.subject, instance.topic)
+            key = (instance.subject, normalize_topic(topic), instance.date)
+            entry = self.coverage.get(key)
+            if entry is None:
+                entry = self.coverage[key] = ExamCoverage(exam=Exam(
+                    subject=instance.subject,
+                    topic=topic,  # Original topic unless canonicalized
+                    date=instance.date,
+                    academic_year=academic_year,
+                    division=division
+                ))
+
+            entry.instances_by_student.setdefault(instance.student_id, []).append(instance)
+
+    def canonical_topic(self, subject: str, topic: str) -> str:
+        """Canonical spelling of a topic (the topic itself without a canonicalizer)."""
+        return self.topics.canonical(subject, topic) if self.topics else topic
+
+    @property
+    def exams(self) -> List[Exam]:
+        """Unique exams, in order of first appearance."""
+        return [entry.exam for entry in self.coverage.values()]
+
+    def students_with(self, exam: Exam) -> Set[str]:
+        """Ids of the students who have `exam`."""
+        topic = self.canonical_topic(exam.subject, exam.topic)
+        entry = self.coverage.get((exam.subject, normalize_topic(topic), exam.date))
+        return entry.student_ids if entry else set()
+
+    def duplicate_counts(self) -> Tuple[Counter, Counter]:
+        """
+        Extra copies of the same exam, per student id and per course.
+
+        Returns:
+            Tuple of (copies beyond the first per student, per course)
+        """
+        by_student: Counter = Counter()
+        by_course: Counter = Counter()
+
+        for entry in self.coverage.values():
+            course = f"{entry.exam.academic_year} {entry.exam.division}"
+            for student_id, instances in entry.instances_by_student.items():
+                extra = len(instances) - 1
+                if extra > 0:
+                    by_student[student_id] += extra
+                    by_course[course] += extra
+
+        return by_student, by_course
 
-        normalized_topic = normalize_topic(instance.topic)
-        exam_key = (instance.subject, normalized_topic, instance.date)
-
-        if exam_key not in exam_set:
-            exam_set.add(exam_key)
-            exams.append(Exam(
-                subject=instance.subject,
-                topic=instance.topic,  # Keep original topic
-                date=instance.date,
-                academic_year=academic_year,
-                division=division
-            ))
 
-    return exams
+def identify_unique_exams(exam_instances: List[ExamInstance]) -> List[Exam]:
+    """
+    Identify unique exams from exam instances.
+    Groups by subject, normalized topic, and date.
+    """
+    return ExamCoverageIndex(exam_instances).exams
 
 
 def find_missing_exams(
     exams: List[Exam],
     students_by_course: Dict[str, List[Student]],
-    exam_instances: List[ExamInstance]
+    index: ExamCoverageIndex,
+    matrix: Optional["CoverageMatrix"] = None
 ) -> List[MissingExamReport]:
     """
     Find students who are missing exams they should have.
+
+    With a CoverageMatrix built from the same index and roster, the reports
+    come from its column reductions (all of the index's exams); the per-exam
+    set lookups below are the fallback without NumPy.
     """
+    if matrix is not None:
+        return matrix.missing_reports()
+
     reports = []
 
     for exam in exams:
@@ -207,15 +383,8 @@ def find_missing_exams(
         if not students_in_course:
             continue
 
-        # Find which students have this exam
-        students_with_exam = set()
-        normalized_exam_topic = normalize_topic(exam.topic)
-
-        for instance in exam_instances:
-            if (instance.subject == exam.subject and
-                instance.date == exam.date and
-                normalize_topic(instance.topic) == normalized_exam_topic):
-                students_with_exam.add(instance.student_id)
+        # Students who have this exam (one index lookup)
+        students_with_exam = index.students_with(exam)
 
         # Find missing students
         missing_students = [
@@ -243,62 +412,334 @@ def find_missing_exams(
 
 def find_duplicate_exams(
     students: List[Student],
-    exam_instances: List[ExamInstance]
+    index: ExamCoverageIndex,
+    matrix: Optional["CoverageMatrix"] = None
 ) -> List[DuplicateExamReport]:
     """
     Find students who have the same exam multiple times.
+
+    With a CoverageMatrix the candidates are the nonzero cells of its
+    duplicates mask instead of a walk over every (exam, student) pair.
     """
+    if matrix is not None:
+        return matrix.duplicate_reports()
+
     reports = []
     students_by_id = {s.id: s for s in students}
 
-    # Group exam instances by student and exam
-    student_exams = defaultdict(lambda: defaultdict(list))
+    for entry in index.coverage.values():
+        for student_id, instances in entry.instances_by_student.items():
+            if len(instances) < 2:
+                continue
+
+            student = students_by_id.get(student_id)
+            if not student:
+                continue
+
+            reports.append(DuplicateExamReport(
+                student=student,
+                exam=Exam(
+                    subject=entry.exam.subject,
+                    topic=instances[0].topic,  # Original topic of this student's first copy
+                    date=entry.exam.date,
+                    academic_year=entry.exam.academic_year,
+                    division=entry.exam.division
+                ),
+                count=len(instances),
+                exam_ids=[instance.id for instance in instances]
+            ))
 
-    for instance in exam_instances:
-        normalized_topic = normalize_topic(instance.topic)
-        exam_key = (instance.subject, normalized_topic, instance.date)
-        student_exams[instance.student_id][exam_key].append(instance.id)
+    return reports
 
-    # Find duplicates
-    for student_id, exams in student_exams.items():
-        student = students_by_id.get(student_id)
-        if not student:
-            continue
 
-        for exam_key, exam_ids in exams.items():
-            if len(exam_ids) > 1:
-                subject, topic, date = exam_key
-                academic_year, division = parse_subject_course(subject)
-
-                if academic_year and division:
-                    # Get original topic from first instance
-                    original_topic = next(
-                        (inst.topic for inst in exam_instances if inst.id == exam_ids[0]),
-                        topic
-                    )
-
-                    reports.append(DuplicateExamReport(
-                        student=student,
-                        exam=Exam(
-                            subject=subject,
-                            topic=original_topic,
-                            date=date,
-                            academic_year=academic_year,
-                            division=division
-                        ),
-                        count=len(exam_ids),
-                        exam_ids=exam_ids
-                    ))
+def find_wrong_course_exams(
+    students: List[Student],
+    index: ExamCoverageIndex,
+    matrix: Optional["CoverageMatrix"] = None
+) -> List[WrongCourseReport]:
+    """
+    Find students who have an exam from a course other than their own.
+
+    With a CoverageMatrix the reports come from its wrong-course mask.
+    """
+    if matrix is not None:
+        return matrix.wrong_course_reports()
+
+    reports = []
+    students_by_id = {s.id: s for s in students}
+
+    for entry in index.coverage.values():
+        exam = entry.exam
+
+        for student_id in entry.instances_by_student:
+            student = students_by_id.get(student_id)
+            if not student:
+                continue
+
+            if (student.academic_year, student.division) != (exam.academic_year, exam.division):
+                reports.append(WrongCourseReport(
+                    student=student,
+                    exam=exam,
+                    student_course=f"{student.academic_year} {student.division}",
+                    exam_course=f"{exam.academic_year} {exam.division}"
+                ))
 
     return reports
 
 
+def audit_exam_coverage(
+    students: List[Student],
+    exam_instances: List[ExamInstance],
+    topics: Optional[TopicCanonicalizer] = None
+) -> "CoverageAudit":
+    """
+    Run the missing, duplicate and wrong-course checks over one shared index.
+
+    With NumPy the checks are reductions over a CoverageMatrix built from the
+    index; without it they fall back to set lookups on the index.
+
+    Args:
+        students: Active students
+        exam_instances: All exam instances
+        topics: Fitted topic canonicalizer (None = exact normalized topics)
+
+    Returns:
+        CoverageAudit with the index, the matrix (None without NumPy) and the reports
+    """
+    index = ExamCoverageIndex(exam_instances, topics)
+    matrix = CoverageMatrix(students, index) if np is not None else None
+    students_by_course = group_students_by_course(students)
+
+    return CoverageAudit(
+        index=index,
+        matrix=matrix,
+        missing=find_missing_exams(index.exams, students_by_course, index, matrix),
+        duplicates=find_duplicate_exams(students, index, matrix),
+        wrong_course=find_wrong_course_exams(students, index, matrix)
+    )
+
+
+# =============================================================================
+# COVERAGE MATRIX (NumPy)
+# =============================================================================
+
+def course_key(academic_year: str, division: str) -> str:
+    """Course key used to group students and exams (e.g. "4to Año_C")."""
+    return f"{academic_year}_{division}"
+
+
+class CoverageMatrix:
+    """
+    Students x exams matrix built from an ExamCoverageIndex.
+
+    Rows are students in roster order and columns the index's unique exams in
+    order of first appearance, so the reports come out in the same order as
+    the set-based checks. Courses are integer codes per row and per column.
+    `copies[i, j]` is how many times student i has exam j and `scores[i, j]`
+    the score of the first copy (NaN if the student doesn't have it).
+    Requires NumPy.
+    """
+
+    def __init__(self, students: List[Student], index: ExamCoverageIndex):
+        if np is None:
+            raise ImportError("CoverageMatrix requires numpy (pip3 install numpy)")
+
+        self.students = list(students)
+        self.entries = list(index.coverage.values())
+        self.exams = [entry.exam for entry in self.entries]
+
+        self.course_keys = sorted(
+            {course_key(s.academic_year, s.division) for s in self.students}
+            | {course_key(e.academic_year, e.division) for e in self.exams}
+        )
+        course_code = {key: code for code, key in enumerate(self.course_keys)}
+        self.student_course = np.array(
+            [course_code[course_key(s.academic_year, s.division)] for s in self.students], dtype=np.int32
+        )
+        self.exam_course = np.array(
+            [course_code[course_key(e.academic_year, e.division)] for e in self.exams], dtype=np.int32
+        )
+
+        # Students holding each exam, including ids not in `students`
+        self.holders = np.array([len(entry.instances_by_student) for entry in self.entries], dtype=np.int32)
+
+        # Fill the matrix from the index in one pass over (student, exam) pairs
+        row_of = {student.id: row for row, student in enumerate(self.students)}
+        rows, cols, counts, scores = [], [], [], []
+        for col, entry in enumerate(self.entries):
+            for student_id, instances in entry.instances_by_student.items():
+                row = row_of.get(student_id)
+                if row is None:
+                    continue
+                rows.append(row)
+                cols.append(col)
+                counts.append(len(instances))
+                scores.append(instances[0].score)
+
+        shape = (len(self.students), len(self.exams))
+        self.copies = np.zeros(shape, dtype=np.int32)
+        self.scores = np.full(shape, np.nan)
+        if rows:
+            self.copies[rows, cols] = counts
+            self.scores[rows, cols] = np.array(scores, dtype=float)
+
+    @property
+    def has(self) -> "np.ndarray":
+        """True where the student has the exam."""
+        return self.copies > 0
+
+    @property
+    def expected(self) -> "np.ndarray":
+        """True where the exam belongs to the student's course."""
+        return self.student_course[:, None] == self.exam_course[None, :]
+
+    @property
+    def missing(self) -> "np.ndarray":
+        """Exams of the student's course that the student doesn't have."""
+        return self.expected & ~self.has
+
+    @property
+    def duplicates(self) -> "np.ndarray":
+        """Extra copies beyond the first (0 where there are none)."""
+        return np.maximum(self.copies - 1, 0)
+
+    @property
+    def wrong_course(self) -> "np.ndarray":
+        """Exams the student has from another course."""
+        return self.has & ~self.expected
+
+    def student_gaps(self) -> Dict[str, int]:
+        """Missing exams per student id (only students with gaps)."""
+        gaps = self.missing.sum(axis=1)
+        return {self.students[row].id: int(gaps[row]) for row in np.flatnonzero(gaps)}
+
+    def course_completion(self) -> Dict[str, Dict[str, float]]:
+        """
+        Completion per course: expected (student, exam) cells, completed cells,
+        extra copies of the course's exams and completion rate.
+        """
+        expected = self.expected
+        completed = (expected & self.has).sum(axis=1)
+        expected_per_student = expected.sum(axis=1)
+        extra_per_exam = self.duplicates.sum(axis=0)
+
+        n_courses = len(self.course_keys)
+        expected_cells = np.bincount(self.student_course, weights=expected_per_student, minlength=n_courses)
+        completed_cells = np.bincount(self.student_course, weights=completed, minlength=n_courses)
+        extra_copies = np.bincount(self.exam_course, weights=extra_per_exam, minlength=n_courses)
+        students = np.bincount(self.student_course, minlength=n_courses)
+        exams = np.bincount(self.exam_course, minlength=n_courses)
+
+        summary = {}
+        for code, key in enumerate(self.course_keys):
+            if not students[code]:
+                continue
+            summary[key] = {
+                "students": int(students[code]),
+                "exams": int(exams[code]),
+                "expected": int(expected_cells[code]),
+                "completed": int(completed_cells[code]),
+                "extra_copies": int(extra_copies[code]),
+                "completion_rate": round(float(completed_cells[code] / expected_cells[code] * 100), 2)
+                if expected_cells[code] else 100.0
+            }
+        return summary
+
+    def missing_reports(self) -> List[MissingExamReport]:
+        """Same reports as the set-based find_missing_exams, from column reductions."""
+        missing = self.missing
+        missing_per_exam = missing.sum(axis=0)
+        students_per_course = np.bincount(self.student_course, minlength=len(self.course_keys))
+
+        reports = []
+        for col in np.flatnonzero(missing_per_exam):
+            total = int(students_per_course[self.exam_course[col]])
+            with_exam = int(self.holders[col])
+            reports.append(MissingExamReport(
+                exam=self.exams[col],
+                total_students_in_course=total,
+                students_with_exam=with_exam,
+                students_missing=[self.students[row] for row in np.flatnonzero(missing[:, col])],
+                percentage_complete=with_exam / total * 100
+            ))
+        return reports
+
+    def duplicate_reports(self) -> List[DuplicateExamReport]:
+        """Same reports as the set-based find_duplicate_exams (by exam, then roster order)."""
+        reports = []
+        cols, rows = np.nonzero(self.duplicates.T)
+        for col, row in zip(cols, rows):
+            entry, student = self.entries[col], self.students[row]
+            instances = entry.instances_by_student[student.id]
+            reports.append(DuplicateExamReport(
+                student=student,
+                exam=Exam(
+                    subject=entry.exam.subject,
+                    topic=instances[0].topic,  # Original topic of this student's first copy
+                    date=entry.exam.date,
+                    academic_year=entry.exam.academic_year,
+                    division=entry.exam.division
+                ),
+                count=len(instances),
+                exam_ids=[instance.id for instance in instances]
+            ))
+        return reports
+
+    def wrong_course_reports(self) -> List[WrongCourseReport]:
+        """Same reports as the set-based find_wrong_course_exams (by exam, then roster order)."""
+        reports = []
+        cols, rows = np.nonzero(self.wrong_course.T)
+        for col, row in zip(cols, rows):
+            exam, student = self.exams[col], self.students[row]
+            reports.append(WrongCourseReport(
+                student=student,
+                exam=exam,
+                student_course=f"{student.academic_year} {student.division}",
+                exam_course=f"{exam.academic_year} {exam.division}"
+            ))
+        return reports
+
+    def student_exam_rows(self) -> List[Dict[str, object]]:
+        """
+        One row per student with the exams they have, by date (the exam
+        columns of the *_2025_resumen.csv reports).
+        """
+        by_date = np.argsort([exam.date for exam in self.exams], kind='stable')
+        has = self.has[:, by_date]
+        rows = []
+        for row, student in enumerate(self.students):
+            cols = by_date[np.flatnonzero(has[row])]
+            rows.append({
+                "student": student,
+                "exams": [
+                    {
+                        "subject": self.exams[col].subject,
+                        "topic": self.exams[col].topic,
+                        "score": None if np.isnan(self.scores[row, col]) else float(self.scores[row, col]),
+                        "date": self.exams[col].date
+                    }
+                    for col in cols
+                ]
+            })
+        return rows
+
+
+@dataclass
+class CoverageAudit:
+    """Result of audit_exam_coverage."""
+    index: ExamCoverageIndex
+    matrix: Optional[CoverageMatrix]
+    missing: List[MissingExamReport]
+    duplicates: List[DuplicateExamReport]
+    wrong_course: List[WrongCourseReport]
+
+
 # =============================================================================
 # REPORTING FUNCTIONS
 # =============================================================================
 
-def print_missing_exams_summary(reports: List[MissingExamReport]):
-    """Print summary of missing exams."""
+def print_missing_exams_summary(reports: List[MissingExamReport], show_details: bool = False):
+    """Print summary of missing exams (every missing student with `show_details`)."""
     print("\n" + "=" * 80)
     print("📊 MISSING EXAMS REPORT")
     print("=" * 80)
@@ -320,18 +761,22 @@ def print_missing_exams_summary(reports: List[MissingExamReport]):
 
         # Show first 5 missing students
         if report.students_missing:
+            limit = None if show_details else 5
             print(f"   Students without exam:")
-            for student in report.students_missing[:5]:
+            for student in report.students_missing[:limit]:
                 print(f"      - {student.name} ({student.student_id})")
 
-            if len(report.students_missing) > 5:
-                print(f"      ... and {len(report.students_missing) - 5} more")
+            if limit and len(report.students_missing) > limit:
+                print(f"      ... and {len(report.students_missing) - limit} more")
 
     print("\n" + "=" * 80)
 
 
-def print_duplicate_exams_summary(reports: List[DuplicateExamReport]):
-    """Print summary of duplicate exams."""
+def print_duplicate_exams_summary(
+    reports: List[DuplicateExamReport],
+    index: Optional[ExamCoverageIndex] = None
+):
+    """Print summary of duplicate exams (with per-course totals if `index` is given)."""
     print("\n" + "=" * 80)
     print("📊 DUPLICATE EXAMS REPORT")
     print("=" * 80)
@@ -342,6 +787,12 @@ def print_duplicate_exams_summary(reports: List[DuplicateExamReport]):
 
     print(f"\n⚠️  Found {len(reports)} duplicate exam submissions\n")
 
+    if index is not None:
+        _, by_course = index.duplicate_counts()
+        print("   Extra copies by course:")
+        for course, extra in by_course.most_common():
+            print(f"      - {course}: {extra} extra copies ({index.count_by_course[course]} exams total)")
+
     for i, report in enumerate(reports, 1):
         print(f"\n{i}. Student: {report.student.name} ({report.student.student_id})")
         print(f"   Exam: {report.exam.subject} - {report.exam.topic}")
@@ -352,17 +803,64 @@ def print_duplicate_exams_summary(reports: List[DuplicateExamReport]):
     print("\n" + "=" * 80)
 
 
+def print_wrong_course_summary(reports: List[WrongCourseReport]):
+    """Print summary of exams assigned to students from another course."""
+    print("\n" + "=" * 80)
+    print("📊 WRONG COURSE REPORT")
+    print("=" * 80)
+
+    if not reports:
+        print("\n✅ All exams belong to the student's own course.\n")
+        return
+
+    print(f"\n⚠️  Found {len(reports)} exams assigned to students from another course\n")
+
+    for i, report in enumerate(reports, 1):
+        print(f"\n{i}. Student: {report.student.name} ({report.student.student_id})")
+        print(f"   Exam: {report.exam.subject} - {report.exam.topic}")
+        print(f"   Date: {report.exam.date}")
+        print(f"   Student course: {report.student_course} / Exam course: {report.exam_course}")
+
+    print("\n" + "=" * 80)
+
+
+def print_course_completion_summary(completion: Dict[str, Dict[str, float]]):
+    """Print per-course completion from CoverageMatrix.course_completion()."""
+    print("\n" + "=" * 80)
+    print("📊 COURSE COMPLETION")
+    print("=" * 80 + "\n")
+
+    for course, stats in sorted(completion.items(), key=lambda item: item[1]["completion_rate"]):
+        print(f"   {course.replace('_', ' '):<14} {stats['completed']:>5}/{stats['expected']:<5} "
+              f"({stats['completion_rate']:.1f}%)  {stats['students']} students, {stats['exams']} exams, "
+              f"{stats['extra_copies']} extra copies")
+
+    print("\n" + "=" * 80)
+
+
 def export_to_json(
     missing_reports: List[MissingExamReport],
     duplicate_reports: List[DuplicateExamReport],
-    filename: str = "exam_verification_report.json"
+    filename: str = "exam_verification_report.json",
+    wrong_course_reports: Optional[List[WrongCourseReport]] = None,
+    index: Optional[ExamCoverageIndex] = None,
+    matrix: Optional[CoverageMatrix] = None
 ):
-    """Export reports to JSON file."""
+    """Export reports to JSON file (with duplicate counts if `index` is given)."""
+    duplicates_by_student, duplicates_by_course = (
+        index.duplicate_counts() if index is not None else (Counter(), Counter())
+    )
+    missing_by_student = Counter(
+        matrix.student_gaps() if matrix is not None
+        else (s.id for r in missing_reports for s in r.students_missing)
+    )
+
     data = {
         "generated_at": datetime.now().isoformat(),
         "summary": {
             "exams_with_missing_students": len(missing_reports),
-            "total_duplicate_submissions": len(duplicate_reports)
+            "total_duplicate_submissions": len(duplicate_reports),
+            "wrong_course_exams": len(wrong_course_reports or [])
         },
         "missing_exams": [
             {
@@ -405,81 +903,148 @@ def export_to_json(
                 "exam_ids": r.exam_ids
             }
             for r in duplicate_reports
+        ],
+        "missing_counts": {
+            "by_student": dict(missing_by_student.most_common())
+        },
+        "duplicate_counts": {
+            "by_student": dict(duplicates_by_student.most_common()),
+            "by_course": dict(duplicates_by_course.most_common())
+        },
+        "wrong_course_exams": [
+            {
+                "student": {
+                    "name": r.student.name,
+                    "student_id": r.student.student_id,
+                    "id": r.student.id
+                },
+                "exam": {
+                    "subject": r.exam.subject,
+                    "topic": r.exam.topic,
+                    "date": r.exam.date
+                },
+                "student_course": r.student_course,
+                "exam_course": r.exam_course
+            }
+            for r in wrong_course_reports or []
         ]
     }
 
-    filepath = os.path.join("scripts", filename)
+    # Next to this script, whatever the working directory (cron)
+    filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
     with open(filepath, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
 
     print(f"\n📄 Report exported to: {filepath}")
 
 
+def export_exam_columns_csv(matrix: CoverageMatrix, filename: str = "exam_columns.csv"):
+    """
+    Export one row per student with their exams by date, in the layout of the
+    exam columns of the *_2025_resumen.csv reports (from CoverageMatrix.student_exam_rows()).
+    """
+    rows = matrix.student_exam_rows()
+    max_exams = max((len(row["exams"]) for row in rows), default=0)
+
+    header = ["Nombre", "Sede", "Año Académico", "División"]
+    for i in range(1, max_exams + 1):
+        header += [f"Examen {i} - Materia", f"Examen {i} - Tema", f"Examen {i} - Nota", f"Examen {i} - Fecha"]
+
+    # Next to this script, whatever the working directory (cron)
+    filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
+    with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            student = row["student"]
+            cells = [student.name, student.sede, student.academic_year, student.division]
+            for exam in row["exams"]:
+                score = exam["score"]
+                if score is not None and score.is_integer():
+                    score = int(score)
+                cells += [exam["subject"], exam["topic"], "" if score is None else score, exam["date"]]
+            writer.writerow(cells)
+
+    print(f"\n📄 Exam columns exported to: {filepath}")
+
+
 # =============================================================================
 # MAIN & USAGE
 # =============================================================================
 
-def print_usage_instructions():
-    """Print instructions on how to use this script with MCP."""
-    print("\n" + "=" * 80)
-    print("📖 HOW TO USE THIS SCRIPT")
-    print("=" * 80)
-    print("""
-This script requires data from the Turso database via MCP.
-
-STEP 1: Get all students
--------------------------
-Use MCP query:
-
-SELECT id, name, studentId, academicYear, division, sede
-FROM User
-WHERE role = 'STUDENT'
-ORDER BY academicYear, division, name
-
-
-STEP 2: Get all exam instances
--------------------------------
-Use MCP query:
-
-SELECT id, studentId, subject, examTopic, examDate, score
-FROM Evaluation
-ORDER BY examDate DESC
-
-
-STEP 3: Save the results
-------------------------
-Save the JSON results from both queries to files:
-- scripts/students_data.json
-- scripts/exams_data.json
-
-
-STEP 4: Run the analysis
-------------------------
-Modify this script to read from those JSON files and run the analysis.
-
-
-ALTERNATIVE: Direct MCP Integration
-------------------------------------
-This script can be enhanced to use MCP directly by importing the
-turso-intellego MCP server functions.
-""")
-    print("=" * 80 + "\n")
-
-
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Verify that all students have the exams they should have")
+    parser.add_argument('--export-json', action='store_true', help='Export results to JSON file')
+    parser.add_argument('--export-csv', action='store_true',
+                        help="Export each student's exams (topic, score, date) to CSV (requires numpy)")
+    parser.add_argument('--show-details', action='store_true', help='Show detailed student lists')
+    parser.add_argument('--exact-topics', action='store_true',
+                        help="Don't merge near-duplicate topics (only case/accents)")
+    if add_cache_arguments:
+        add_cache_arguments(parser)
+    args = parser.parse_args()
+
     print("🔍 Intellego Platform - Exam Coverage Verification")
     print("=" * 80)
 
-    # For now, print usage instructions
-    print_usage_instructions()
-
-    print("\n⚠️  This is a template script.")
-    print("   To use it, you need to:")
-    print("   1. Run the MCP queries shown above")
-    print("   2. Modify this script to load the data")
-    print("   3. Run the analysis functions")
-    print("\n   Or ask Claude to integrate MCP queries directly.\n")
+    if not os.getenv('TURSO_DATABASE_URL') or not os.getenv('TURSO_AUTH_TOKEN'):
+        print("❌ TURSO_DATABASE_URL and TURSO_AUTH_TOKEN must be set")
+        sys.exit(1)
+
+    cache = cache_from_args(args) if cache_from_args else None
+
+    # Fetch data (both tables at once)
+    print("\n📥 Fetching students and evaluations...")
+    try:
+        students, exam_instances = load_coverage_data(cache)
+    except (TursoError, RuntimeError) as e:
+        print(f"❌ Failed to fetch data: {e}")
+        sys.exit(1)
+
+    print(f"✅ Loaded {len(students)} students and {len(exam_instances)} evaluations")
+    if cache:
+        print(f"💾 Query cache: {cache.hits} hits, {cache.misses} downloads ({cache.cache_dir})")
+
+    # Canonical topics per subject (typo variants count as the same exam)
+    topics = None
+    if not args.exact_topics:
+        topics = canonicalizer_for(cache).fit((e.subject, e.topic) for e in exam_instances)
+        print(f"🔤 Topic variants merged: {sum(len(v) - 1 for v in topics.variants().values())}")
+
+    # Analyze (one shared index, vectorized with NumPy)
+    print("\n🔍 Checking exam coverage...")
+    audit = audit_exam_coverage(students, exam_instances, topics)
+
+    # Print results
+    print_missing_exams_summary(audit.missing, args.show_details)
+    print_duplicate_exams_summary(audit.duplicates, audit.index)
+    print_wrong_course_summary(audit.wrong_course)
+
+    if audit.matrix is not None:
+        print_course_completion_summary(audit.matrix.course_completion())
+
+    # Export to JSON / CSV
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if args.export_json:
+        export_to_json(
+            audit.missing,
+            audit.duplicates,
+            f"exam_verification_report_{timestamp}.json",
+            audit.wrong_course,
+            audit.index,
+            audit.matrix
+        )
+
+    if args.export_csv:
+        if audit.matrix is None:
+            print("\n⚠️  --export-csv requires numpy (pip3 install -r scripts/requirements.txt), skipped")
+        else:
+            export_exam_columns_csv(audit.matrix, f"exam_columns_{timestamp}.csv")
+
+    # Exit code
+    has_issues = audit.missing or audit.duplicates or audit.wrong_course
+    sys.exit(1 if has_issues else 0)
 
 
 if __name__ == "__main__":
@@ -7,15 +7,34 @@ archivos JSON organizados por estudiante y materia.
 
 MODO DE USO:
 Claude Code ejecutará este script después de obtener los datos completos vía MCP.
-Los datos se pasarán como argumentos o se leerán desde stdin.
+Los datos se leen desde stdin (o desde un archivo pasado como argumento) de forma
+incremental: JSON con clave "rows", array de filas o NDJSON (--ndjson).
+
+    cat feedbacks_2025_data.json | python3 scripts/export-feedbacks-2025-final.py
+    python3 scripts/export-feedbacks-2025-final.py feedbacks_2025_data.json
+
+Con --format archive los documentos se guardan en un único archivo SQLite
+indexado por (studentId, subject) en lugar de un JSON por alumno-materia.
+
+Con --sorted la entrada se asume ordenada como la query de exportación
+(ORDER BY u.name, f.studentId, f.subject, f.weekStart): cada JSON alumno-materia
+se escribe apenas cambia la clave, así la memoria queda acotada al grupo más
+grande. f.studentId va antes que f.subject para que dos alumnos con el mismo
+nombre no queden intercalados.
 """
 
+import argparse
 import json
 import os
 import sys
 from datetime import datetime
 from collections import defaultdict
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any, Tuple
+
+from export_archive import DEFAULT_ARCHIVE_PATH, OUTPUT_FORMATS, create_export_writer
+from export_writer import ExportWriterPool, POOL_KINDS
+from json_stream import iter_json_rows
+from week_keys import week_key, week_label
 
 
 def parse_json_field(field_value: Any) -> Any:
@@ -38,26 +57,31 @@ def calculate_statistics(feedbacks: List[Dict]) -> Dict:
     """Calcula estadísticas agregadas de los feedbacks"""
     scores = [f['score'] for f in feedbacks if f['score'] is not None]
 
+    weeks = [f['weekKey'] for f in feedbacks]
+
     stats = {
         'totalFeedbacks': len(feedbacks),
         'feedbacksWithScore': len(scores),
         'averageScore': round(sum(scores) / len(scores), 2) if scores else None,
         'minScore': min(scores) if scores else None,
         'maxScore': max(scores) if scores else None,
-        'weeksCovered': len(set(f['weekStart'] for f in feedbacks)),
+        'weeksCovered': len(set(weeks)),
         'dateRange': {
-            'firstWeek': min(f['weekStart'] for f in feedbacks),
-            'lastWeek': max(f['weekStart'] for f in feedbacks)
+            'firstWeek': week_label(min(weeks)),
+            'lastWeek': week_label(max(weeks))
         }
     }
 
     return stats
 
 
-def organize_feedbacks_by_student_and_subject(feedbacks_data: List[Dict]) -> Dict:
+def organize_feedbacks_by_student_and_subject(feedbacks_data: Iterable[Dict]) -> Dict:
     """
     Organiza los feedbacks agrupados por estudiante y materia.
 
+    Acepta cualquier iterable (por ejemplo iter_json_rows), así las filas se
+    consumen a medida que se leen.
+
     Returns:
         Dict con estructura: {studentId: {subject: [feedbacks]}}
     """
@@ -67,6 +91,9 @@ def organize_feedbacks_by_student_and_subject(feedbacks_data: List[Dict]) -> Dic
         student_id = feedback['studentId']
         subject = feedback['subject']
 
+        # Clave de semana canónica (una sola vez por fila)
+        feedback['weekKey'] = week_key(feedback['weekStart'])
+
         # Parsear campos JSON
         feedback['strengths'] = parse_json_field(feedback.get('strengths'))
         feedback['improvements'] = parse_json_field(feedback.get('improvements'))
@@ -76,16 +103,67 @@ def organize_feedbacks_by_student_and_subject(feedbacks_data: List[Dict]) -> Dic
     return organized
 
 
+def iter_sorted_student_subject_groups(
+    feedbacks_data: Iterable[Dict]
+) -> Iterator[Tuple[str, str, List[Dict], bool]]:
+    """
+    Agrupa un stream de feedbacks ya ordenado por estudiante y materia.
+
+    Cada grupo se emite apenas cambia la clave (studentId, subject), sin
+    esperar al final de la entrada.
+
+    Yields:
+        Tuplas (studentId, subject, feedbacks, presorted), donde presorted
+        indica que el grupo llegó ordenado por weekStart
+
+    Raises:
+        ValueError: Si una clave reaparece después de haberse cerrado su grupo
+            (la entrada no estaba agrupada; usar el modo sin --sorted)
+    """
+    flushed = set()
+    current_key = None
+    group: List[Dict] = []
+    presorted = True
+
+    for feedback in feedbacks_data:
+        key = (feedback['studentId'], feedback['subject'])
+
+        # Clave de semana canónica (una sola vez por fila)
+        feedback['weekKey'] = week_key(feedback['weekStart'])
+
+        if key != current_key:
+            if group:
+                yield current_key[0], current_key[1], group, presorted
+                flushed.add(current_key)
+            if key in flushed:
+                raise ValueError(
+                    f"Entrada no agrupada: {key[0]} / {key[1]} aparece en más de un bloque"
+                )
+            current_key, group, presorted = key, [], True
+        elif feedback['weekKey'] < group[-1]['weekKey']:
+            presorted = False
+
+        # Parsear campos JSON
+        feedback['strengths'] = parse_json_field(feedback.get('strengths'))
+        feedback['improvements'] = parse_json_field(feedback.get('improvements'))
+
+        group.append(feedback)
+
+    if group:
+        yield current_key[0], current_key[1], group, presorted
+
+
 def create_student_subject_json(
     student_id: str,
     student_name: str,
     subject: str,
-    feedbacks: List[Dict]
+    feedbacks: List[Dict],
+    presorted: bool = False
 ) -> Dict:
     """Crea el JSON estructurado para un estudiante-materia"""
 
-    # Ordenar feedbacks por fecha
-    sorted_feedbacks = sorted(feedbacks, key=lambda x: x['weekStart'])
+    # Ordenar feedbacks por semana (salvo que ya lleguen ordenados)
+    sorted_feedbacks = feedbacks if presorted else sorted(feedbacks, key=lambda x: x['weekKey'])
 
     # Calcular estadísticas
     stats = calculate_statistics(sorted_feedbacks)
@@ -107,7 +185,7 @@ def create_student_subject_json(
     for fb in sorted_feedbacks:
         feedback_entry = {
             'feedbackId': fb['id'],
-            'weekStart': fb['weekStart'],
+            'weekStart': week_label(fb['weekKey']),
             'score': fb['score'],
             'generalComments': fb.get('generalComments'),
             'strengths': fb.get('strengths'),
@@ -135,47 +213,93 @@ def sanitize_filename(name: str) -> str:
     return name
 
 
-def main():
-    """Función principal"""
+def write_student_subject_json(
+    writer: ExportWriterPool,
+    output_dir: str,
+    student_id: str,
+    student_name: str,
+    subject: str,
+    feedbacks: List[Dict],
+    presorted: bool = False
+) -> str:
+    """Genera el JSON de un estudiante-materia y lo encola en el pool de escritura. Retorna la ruta"""
+    json_data = create_student_subject_json(student_id, student_name, subject, feedbacks, presorted)
 
-    print("=" * 80)
-    print("EXPORTACIÓN DE FEEDBACKS 2025 - INTELLEGO PLATFORM")
-    print("=" * 80)
-    print()
+    # Nombre del archivo
+    filename = f"{sanitize_filename(student_name)}_{sanitize_filename(subject)}.json"
+    filepath = os.path.join(output_dir, filename)
 
-    # Leer datos desde stdin (Claude Code pasará los datos via pipe)
-    print("📡 Leyendo datos desde entrada estándar...")
+    # Serialización y escritura atómica en el pool (se omite si el contenido no cambió)
+    writer.submit(filepath, json_data, key=f"{student_id}|{subject}", payload=json_data['feedbacks'])
 
-    try:
-        input_data = sys.stdin.read()
-        data = json.loads(input_data)
-        feedbacks_data = data.get('rows', [])
-    except json.JSONDecodeError as e:
-        print(f"❌ Error al parsear JSON: {e}")
-        return 1
-    except Exception as e:
-        print(f"❌ Error inesperado: {e}")
-        return 1
+    return filepath
 
-    print(f"✅ Se cargaron {len(feedbacks_data)} feedbacks")
-    print()
 
-    # Organizar por estudiante y materia
+def print_progress(files_written: int) -> None:
+    """Muestra progreso cada 10 archivos"""
+    if files_written % 10 == 0:
+        print(f"  📝 Creados {files_written} archivos...")
+
+
+def export_sorted_stream(
+    feedbacks_data: Iterable[Dict],
+    output_dir: str,
+    writer: ExportWriterPool
+) -> Tuple[int, int, int]:
+    """
+    Exporta un stream ordenado escribiendo cada alumno-materia al cerrar su grupo.
+
+    Returns:
+        Tupla (feedbacks leídos, estudiantes, documentos generados)
+    """
+    total_feedbacks = 0
+    students = set()
+    files_created = 0
+
+    for student_id, subject, feedbacks, presorted in iter_sorted_student_subject_groups(feedbacks_data):
+        total_feedbacks += len(feedbacks)
+        students.add(student_id)
+
+        student_name = feedbacks[0]['studentName'] or f"Student_{student_id[:8]}"
+        write_student_subject_json(writer, output_dir, student_id, student_name, subject, feedbacks, presorted)
+
+        files_created += 1
+
+    return total_feedbacks, len(students), files_created
+
+
+def export_organized(
+    feedbacks_data: Iterable[Dict],
+    output_dir: str,
+    writer: ExportWriterPool
+) -> Tuple[int, int]:
+    """
+    Exporta agrupando primero todos los feedbacks en memoria (entrada en cualquier orden).
+
+    Returns:
+        Tupla (estudiantes, documentos generados)
+    """
+    # Las filas se organizan a medida que se parsean (sin cargar el JSON completo)
     print("📊 Organizando feedbacks por estudiante y materia...")
-    organized = organize_feedbacks_by_student_and_subject(feedbacks_data)
+    total_feedbacks = 0
+
+    def counted(rows):
+        nonlocal total_feedbacks
+        for row in rows:
+            total_feedbacks += 1
+            yield row
+
+    organized = organize_feedbacks_by_student_and_subject(counted(feedbacks_data))
 
     total_students = len(organized)
     total_combinations = sum(len(subjects) for subjects in organized.values())
 
+    print(f"✅ Se cargaron {total_feedbacks} feedbacks")
     print(f"✅ Encontrados {total_students} estudiantes")
     print(f"✅ Total de combinaciones alumno-materia: {total_combinations}")
     print()
 
-    # Crear directorio de salida
-    output_dir = 'feedbacks_2025_export'
-    os.makedirs(output_dir, exist_ok=True)
-
-    print(f"📁 Creando JSONs en directorio '{output_dir}/'...")
+    print("📁 Creando JSONs...")
     print()
 
     # Generar JSONs
@@ -192,31 +316,80 @@ def main():
         if not student_name:
             student_name = f"Student_{student_id[:8]}"
 
-        sanitized_name = sanitize_filename(student_name)
-
         for subject, feedbacks in subjects_data.items():
-            # Crear JSON
-            json_data = create_student_subject_json(
-                student_id,
-                student_name,
-                subject,
-                feedbacks
-            )
-
-            # Nombre del archivo
-            sanitized_subject = sanitize_filename(subject)
-            filename = f"{sanitized_name}_{sanitized_subject}.json"
-            filepath = os.path.join(output_dir, filename)
-
-            # Guardar archivo
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, ensure_ascii=False, indent=2)
+            write_student_subject_json(writer, output_dir, student_id, student_name, subject, feedbacks)
 
             files_created += 1
 
-            # Mostrar progreso cada 10 archivos
-            if files_created % 10 == 0:
-                print(f"  📝 Creados {files_created} archivos...")
+    return total_students, files_created
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Exporta feedbacks 2025 por estudiante y materia")
+    parser.add_argument('input', nargs='?', help='Archivo JSON/NDJSON (default: stdin)')
+    parser.add_argument('--ndjson', action='store_true', help='La entrada es NDJSON (una fila por línea)')
+    parser.add_argument('--sorted', action='store_true',
+                        help='Entrada ordenada por alumno/materia/semana: escribir cada grupo al cerrarse')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Threads/procesos de escritura (default: cantidad de CPUs)')
+    parser.add_argument('--pool', choices=POOL_KINDS, default='thread',
+                        help='Tipo de pool de escritura (default: thread; la escritura es E/S. '
+                             'process copia cada documento entre procesos)')
+    parser.add_argument('--force', action='store_true',
+                        help='Reescribir todos los archivos aunque su contenido no haya cambiado')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='files',
+                        help='files: un JSON por alumno-materia; archive: un único SQLite indexado')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE_PATH,
+                        help=f'Ruta del archivo empaquetado (default: {DEFAULT_ARCHIVE_PATH})')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("EXPORTACIÓN DE FEEDBACKS 2025 - INTELLEGO PLATFORM")
+    print("=" * 80)
+    print()
+
+    # Leer datos desde stdin (Claude Code pasará los datos via pipe) o desde archivo
+    print(f"📡 Leyendo datos desde {args.input or 'entrada estándar'}...")
+
+    # Directorio de salida (o archivo empaquetado) con manifest de cambios
+    output_dir = 'feedbacks_2025_export'
+    writer, _ = create_export_writer(
+        args.format, output_dir, args.archive, args.workers, args.pool, args.force,
+        on_written=print_progress
+    )
+    destination = args.archive if args.format == 'archive' else f"{output_dir}/"
+
+    try:
+        input_stream = open(args.input, encoding='utf-8') if args.input else sys.stdin
+        with input_stream, writer:
+            rows = iter_json_rows(input_stream, ndjson=args.ndjson)
+
+            if args.sorted:
+                print(f"📁 Creando JSONs en '{destination}' a medida que se leen...")
+                print()
+                total_feedbacks, total_students, _ = export_sorted_stream(rows, output_dir, writer)
+            else:
+                total_students, _ = export_organized(rows, output_dir, writer)
+    except json.JSONDecodeError as e:
+        print(f"❌ Error al parsear JSON: {e}")
+        return 1
+    except ValueError as e:
+        print(f"❌ Error: {e}")
+        return 1
+    except Exception as e:
+        print(f"❌ Error inesperado: {e}")
+        return 1
+
+    if args.sorted:
+        print()
+        print(f"✅ Se procesaron {total_feedbacks} feedbacks")
+
+    files_created = writer.report.written
+    if not writer.report.ok:
+        print()
+        writer.report.print_errors()
+        return 1
 
     print()
     print("=" * 80)
@@ -226,9 +399,13 @@ def main():
     print(f"📊 Resumen:")
     print(f"  • Total de estudiantes: {total_students}")
     print(f"  • Total de archivos JSON creados: {files_created}")
-    print(f"  • Directorio de salida: {output_dir}/")
+    print(f"  • Archivos sin cambios (omitidos): {writer.report.skipped}")
+    print(f"  • Salida: {destination}")
     print()
-    print(f"📁 Los archivos tienen el formato: Nombre_Apellido_Materia.json")
+    if args.format == 'archive':
+        print(f"📦 Documentos indexados por (studentId, subject) en {args.archive}")
+    else:
+        print(f"📁 Los archivos tienen el formato: Nombre_Apellido_Materia.json")
     print()
     print("🎯 Próximos pasos:")
     print("  1. Revisa los archivos en el directorio de salida")
@@ -13,6 +13,8 @@ from datetime import datetime
 from collections import defaultdict
 from typing import Dict, List, Any
 
+from week_keys import week_key, week_label
+
 
 def parse_json_field(field_value: Any) -> Any:
     """Parsea campos que pueden estar en formato JSON string"""
@@ -34,16 +36,18 @@ def calculate_statistics(feedbacks: List[Dict]) -> Dict:
     """Calcula estadísticas agregadas de los feedbacks"""
     scores = [f['score'] for f in feedbacks if f['score'] is not None]
 
+    weeks = [f['weekKey'] for f in feedbacks]
+
     stats = {
         'totalFeedbacks': len(feedbacks),
         'feedbacksWithScore': len(scores),
         'averageScore': round(sum(scores) / len(scores), 2) if scores else None,
         'minScore': min(scores) if scores else None,
         'maxScore': max(scores) if scores else None,
-        'weeksCovered': len(set(f['weekStart'] for f in feedbacks)),
+        'weeksCovered': len(set(weeks)),
         'dateRange': {
-            'firstWeek': min(f['weekStart'] for f in feedbacks),
-            'lastWeek': max(f['weekStart'] for f in feedbacks)
+            'firstWeek': week_label(min(weeks)),
+            'lastWeek': week_label(max(weeks))
         }
     }
 
@@ -63,6 +67,9 @@ def organize_feedbacks_by_student_and_subject(feedbacks_data: List[Dict]) -> Dic
         student_id = feedback['studentId']
         subject = feedback['subject']
 
+        # Clave de semana canónica (una sola vez por fila)
+        feedback['weekKey'] = week_key(feedback['weekStart'])
+
         # Parsear campos JSON
         feedback['strengths'] = parse_json_field(feedback['strengths'])
         feedback['improvements'] = parse_json_field(feedback['improvements'])
@@ -80,8 +87,8 @@ def create_student_subject_json(
 ) -> Dict:
     """Crea el JSON estructurado para un estudiante-materia"""
 
-    # Ordenar feedbacks por fecha
-    sorted_feedbacks = sorted(feedbacks, key=lambda x: x['weekStart'])
+    # Ordenar feedbacks por semana
+    sorted_feedbacks = sorted(feedbacks, key=lambda x: x['weekKey'])
 
     # Calcular estadísticas
     stats = calculate_statistics(sorted_feedbacks)
@@ -103,7 +110,7 @@ def create_student_subject_json(
     for fb in sorted_feedbacks:
         feedback_entry = {
             'feedbackId': fb['id'],
-            'weekStart': fb['weekStart'],
+            'weekStart': week_label(fb['weekKey']),
             'score': fb['score'],
             'generalComments': fb['generalComments'],
             'strengths': fb['strengths'],
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Archivo empaquetado de exportación - Intellego Platform
+
+Alternativa a un JSON por alumno-materia: todos los documentos se guardan en
+un único archivo SQLite, indexado por (studentId, subject). Los consumidores
+(por ejemplo los reportes anuales) abren un solo archivo y buscan cada
+documento por clave, en lugar de abrir cientos de archivos.
+
+La escritura ocurre en una única transacción, y un documento cuyo hash de
+contenido no cambió no se reescribe. Al cerrar una exportación completa se
+borran los documentos que ya no existen. Si la exportación se interrumpe
+(close(complete=False)), se confirma lo escrito hasta ese momento sin borrar
+nada: el archivo queda con una mezcla de documentos nuevos y de la corrida
+anterior, y la siguiente corrida retoma desde ahí, omitiendo lo que ya está
+al día.
+ArchiveExportWriter tiene la misma interfaz que ExportWriterPool (submit,
+report, close) y que ExportManifest (is_current, is_source_current), así los
+exportadores pueden usar uno u otro formato sin cambiar su lógica.
+
+Lectura:
+    from export_archive import ExportArchive
+
+    with ExportArchive('feedbacks_2025_export.sqlite') as archive:
+        document = archive.get(student_id, 'Física')
+        for document in archive.iter_documents():
+            ...
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from export_writer import (
+    ExportManifest, ExportWriterPool, MANIFEST_FILENAME, WriteReport
+)
+
+DEFAULT_ARCHIVE_PATH = 'feedbacks_2025_export.sqlite'
+
+OUTPUT_FORMATS = ('files', 'archive')
+
+ARCHIVE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+  studentId TEXT NOT NULL,
+  subject TEXT NOT NULL,
+  studentName TEXT,
+  filename TEXT NOT NULL,
+  contentHash TEXT NOT NULL,
+  source TEXT,
+  document TEXT NOT NULL,
+  updatedAt TEXT NOT NULL,
+  PRIMARY KEY (studentId, subject)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_documents_filename ON documents(filename);
+
+CREATE TABLE IF NOT EXISTS archive_metadata (
+  key TEXT PRIMARY KEY,
+  value TEXT
+);
+"""
+
+
+def split_key(key: str) -> Tuple[str, str]:
+    """Clave de documento 'studentId|subject' → (studentId, subject)"""
+    student_id, subject = key.split('|', 1)
+    return student_id, subject
+
+
+class ExportArchive:
+    """Lectura de un archivo empaquetado de exportación"""
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No existe el archivo de exportación: {path}")
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def __enter__(self) -> "ExportArchive":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, student_id: str, subject: str) -> Optional[Dict[str, Any]]:
+        """Documento de un alumno-materia (búsqueda por clave primaria) o None"""
+        row = self.conn.execute(
+            "SELECT document FROM documents WHERE studentId = ? AND subject = ?",
+            (student_id, subject)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_by_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Documento por el nombre de archivo que tendría en el formato de archivos sueltos"""
+        row = self.conn.execute(
+            "SELECT document FROM documents WHERE filename = ?", (filename,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def keys(self) -> List[Tuple[str, str]]:
+        """Todas las claves (studentId, subject) del archivo"""
+        return self.conn.execute(
+            "SELECT studentId, subject FROM documents ORDER BY studentName, subject"
+        ).fetchall()
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """Recorre todos los documentos en una sola lectura secuencial"""
+        cursor = self.conn.execute(
+            "SELECT document FROM documents ORDER BY studentName, subject"
+        )
+        for (document,) in cursor:
+            yield json.loads(document)
+
+    def metadata(self) -> Dict[str, str]:
+        """Metadatos de la última exportación (exportedAt, documentCount)"""
+        return dict(self.conn.execute("SELECT key, value FROM archive_metadata"))
+
+
+class ArchiveExportWriter:
+    """Escritor de documentos en un archivo empaquetado (misma interfaz que ExportWriterPool)"""
+
+    def __init__(self, path: str = DEFAULT_ARCHIVE_PATH,
+                 on_written: Optional[Callable[[int], None]] = None,
+                 force: bool = False):
+        """
+        Args:
+            path: Ruta del archivo SQLite (se crea si no existe)
+            on_written: Callback con el total escrito
+            force: Reescribir todos los documentos aunque no hayan cambiado
+        """
+        self.path = path
+        self.on_written = on_written
+        self.force = force
+        self.report = WriteReport()
+        self.seen: Set[Tuple[str, str]] = set()
+
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(ARCHIVE_SCHEMA)
+        self.conn.execute("BEGIN")
+
+    def __enter__(self) -> "ArchiveExportWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(complete=exc_type is None)
+
+    # Interfaz de manifest -------------------------------------------------
+
+    def _stored(self, key: str) -> Optional[Tuple[str, Optional[str], str]]:
+        """(contentHash, source, filename) guardados para la clave, o None"""
+        student_id, subject = split_key(key)
+        self.seen.add((student_id, subject))
+        if self.force:
+            return None
+        return self.conn.execute(
+            "SELECT contentHash, source, filename FROM documents WHERE studentId = ? AND subject = ?",
+            (student_id, subject)
+        ).fetchone()
+
+    def is_current(self, key: str, filepath: str, digest: str) -> bool:
+        """True si el documento guardado tiene el mismo hash de contenido"""
+        stored = self._stored(key)
+        return stored is not None and stored[0] == digest and stored[2] == os.path.basename(filepath)
+
+    def is_source_current(self, key: str, filepath: str, source: str) -> bool:
+        """True si la huella de origen guardada no cambió"""
+        stored = self._stored(key)
+        return stored is not None and stored[1] == source and stored[2] == os.path.basename(filepath)
+
+    # Interfaz de writer ---------------------------------------------------
+
+    def submit(self, filepath: str, data: Any, key: Optional[str] = None,
+               payload: Any = None, source: Optional[str] = None) -> bool:
+        """
+        Guarda un documento en el archivo
+
+        Args:
+            filepath: Ruta que tendría como archivo suelto (se guarda su nombre)
+            data: Documento completo
+            key: Clave 'studentId|subject' (obligatoria)
+            payload: Parte de `data` que se hashea (default: `data` completo)
+            source: Huella de origen
+
+        Returns:
+            False si el documento no cambió y se omitió
+        """
+        if key is None:
+            raise ValueError("El archivo empaquetado requiere key='studentId|subject'")
+
+        digest = ExportManifest.content_hash(data if payload is None else payload)
+        if self.is_current(key, filepath, digest):
+            if source is not None:
+                student_id, subject = split_key(key)
+                self.conn.execute(
+                    "UPDATE documents SET source = ? WHERE studentId = ? AND subject = ?",
+                    (source, student_id, subject)
+                )
+            self.report.skipped += 1
+            return False
+
+        student_id, subject = split_key(key)
+        metadata = data.get('metadata', {}) if isinstance(data, dict) else {}
+        try:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO documents
+                  (studentId, subject, studentName, filename, contentHash, source, document, updatedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    student_id, subject, metadata.get('studentName'), os.path.basename(filepath),
+                    digest, source, json.dumps(data, ensure_ascii=False, separators=(',', ':')),
+                    datetime.now().isoformat()
+                )
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            self.report.errors.append((os.path.basename(filepath), str(e)))
+            return True
+
+        self.report.written += 1
+        if self.on_written:
+            self.on_written(self.report.written)
+        return True
+
+    def close(self, complete: bool = True) -> WriteReport:
+        """
+        Confirma la transacción
+
+        También con complete=False: lo escrito hasta la interrupción se
+        conserva para que la próxima corrida lo omita.
+
+        Args:
+            complete: False si la exportación se interrumpió (no se borran
+                documentos que no llegaron a verse)
+        """
+        if complete:
+            existing = self.conn.execute("SELECT studentId, subject FROM documents").fetchall()
+            stale = [key for key in existing if key not in self.seen]
+            self.conn.executemany(
+                "DELETE FROM documents WHERE studentId = ? AND subject = ?", stale
+            )
+
+        count = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO archive_metadata (key, value) VALUES (?, ?)",
+            [('exportedAt', datetime.now().isoformat()), ('documentCount', str(count))]
+        )
+        self.conn.commit()
+        self.conn.close()
+        return self.report
+
+
+def create_export_writer(
+    output_format: str,
+    output_dir: str,
+    archive_path: str = DEFAULT_ARCHIVE_PATH,
+    workers: int = 4,
+    pool: str = 'thread',
+    force: bool = False,
+    on_written: Optional[Callable[[int], None]] = None
+) -> Tuple[Any, Any]:
+    """
+    Crea el writer de exportación según el formato de salida
+
+    Args:
+        output_format: 'files' (un JSON por alumno-materia) o 'archive' (un único SQLite)
+        output_dir: Directorio de los JSON (en 'archive' solo define los nombres de archivo)
+        archive_path: Ruta del archivo empaquetado
+        workers: Threads/procesos de escritura (solo 'files')
+        pool: Tipo de pool de escritura (solo 'files')
+        force: Reescribir todo aunque no haya cambios
+        on_written: Callback de progreso
+
+    Returns:
+        Tupla (writer, manifest): el writer acepta submit/close/report y el
+        manifest is_current/is_source_current
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato inválido: {output_format}. Opciones: {', '.join(OUTPUT_FORMATS)}")
+
+    if output_format == 'archive':
+        writer = ArchiveExportWriter(archive_path, on_written=on_written, force=force)
+        return writer, writer
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Manifest de hashes por alumno-materia: solo se reescriben los archivos que cambiaron
+    manifest = ExportManifest(os.path.join(output_dir, MANIFEST_FILENAME))
+    if force:
+        manifest.entries.clear()
+
+    writer = ExportWriterPool(workers, pool, on_written=on_written, manifest=manifest)
+    return writer, manifest
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Pool de escritura para exportaciones JSON - Intellego Platform
+
+Serializa y escribe documentos JSON en paralelo (threads o procesos) con
+escritura atómica: cada archivo se escribe primero en un temporal del mismo
+directorio y se renombra con os.replace, así nunca queda un JSON a medio
+escribir si el proceso se interrumpe.
+
+La cantidad de documentos en vuelo está acotada (workers × 4) para que el
+productor (por ejemplo la exportación en streaming) no acumule memoria, y los
+errores se agregan en un único reporte al final.
+
+Con un ExportManifest, cada documento se identifica por una clave (por ejemplo
+studentId|subject) y un hash del contenido exportado (sin sellos de tiempo):
+si el hash coincide con el de la corrida anterior y el archivo existe, el
+documento no se vuelve a escribir. Opcionalmente cada entrada guarda además una
+huella del origen (por ejemplo cantidad de filas + último updatedAt) para
+decidir antes de descargar los datos si un documento puede haber cambiado.
+
+Uso:
+    from export_writer import ExportWriterPool
+
+    with ExportWriterPool(workers=4) as writer:
+        for path, document in documents:
+            writer.submit(path, document)
+
+    print(writer.report.written, writer.report.errors)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+POOL_KINDS = ('thread', 'process')
+
+MANIFEST_FILENAME = '.export_manifest.json'
+MANIFEST_VERSION = 1
+
+# mkstemp crea los temporales con 0600; los archivos finales respetan el umask
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+def atomic_write_json(filepath: str, data: Any) -> str:
+    """
+    Escribe `data` como JSON en `filepath` de forma atómica
+
+    Args:
+        filepath: Ruta destino
+        data: Documento serializable
+
+    Returns:
+        La ruta escrita
+    """
+    directory = os.path.dirname(filepath) or '.'
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return filepath
+
+
+class ExportManifest:
+    """Hash de contenido por documento exportado, persistido entre corridas"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Ruta del manifest (se crea al guardar si no existe)
+        """
+        self.path = path
+        self.entries: Dict[str, Dict[str, str]] = {}
+        self.seen: Set[str] = set()
+
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.entries = data.get('entries', {})
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️  Manifest ilegible ({e}), se regeneran todos los archivos")
+
+    @staticmethod
+    def content_hash(payload: Any) -> str:
+        """Hash estable (sha256) de la parte del documento que depende de los datos"""
+        canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def is_current(self, key: str, filepath: str, digest: str) -> bool:
+        """True si el documento no cambió desde la última corrida y su archivo sigue en disco"""
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        return (
+            entry is not None
+            and entry.get('hash') == digest
+            and entry.get('file') == os.path.basename(filepath)
+            and os.path.exists(filepath)
+        )
+
+    def is_source_current(self, key: str, filepath: str, source: str) -> bool:
+        """True si la huella de origen no cambió y el archivo sigue en disco (sin mirar el contenido)"""
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        return (
+            entry is not None
+            and entry.get('source') == source
+            and entry.get('file') == os.path.basename(filepath)
+            and os.path.exists(filepath)
+        )
+
+    def record(self, key: str, filepath: str, digest: str, source: Optional[str] = None) -> None:
+        """Registra un documento escrito (o verificado sin cambios)"""
+        self.seen.add(key)
+        entry = {'hash': digest, 'file': os.path.basename(filepath)}
+        if source is not None:
+            entry['source'] = source
+        self.entries[key] = entry
+
+    def save(self, prune: bool = True) -> None:
+        """
+        Guarda el manifest
+
+        Args:
+            prune: Descartar documentos que no aparecieron en esta corrida
+                (solo si la exportación terminó completa)
+        """
+        entries = self.entries
+        if prune:
+            entries = {key: entry for key, entry in entries.items() if key in self.seen}
+        atomic_write_json(self.path, {
+            'version': MANIFEST_VERSION,
+            'updatedAt': datetime.now().isoformat(),
+            'entries': entries
+        })
+
+
+@dataclass
+class WriteReport:
+    """Resultado agregado de la escritura"""
+    written: int = 0
+    skipped: int = 0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def print_errors(self, limit: int = 20) -> None:
+        """Imprime el reporte de errores de escritura"""
+        if not self.errors:
+            return
+
+        print(f"❌ {len(self.errors)} archivos no se pudieron escribir:")
+        for filepath, error in self.errors[:limit]:
+            print(f"  • {filepath}: {error}")
+        if len(self.errors) > limit:
+            print(f"  ... y {len(self.errors) - limit} más")
+
+
+class ExportWriterPool:
+    """Escritor de documentos JSON sobre un pool acotado de threads o procesos"""
+
+    def __init__(self, workers: int = 4, kind: str = 'thread',
+                 on_written: Optional[Callable[[int], None]] = None,
+                 manifest: Optional[ExportManifest] = None):
+        """
+        Args:
+            workers: Cantidad de threads/procesos de escritura
+            kind: 'thread' (por defecto: el trabajo es E/S de archivos) o 'process'
+                  (cada documento se copia al proceso hijo; solo conviene si domina la serialización)
+            on_written: Callback con el total escrito, llamado en el thread principal
+            manifest: Manifest para omitir documentos sin cambios (se guarda en close)
+        """
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Tipo de pool inválido: {kind}. Opciones: {', '.join(POOL_KINDS)}")
+
+        self.workers = max(1, workers)
+        self.max_pending = self.workers * 4
+        self.on_written = on_written
+        self.manifest = manifest
+        self.report = WriteReport()
+
+        executor_class = ProcessPoolExecutor if kind == 'process' else ThreadPoolExecutor
+        self._executor = executor_class(max_workers=self.workers)
+        self._pending: Dict[Future, Tuple[str, Optional[str], Optional[str], Optional[str]]] = {}
+
+    def __enter__(self) -> "ExportWriterPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close(complete=exc_type is None)
+
+    def _reap(self, done: Set[Future]) -> None:
+        """Registra el resultado de las escrituras terminadas"""
+        for future in done:
+            filepath, key, digest, source = self._pending.pop(future)
+            error = future.exception()
+            if error is not None:
+                self.report.errors.append((filepath, str(error)))
+                continue
+
+            if self.manifest is not None and key is not None:
+                self.manifest.record(key, filepath, digest, source)
+
+            self.report.written += 1
+            if self.on_written:
+                self.on_written(self.report.written)
+
+    def submit(self, filepath: str, data: Any, key: Optional[str] = None,
+               payload: Any = None, source: Optional[str] = None) -> bool:
+        """
+        Encola un documento; bloquea si ya hay `max_pending` en vuelo
+
+        Args:
+            filepath: Ruta destino
+            data: Documento completo a escribir
+            key: Identificador estable del documento en el manifest
+            payload: Parte de `data` que se hashea (default: `data` completo)
+            source: Huella de origen a registrar en el manifest (ver is_source_current)
+
+        Returns:
+            False si el documento no cambió y se omitió
+        """
+        digest = None
+        if self.manifest is not None and key is not None:
+            digest = ExportManifest.content_hash(data if payload is None else payload)
+            if self.manifest.is_current(key, filepath, digest):
+                self.manifest.record(key, filepath, digest, source)
+                self.report.skipped += 1
+                return False
+
+        if len(self._pending) >= self.max_pending:
+            done, _ = wait(self._pending, return_when=FIRST_COMPLETED)
+            self._reap(done)
+
+        future = self._executor.submit(atomic_write_json, filepath, data)
+        self._pending[future] = (filepath, key, digest, source)
+        return True
+
+    def close(self, complete: bool = True) -> WriteReport:
+        """
+        Espera las escrituras pendientes, libera el pool y guarda el manifest
+
+        Args:
+            complete: False si la exportación se interrumpió (no se podan
+                entradas del manifest que no llegaron a verse)
+        """
+        if self._pending:
+            done, _ = wait(self._pending)
+            self._reap(done)
+        self._executor.shutdown()
+
+        if self.manifest is not None:
+            self.manifest.save(prune=complete)
+        return self.report
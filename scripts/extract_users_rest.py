@@ -2,129 +2,57 @@
 """
 Script para extraer todos los usuarios de Turso usando HTTP REST API
 Genera archivos CSV y JSON con la información completa
+
+El resultado se guarda en el caché de queries (ver query_cache.py) y se
+invalida cuando cambia la tabla User; --refresh fuerza la descarga.
 """
 
+import argparse
 import os
 import json
 import csv
-import requests
+from collections import Counter
 from datetime import datetime
 
+from query_cache import CachedTursoClient, add_cache_arguments, cache_from_args
+from turso_http import ColumnarResult
+
 # Configuración
 TURSO_DATABASE_URL = os.environ.get("TURSO_DATABASE_URL")
 TURSO_AUTH_TOKEN = os.environ.get("TURSO_AUTH_TOKEN")
 
-def get_turso_http_url():
-    """Convierte la URL de WebSocket a HTTP"""
-    if not TURSO_DATABASE_URL:
-        raise ValueError("TURSO_DATABASE_URL no está configurada")
-
-    # Convertir libsql:// o wss:// a https://
-    url = TURSO_DATABASE_URL.replace("libsql://", "https://").replace("wss://", "https://")
-
-    # Asegurar que termine con /v2/pipeline para el API REST
-    if not url.endswith("/v2/pipeline"):
-        if url.endswith("/"):
-            url = url[:-1]
-        url = url + "/v2/pipeline"
-
-    return url
-
-def execute_query(query):
-    """Ejecuta una query usando el API REST de Turso"""
-    url = get_turso_http_url()
-
-    headers = {
-        "Authorization": f"Bearer {TURSO_AUTH_TOKEN}",
-        "Content-Type": "application/json"
-    }
-
-    # Formato de request para Turso HTTP API
-    payload = {
-        "requests": [
-            {
-                "type": "execute",
-                "stmt": {
-                    "sql": query
-                }
-            }
-        ]
-    }
-
-    response = requests.post(url, headers=headers, json=payload)
-
-    if response.status_code != 200:
-        raise Exception(f"Error en query: {response.status_code} - {response.text}")
+def parse_turso_response(query_result):
+    """
+    Parsea el resultado de Turso (cols + rows) en un ColumnarResult
 
-    return response.json()
+    Los nombres y tipos de columna se resuelven una sola vez y los valores se
+    guardan por columna; las filas como dict solo se crean al exportar a JSON.
+    """
+    return ColumnarResult.from_hrana(query_result)
 
-def parse_turso_response(response_data):
-    """Parsea la respuesta de Turso y devuelve lista de usuarios"""
-    results = response_data.get("results", [])
+def count_values(users, column, default="N/A", skip_empty=False):
+    """Cuenta las ocurrencias de cada valor de una columna"""
+    if column not in users.columns:
+        return {} if skip_empty else ({default: len(users)} if len(users) else {})
 
-    if not results:
-        return []
-
-    result = results[0]
-    response = result.get("response", {})
-
-    # El resultado está en response.result
-    query_result = response.get("result", {})
-    cols = query_result.get("cols", [])
-    rows = query_result.get("rows", [])
-
-    users = []
-    for row in rows:
-        user = {}
-        for i, col_name in enumerate(cols):
-            col_name_str = col_name.get("name", f"col_{i}")
-            # Los valores vienen en un array, obtener el valor
-            value = row[i]
-            # Si el valor es un dict con "type" y "value", extraer el valor
-            if isinstance(value, dict) and "value" in value:
-                user[col_name_str] = value.get("value")
-            else:
-                user[col_name_str] = value
-
-        users.append(user)
-
-    return users
+    values = users.column(column)
+    if skip_empty:
+        values = [value for value in values if value]
+    return dict(Counter(values))
 
 def calculate_statistics(users):
     """Calcula estadísticas de los usuarios"""
     stats = {
         "total_users": len(users),
-        "by_role": {},
-        "by_status": {},
-        "by_sede": {},
-        "by_academic_year": {},
-        "by_division": {}
+        # Por rol y estado
+        "by_role": count_values(users, "role"),
+        "by_status": count_values(users, "status"),
+        # Por sede, año académico y división (solo valores presentes)
+        "by_sede": count_values(users, "sede", skip_empty=True),
+        "by_academic_year": count_values(users, "academicYear", skip_empty=True),
+        "by_division": count_values(users, "division", skip_empty=True)
     }
 
-    for user in users:
-        # Por rol
-        role = user.get("role", "N/A")
-        stats["by_role"][role] = stats["by_role"].get(role, 0) + 1
-
-        # Por estado
-        status = user.get("status", "N/A")
-        stats["by_status"][status] = stats["by_status"].get(status, 0) + 1
-
-        # Por sede
-        if user.get("sede"):
-            sede = user["sede"]
-            stats["by_sede"][sede] = stats["by_sede"].get(sede, 0) + 1
-
-        # Por año académico
-        if user.get("academicYear"):
-            year = user["academicYear"]
-            stats["by_academic_year"][year] = stats["by_academic_year"].get(year, 0) + 1
-
-        # Por división
-        if user.get("division"):
-            div = user["division"]
-            stats["by_division"][div] = stats["by_division"].get(div, 0) + 1
-
     return stats
 
 def export_to_json(users, stats, filename):
@@ -134,7 +62,7 @@ def export_to_json(users, stats, filename):
     export_data = {
         "export_timestamp": timestamp,
         "statistics": stats,
-        "users": users
+        "users": users.to_dicts()
     }
 
     with open(filename, 'w', encoding='utf-8') as f:
@@ -144,15 +72,13 @@ def export_to_json(users, stats, filename):
 
 def export_to_csv(users, filename):
     """Exporta usuarios a CSV"""
-    if not users:
+    if not len(users):
         return
 
-    fieldnames = users[0].keys()
-
     with open(filename, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(users)
+        writer = csv.writer(f)
+        writer.writerow(users.names)
+        writer.writerows(users.tuples())
 
     print(f"✅ Archivo CSV exportado: {filename}")
 
@@ -189,6 +115,10 @@ def print_statistics(stats):
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Extrae todos los usuarios de Turso a CSV y JSON")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
     print("=" * 60)
     print("🎓 INTELLEGO PLATFORM - Extractor de Usuarios")
     print("=" * 60)
@@ -220,13 +150,17 @@ def main():
 
         # Ejecutar query
         print("📊 Ejecutando query...")
-        response = execute_query(query)
+        cache = cache_from_args(args)
+        with CachedTursoClient(TURSO_DATABASE_URL, TURSO_AUTH_TOKEN, cache=cache) as client:
+            response = client.execute_raw(query, depends_on=('User',))
+        if cache:
+            print(cache.summary())
 
         # Parsear resultados
         print("📝 Procesando resultados...")
         users = parse_turso_response(response)
 
-        if not users:
+        if not len(users):
             print("⚠️  No se encontraron usuarios")
             return
 
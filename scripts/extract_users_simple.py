@@ -9,6 +9,8 @@ import csv
 import sys
 from datetime import datetime
 
+from json_stream import iter_json_rows
+
 def calculate_statistics(users):
     """Calcula estadísticas de los usuarios"""
     stats = {
@@ -119,12 +121,12 @@ def main():
     try:
         # Leer datos de stdin si se proporcionan
         if not sys.stdin.isatty():
-            input_data = sys.stdin.read()
-            data = json.loads(input_data)
-            users = data.get("rows", [])
+            # Lectura incremental: una sola copia de los usuarios en memoria
+            users = list(iter_json_rows(sys.stdin))
         else:
             print("⚠️  Este script espera datos JSON desde stdin")
             print("📖 Uso: cat users_data.json | python3 extract_users_simple.py")
+            print("   (acepta JSON con clave \"rows\", array de usuarios o NDJSON)")
             print("\n💡 O proporciona los datos como argumento:")
             print("   python3 extract_users_simple.py '[{...}]'")
 
@@ -2,21 +2,57 @@
 """
 Script Completo: Obtener y Exportar Feedbacks 2025
 Conecta directamente a Turso usando las credenciales del proyecto.
+
+Las estadísticas por alumno-materia se calculan en Turso con un único
+GROUP BY; los textos largos (comentarios, fortalezas, mejoras) se descargan
+solo para los grupos que hay que escribir (nuevos o con cambios según el
+manifest). Con --stats-only se obtienen únicamente las estadísticas.
+
+El detalle se descarga en páginas de --page-size filas con paginación por
+clave (keyset) sobre (studentId, subject, weekStart, id): cada página retoma
+después de la última fila recibida, sin OFFSET. Cada alumno-materia se escribe
+apenas llega su última fila, así la descarga se superpone con la escritura y
+una corrida interrumpida deja registrados en el manifest los grupos ya
+escritos (la siguiente corrida solo descarga los que faltan).
+
+Los alumnos se dividen en --partitions rangos de studentId (la primera
+columna del índice, así cada partición lee una porción disjunta) con
+cantidades de filas parecidas según las estadísticas, y se descargan en
+paralelo con hasta --connections requests simultáneos. Cada partición pagina
+por su cuenta (un error o timeout se reintenta solo en esa partición, desde
+su última fila) y entrega sus alumno-materia completos a medida que los
+termina: los grupos se escriben en el orden en que llegan.
+
+Con --format archive los documentos se guardan en un único archivo SQLite
+indexado por (studentId, subject) en lugar de un JSON por alumno-materia.
+
+Las queries pasan por el caché en disco (query_cache.py), invalidado cuando
+cambian Feedback o User: repetir la exportación sin cambios en la base no
+descarga nada. --refresh fuerza la descarga.
 """
 
+import argparse
+import itertools
 import json
 import os
+import queue
 import sys
+import threading
+from contextlib import nullcontext
 from datetime import datetime
-from collections import defaultdict
-from typing import Dict, List, Any
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Sequence, Tuple
+
+from export_archive import DEFAULT_ARCHIVE_PATH, OUTPUT_FORMATS, create_export_writer
+from export_writer import POOL_KINDS, atomic_write_json
+from week_keys import sql_week_key, week_key, week_label
 
 # Importar cliente de Turso
 try:
-    from libsql_client import create_client
+    from query_cache import CachedTursoClient, QueryCache, add_cache_arguments, cache_from_args
+    from turso_http import TursoError
 except ImportError:
-    print("❌ Error: Necesitas instalar libsql_client")
-    print("Ejecuta: pip3 install libsql-client")
+    print("❌ Error: Necesitas instalar requests")
+    print("Ejecuta: pip3 install -r scripts/requirements.txt")
     sys.exit(1)
 
 
@@ -25,60 +61,406 @@ except ImportError:
 TURSO_DATABASE_URL = os.getenv('TURSO_DATABASE_URL')
 TURSO_AUTH_TOKEN = os.getenv('TURSO_AUTH_TOKEN')
 
-
-def get_all_feedbacks_2025():
-    """Obtiene todos los feedbacks de 2025 desde Turso"""
-
+YEAR_START = '2025-01-01'
+YEAR_END = '2026-01-01'
+YEAR_FILTER = f"f.weekStart >= '{YEAR_START}' AND f.weekStart < '{YEAR_END}'"
+
+# Semana canónica (entero) calculada en Turso, igual que week_key() en Python
+WEEK_KEY_SQL = sql_week_key('f.weekStart')
+
+# Agregados por alumno-materia (sin textos). lastUpdatedAt + totalFeedbacks
+# forman la huella de origen para detectar grupos con cambios. La semana
+# canónica se calcula una vez por fila en la subquery.
+STATISTICS_QUERY = f"""
+    SELECT
+      f.studentId,
+      MIN(u.name) as studentName,
+      f.subject,
+      COUNT(*) as totalFeedbacks,
+      COUNT(f.score) as feedbacksWithScore,
+      SUM(f.score) as scoreSum,
+      MIN(f.score) as minScore,
+      MAX(f.score) as maxScore,
+      COUNT(DISTINCT f.weekKey) as weeksCovered,
+      MIN(f.weekKey) as firstWeekKey,
+      MAX(f.weekKey) as lastWeekKey,
+      MAX(f.updatedAt) as lastUpdatedAt
+    FROM (
+      SELECT f.studentId, f.subject, f.score, f.updatedAt, {WEEK_KEY_SQL} as weekKey
+      FROM Feedback f
+      WHERE {YEAR_FILTER}
+    ) f
+    JOIN User u ON f.studentId = u.id
+    GROUP BY f.studentId, f.subject
+    ORDER BY studentName, f.subject
+    """
+
+# Columnas de paginación por clave: orden total y estable de las filas,
+# resuelto con idx_feedback_export_keyset sin ordenar en el servidor
+KEYSET_COLUMNS = ('studentId', 'subject', 'weekStart', 'id')
+
+# Página de detalle completo. {groups_filter} restringe a los grupos indicados
+# (vacío = todo el año), {range_filter} a una partición de studentId y
+# {after_filter} retoma después de la última fila recibida
+FEEDBACK_PAGE_QUERY = f"""
+    SELECT
+      f.id,
+      f.studentId,
+      f.subject,
+      f.weekStart,
+      f.score,
+      f.generalComments,
+      f.strengths,
+      f.improvements,
+      f.createdAt
+    FROM Feedback f
+    WHERE {YEAR_FILTER}{{range_filter}}{{groups_filter}}{{after_filter}}
+    ORDER BY f.studentId, f.subject, f.weekStart, f.id
+    LIMIT ?
+    """
+
+RANGE_FROM_FILTER = "\n      AND f.studentId >= ?"
+RANGE_TO_FILTER = "\n      AND f.studentId < ?"
+GROUPS_FILTER = "\n      AND (f.studentId, f.subject) IN (VALUES {groups})"
+AFTER_FILTER = "\n      AND (f.studentId, f.subject, f.weekStart, f.id) > (?, ?, ?, ?)"
+
+# Tablas cuya huella (COUNT + MAX(updatedAt)) invalida el caché de cada query
+STATISTICS_TABLES = ('Feedback', 'User')
+DETAIL_TABLES = ('Feedback',)
+
+# Grupos por query de detalle (2 parámetros por grupo)
+GROUPS_PER_QUERY = 200
+
+# Filas por página de detalle (los textos largos dominan el tamaño de la respuesta)
+DEFAULT_PAGE_SIZE = 500
+
+# Descarga particionada: rangos de studentId y requests simultáneos
+DEFAULT_PARTITIONS = 12
+DEFAULT_CONNECTIONS = 4
+
+# Alumno-materia completos a la espera de escribirse (acota la memoria)
+PARTITION_QUEUE_GROUPS = 100
+
+# Partición [desde, hasta) de studentId; None en un extremo = rango abierto
+StudentRange = Tuple[Optional[str], Optional[str]]
+
+_PARTITION_DONE = object()
+
+
+def check_credentials():
+    """Verifica que las credenciales de Turso estén configuradas"""
     if not TURSO_DATABASE_URL or not TURSO_AUTH_TOKEN:
         print("❌ Error: Variables de entorno TURSO_DATABASE_URL o TURSO_AUTH_TOKEN no encontradas")
         print("Asegúrate de que el archivo .env esté configurado correctamente")
         sys.exit(1)
 
-    print("📡 Conectando a base de datos Turso...")
 
-    try:
-        client = create_client(
-            url=TURSO_DATABASE_URL,
-            auth_token=TURSO_AUTH_TOKEN
-        )
-
-        query = """
-        SELECT
-          f.id,
-          f.studentId,
-          u.name as studentName,
-          f.subject,
-          f.weekStart,
-          f.score,
-          f.generalComments,
-          f.strengths,
-          f.improvements,
-          f.createdAt
-        FROM Feedback f
-        JOIN User u ON f.studentId = u.id
-        WHERE f.weekStart >= '2025-01-01' AND f.weekStart < '2026-01-01'
-        ORDER BY u.name, f.subject, f.weekStart
-        """
-
-        print("🔍 Ejecutando query SQL...")
-        result = client.execute(query)
-
-        # Convertir resultado a lista de diccionarios
-        feedbacks_data = []
-        if hasattr(result, 'rows'):
-            for row in result.rows:
-                # row es un diccionario
-                feedbacks_data.append(row)
-
-        print(f"✅ Se obtuvieron {len(feedbacks_data)} feedbacks")
-
-        return feedbacks_data
+def statistics_from_row(row: Dict) -> Dict:
+    """Convierte una fila de STATISTICS_QUERY al formato de calculate_statistics"""
+    with_score = row['feedbacksWithScore']
 
+    return {
+        'totalFeedbacks': row['totalFeedbacks'],
+        'feedbacksWithScore': with_score,
+        'averageScore': round(row['scoreSum'] / with_score, 2) if with_score else None,
+        'minScore': row['minScore'],
+        'maxScore': row['maxScore'],
+        'weeksCovered': row['weeksCovered'],
+        'dateRange': {
+            'firstWeek': week_label(row['firstWeekKey']),
+            'lastWeek': week_label(row['lastWeekKey'])
+        }
+    }
+
+
+def source_fingerprint(group: Dict) -> str:
+    """Huella de origen de un grupo: cambia si se agrega, borra o actualiza un feedback"""
+    return f"{group['totalFeedbacks']}|{group['lastUpdatedAt']}|{group['studentName']}"
+
+
+def get_feedback_statistics_2025(client: CachedTursoClient) -> List[Dict]:
+    """
+    Obtiene las estadísticas de todos los alumno-materia de 2025 con un GROUP BY
+
+    Returns:
+        Lista de grupos con studentId, studentName, subject, statistics y
+        lastUpdatedAt, ordenada por nombre y materia
+    """
+    print("🔍 Calculando estadísticas en Turso (GROUP BY studentId, subject)...")
+    result = client.execute_columnar(STATISTICS_QUERY, depends_on=STATISTICS_TABLES)
+
+    groups = []
+    for row in result.rows():
+        groups.append({
+            'studentId': row['studentId'],
+            'studentName': row['studentName'],
+            'subject': row['subject'],
+            'totalFeedbacks': row['totalFeedbacks'],
+            'lastUpdatedAt': row['lastUpdatedAt'],
+            'statistics': statistics_from_row(row)
+        })
+
+    print(f"✅ {len(groups)} combinaciones alumno-materia")
+    return groups
+
+
+def build_feedback_page_query(
+    groups: Optional[Sequence[Dict]],
+    after: Optional[Tuple[Any, ...]],
+    page_size: int,
+    student_range: Optional[StudentRange] = None
+) -> Tuple[str, List[Any]]:
+    """
+    Arma la query de una página de detalle
+
+    Args:
+        groups: Grupos a incluir (None = todos los feedbacks del año)
+        after: Clave (studentId, subject, weekStart, id) de la última fila recibida
+        page_size: Máximo de filas de la página
+        student_range: Partición [desde, hasta) de studentId (None en un extremo = abierto)
+
+    Returns:
+        Tupla (sql, parámetros)
+    """
+    params: List[Any] = []
+    range_filter = ''
+    if student_range is not None:
+        range_from, range_to = student_range
+        if range_from is not None:
+            range_filter += RANGE_FROM_FILTER
+            params.append(range_from)
+        if range_to is not None:
+            range_filter += RANGE_TO_FILTER
+            params.append(range_to)
+
+    groups_filter = ''
+    if groups is not None:
+        groups_filter = GROUPS_FILTER.format(groups=', '.join(['(?, ?)'] * len(groups)))
+        params.extend(value for group in groups for value in (group['studentId'], group['subject']))
+
+    after_filter = ''
+    if after is not None:
+        after_filter = AFTER_FILTER
+        params.extend(after)
+
+    params.append(page_size)
+    query = FEEDBACK_PAGE_QUERY.format(
+        range_filter=range_filter, groups_filter=groups_filter, after_filter=after_filter
+    )
+    return query, params
+
+
+def iter_feedback_pages(
+    client: CachedTursoClient,
+    groups: Optional[List[Dict]],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    student_range: Optional[StudentRange] = None,
+    request_slots: Optional[threading.Semaphore] = None
+) -> Iterator[List[Dict]]:
+    """
+    Descarga los feedbacks completos (con textos) página por página
+
+    Las filas llegan ordenadas por (studentId, subject, weekStart, id), así
+    los feedbacks de cada alumno-materia quedan contiguos entre páginas.
+
+    Args:
+        client: Cliente HTTP de Turso
+        groups: Grupos de get_feedback_statistics_2025 a descargar (None = todo el año)
+        page_size: Filas por página
+        student_range: Partición [desde, hasta) de studentId (None = todos los alumnos)
+        request_slots: Semáforo que limita los requests simultáneos entre particiones
+
+    Yields:
+        Cada página como lista de dicts
+    """
+    if groups is None:
+        chunks: List[Optional[List[Dict]]] = [None]
+    else:
+        # Mismo orden que las filas: el flujo completo queda ordenado por clave
+        ordered = sorted(groups, key=lambda group: (group['studentId'], group['subject']))
+        chunks = [ordered[start:start + GROUPS_PER_QUERY]
+                  for start in range(0, len(ordered), GROUPS_PER_QUERY)]
+
+    for chunk in chunks:
+        after = None
+        while True:
+            query, params = build_feedback_page_query(chunk, after, page_size, student_range)
+            with request_slots or nullcontext():
+                page = client.execute_columnar(query, params, depends_on=DETAIL_TABLES).to_dicts()
+            if page:
+                yield page
+            if len(page) < page_size:
+                break
+            after = keyset_key(page[-1])
+
+
+def keyset_key(feedback: Dict) -> Tuple[Any, ...]:
+    """Clave de orden de una fila de detalle (la misma del ORDER BY)"""
+    return tuple(feedback[column] for column in KEYSET_COLUMNS)
+
+
+def student_partitions(groups: List[Dict], count: int) -> List[StudentRange]:
+    """
+    Divide los alumnos en `count` rangos [desde, hasta) de studentId con
+    cantidades de filas parecidas
+
+    studentId es la primera columna de idx_feedback_export_keyset: cada rango
+    es una porción disjunta del índice. Los extremos quedan abiertos, así un
+    alumno que aparece después de la query de estadísticas igual se descarga.
+
+    Args:
+        groups: Grupos de get_feedback_statistics_2025 (totalFeedbacks pesa cada alumno)
+        count: Cantidad de particiones (a lo sumo una por alumno)
+
+    Returns:
+        Lista de rangos contiguos, ordenados, que cubren todos los studentId
+    """
+    rows_by_student: Dict[str, int] = {}
+    for group in groups:
+        student_id = group['studentId']
+        rows_by_student[student_id] = rows_by_student.get(student_id, 0) + group['totalFeedbacks']
+
+    students = sorted(rows_by_student)
+    count = max(1, min(count, len(students)))
+    total_rows = sum(rows_by_student.values())
+
+    # Cada partición arranca en el primer alumno que supera su parte de las filas
+    bounds: List[str] = []
+    cumulative = 0
+    for student_id in students:
+        if cumulative >= total_rows * (len(bounds) + 1) / count and len(bounds) < count - 1:
+            bounds.append(student_id)
+        cumulative += rows_by_student[student_id]
+
+    edges: List[Optional[str]] = [None, *bounds, None]
+    return [(edges[index], edges[index + 1]) for index in range(len(edges) - 1)]
+
+
+def _in_student_range(student_id: str, student_range: StudentRange) -> bool:
+    """True si student_id cae en la partición [desde, hasta)"""
+    range_from, range_to = student_range
+    return ((range_from is None or student_id >= range_from)
+            and (range_to is None or student_id < range_to))
+
+
+def _put_until_stopped(groups_queue: queue.Queue, item: Any, stop: threading.Event) -> bool:
+    """Encola `item` esperando lugar; False si el consumidor terminó antes"""
+    while not stop.is_set():
+        try:
+            groups_queue.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _fetch_partition(
+    groups: Optional[List[Dict]],
+    page_size: int,
+    student_range: StudentRange,
+    groups_queue: queue.Queue,
+    request_slots: threading.Semaphore,
+    stop: threading.Event,
+    cache: Optional[QueryCache] = None
+) -> None:
+    """Descarga una partición (con su propia conexión) y encola cada alumno-materia completo"""
+    try:
+        with CachedTursoClient(cache=cache) as client:
+            pages = iter_feedback_pages(client, groups, page_size, student_range, request_slots)
+            for group in iter_feedback_groups(itertools.chain.from_iterable(pages)):
+                if not _put_until_stopped(groups_queue, group, stop):
+                    return
     except Exception as e:
-        print(f"❌ Error al conectar a la base de datos: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
+        _put_until_stopped(groups_queue, e, stop)
+    finally:
+        _put_until_stopped(groups_queue, _PARTITION_DONE, stop)
+
+
+def iter_partitioned_feedback_groups(
+    groups: List[Dict],
+    fetch_all: bool,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    partitions: int = DEFAULT_PARTITIONS,
+    connections: int = DEFAULT_CONNECTIONS,
+    cache: Optional[QueryCache] = None
+) -> Iterator[Tuple[Tuple[str, str], List[Dict]]]:
+    """
+    Descarga el detalle en particiones de studentId en paralelo
+
+    Cada partición corre en su propio thread con su propia conexión y pagina
+    sobre su porción del índice; un semáforo limita los requests simultáneos
+    a `connections`. Un alumno cae en una sola partición, así sus grupos
+    llegan completos y se entregan en el orden en que terminan (sin esperar
+    a las particiones anteriores).
+
+    Args:
+        groups: Grupos a descargar (también pesan el tamaño de cada partición)
+        fetch_all: Recorrer todo el año en cada rango, sin lista de grupos
+        page_size: Filas por página
+        partitions: Cantidad de rangos de studentId
+        connections: Máximo de requests simultáneos
+        cache: Caché de queries compartido por las particiones
+
+    Yields:
+        Tuplas ((studentId, subject), feedbacks), como iter_feedback_groups
+    """
+    stop = threading.Event()
+    request_slots = threading.BoundedSemaphore(max(1, connections))
+    groups_queue: queue.Queue = queue.Queue(maxsize=PARTITION_QUEUE_GROUPS)
+
+    threads = []
+    for student_range in student_partitions(groups, partitions):
+        partition_groups = None if fetch_all else [
+            group for group in groups if _in_student_range(group['studentId'], student_range)
+        ]
+        threads.append(threading.Thread(
+            target=_fetch_partition,
+            args=(partition_groups, page_size, student_range, groups_queue, request_slots, stop, cache),
+            daemon=True
+        ))
+    for thread in threads:
+        thread.start()
+
+    try:
+        pending = len(threads)
+        while pending:
+            item = groups_queue.get()
+            if item is _PARTITION_DONE:
+                pending -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def iter_feedback_groups(rows: Iterable[Dict]) -> Iterator[Tuple[Tuple[str, str], List[Dict]]]:
+    """
+    Agrupa en streaming las filas ordenadas por (studentId, subject)
+
+    Un grupo se emite recién cuando aparece la primera fila del siguiente (o
+    al terminar), porque puede continuar en la página siguiente.
+
+    Yields:
+        Tuplas ((studentId, subject), feedbacks)
+    """
+    current_key: Optional[Tuple[str, str]] = None
+    current: List[Dict] = []
+
+    for feedback in rows:
+        key = (feedback['studentId'], feedback['subject'])
+        if key != current_key:
+            if current:
+                yield current_key, current
+            current_key = key
+            current = []
+        current.append(prepare_feedback(feedback))
+
+    if current:
+        yield current_key, current
 
 
 def parse_json_field(field_value: Any) -> Any:
@@ -99,6 +481,7 @@ def parse_json_field(field_value: Any) -> Any:
 def calculate_statistics(feedbacks: List[Dict]) -> Dict:
     """Calcula estadísticas agregadas de los feedbacks"""
     scores = [f['score'] for f in feedbacks if f['score'] is not None]
+    weeks = [f['weekKey'] for f in feedbacks]
 
     stats = {
         'totalFeedbacks': len(feedbacks),
@@ -106,46 +489,43 @@ def calculate_statistics(feedbacks: List[Dict]) -> Dict:
         'averageScore': round(sum(scores) / len(scores), 2) if scores else None,
         'minScore': min(scores) if scores else None,
         'maxScore': max(scores) if scores else None,
-        'weeksCovered': len(set(f['weekStart'] for f in feedbacks)),
+        'weeksCovered': len(set(weeks)),
         'dateRange': {
-            'firstWeek': min(f['weekStart'] for f in feedbacks),
-            'lastWeek': max(f['weekStart'] for f in feedbacks)
+            'firstWeek': week_label(min(weeks)),
+            'lastWeek': week_label(max(weeks))
         }
     }
 
     return stats
 
 
-def organize_feedbacks_by_student_and_subject(feedbacks_data: List[Dict]) -> Dict:
-    """Organiza los feedbacks agrupados por estudiante y materia"""
-    organized = defaultdict(lambda: defaultdict(list))
-
-    for feedback in feedbacks_data:
-        student_id = feedback['studentId']
-        subject = feedback['subject']
+def prepare_feedback(feedback: Dict) -> Dict:
+    """Normaliza una fila de feedback: semana canónica y campos JSON parseados"""
+    # Clave de semana canónica (una sola vez por fila)
+    feedback['weekKey'] = week_key(feedback['weekStart'])
 
-        # Parsear campos JSON
-        feedback['strengths'] = parse_json_field(feedback.get('strengths'))
-        feedback['improvements'] = parse_json_field(feedback.get('improvements'))
+    # Parsear campos JSON
+    feedback['strengths'] = parse_json_field(feedback.get('strengths'))
+    feedback['improvements'] = parse_json_field(feedback.get('improvements'))
 
-        organized[student_id][subject].append(feedback)
-
-    return organized
+    return feedback
 
 
 def create_student_subject_json(
     student_id: str,
     student_name: str,
     subject: str,
-    feedbacks: List[Dict]
+    feedbacks: List[Dict],
+    stats: Optional[Dict] = None
 ) -> Dict:
     """Crea el JSON estructurado para un estudiante-materia"""
 
-    # Ordenar feedbacks por fecha
-    sorted_feedbacks = sorted(feedbacks, key=lambda x: x['weekStart'])
+    # Ordenar feedbacks por semana
+    sorted_feedbacks = sorted(feedbacks, key=lambda x: x['weekKey'])
 
-    # Calcular estadísticas
-    stats = calculate_statistics(sorted_feedbacks)
+    # Calcular estadísticas (salvo que ya vengan agregadas desde Turso)
+    if stats is None:
+        stats = calculate_statistics(sorted_feedbacks)
 
     # Estructura del JSON
     output = {
@@ -164,7 +544,7 @@ def create_student_subject_json(
     for fb in sorted_feedbacks:
         feedback_entry = {
             'feedbackId': fb['id'],
-            'weekStart': fb['weekStart'],
+            'weekStart': week_label(fb['weekKey']),
             'score': fb['score'],
             'generalComments': fb.get('generalComments'),
             'strengths': fb.get('strengths'),
@@ -188,74 +568,203 @@ def sanitize_filename(name: str) -> str:
     return name
 
 
-def main():
-    """Función principal"""
-
-    print("=" * 80)
-    print("EXPORTACIÓN COMPLETA DE FEEDBACKS 2025 - INTELLEGO PLATFORM")
-    print("=" * 80)
-    print()
-
-    # Obtener feedbacks desde Turso
-    feedbacks_data = get_all_feedbacks_2025()
-
-    print()
-    print("📊 Organizando feedbacks por estudiante y materia...")
-    organized = organize_feedbacks_by_student_and_subject(feedbacks_data)
+def print_progress(files_written: int) -> None:
+    """Muestra progreso cada 10 archivos"""
+    if files_written % 10 == 0:
+        print(f"  📝 Creados {files_written} archivos...")
+
+
+def export_statistics(groups: List[Dict], output_path: Optional[str]) -> None:
+    """Exporta solo las estadísticas por alumno-materia (sin textos de feedback)"""
+    report = {
+        'academicYear': 2025,
+        'generatedAt': datetime.now().isoformat(),
+        'totalGroups': len(groups),
+        'totalStudents': len({group['studentId'] for group in groups}),
+        'groups': [
+            {
+                'studentId': group['studentId'],
+                'studentName': (group['studentName'] or '').strip(),
+                'subject': group['subject'],
+                'statistics': group['statistics']
+            }
+            for group in groups
+        ]
+    }
 
-    total_students = len(organized)
-    total_combinations = sum(len(subjects) for subjects in organized.values())
+    if output_path:
+        atomic_write_json(output_path, report)
+        print(f"💾 Estadísticas guardadas en: {output_path}")
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
 
-    print(f"✅ Encontrados {total_students} estudiantes")
-    print(f"✅ Total de combinaciones alumno-materia: {total_combinations}")
-    print()
-
-    # Crear directorio de salida
-    output_dir = 'feedbacks_2025_export'
-    os.makedirs(output_dir, exist_ok=True)
 
-    print(f"📁 Creando JSONs en directorio '{output_dir}/'...")
-    print()
+def group_filepath(output_dir: str, group: Dict) -> str:
+    """Ruta del JSON de un alumno-materia"""
+    student_name = group['studentName'] or f"Student_{group['studentId'][:8]}"
+    filename = f"{sanitize_filename(student_name)}_{sanitize_filename(group['subject'])}.json"
+    return os.path.join(output_dir, filename)
 
-    # Generar JSONs
-    files_created = 0
 
-    for student_id, subjects_data in organized.items():
-        # Obtener nombre del estudiante
-        student_name = None
-        for subject, feedbacks in subjects_data.items():
-            if feedbacks:
-                student_name = feedbacks[0]['studentName']
-                break
+def select_changed_groups(
+    groups: List[Dict],
+    manifest: Any,
+    output_dir: str
+) -> Tuple[List[Dict], int]:
+    """
+    Separa los grupos cuya huella de origen cambió desde la última exportación
 
-        if not student_name:
-            student_name = f"Student_{student_id[:8]}"
+    Returns:
+        Tupla (grupos a descargar y escribir, cantidad sin cambios)
+    """
+    changed = []
+    unchanged = 0
 
-        sanitized_name = sanitize_filename(student_name)
+    for group in groups:
+        key = f"{group['studentId']}|{group['subject']}"
+        filepath = group_filepath(output_dir, group)
+        if manifest.is_source_current(key, filepath, source_fingerprint(group)):
+            unchanged += 1
+        else:
+            changed.append(group)
 
-        for subject, feedbacks in subjects_data.items():
-            # Crear JSON
-            json_data = create_student_subject_json(
-                student_id,
-                student_name,
-                subject,
-                feedbacks
-            )
+    return changed, unchanged
 
-            # Nombre del archivo
-            sanitized_subject = sanitize_filename(subject)
-            filename = f"{sanitized_name}_{sanitized_subject}.json"
-            filepath = os.path.join(output_dir, filename)
 
-            # Guardar archivo
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, ensure_ascii=False, indent=2)
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Obtiene y exporta feedbacks 2025 por estudiante y materia")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Threads/procesos de escritura (default: cantidad de CPUs)')
+    parser.add_argument('--pool', choices=POOL_KINDS, default='thread',
+                        help='Tipo de pool de escritura (default: thread; la escritura es E/S. '
+                             'process copia cada documento entre procesos)')
+    parser.add_argument('--force', action='store_true',
+                        help='Reescribir todos los archivos aunque su contenido no haya cambiado')
+    parser.add_argument('--stats-only', action='store_true',
+                        help='Obtener solo las estadísticas por alumno-materia (sin textos)')
+    parser.add_argument('--output', help='Archivo de salida para --stats-only (default: stdout)')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f'Filas por página de detalle (default: {DEFAULT_PAGE_SIZE})')
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help=f'Rangos de studentId descargados en paralelo '
+                             f'(default: {DEFAULT_PARTITIONS}; 1 = descarga secuencial)')
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS,
+                        help=f'Máximo de requests simultáneos a Turso (default: {DEFAULT_CONNECTIONS})')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='files',
+                        help='files: un JSON por alumno-materia; archive: un único SQLite indexado')
+    parser.add_argument('--archive', default=DEFAULT_ARCHIVE_PATH,
+                        help=f'Ruta del archivo empaquetado (default: {DEFAULT_ARCHIVE_PATH})')
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    check_credentials()
+    cache = cache_from_args(args)
+
+    if args.stats_only:
+        try:
+            with CachedTursoClient(cache=cache) as client:
+                groups = get_feedback_statistics_2025(client)
+        except TursoError as e:
+            print(f"❌ Error al consultar Turso: {e}")
+            sys.exit(1)
+
+        export_statistics(groups, args.output)
+        return
 
-            files_created += 1
+    print("=" * 80)
+    print("EXPORTACIÓN COMPLETA DE FEEDBACKS 2025 - INTELLEGO PLATFORM")
+    print("=" * 80)
+    print()
 
-            # Mostrar progreso cada 10 archivos
-            if files_created % 10 == 0:
-                print(f"  📝 Creados {files_created} archivos...")
+    # Directorio de salida (o archivo empaquetado) y manifest de cambios
+    output_dir = 'feedbacks_2025_export'
+    writer, manifest = create_export_writer(
+        args.format, output_dir, args.archive, args.workers, args.pool, args.force,
+        on_written=print_progress
+    )
+
+    destination = args.archive if args.format == 'archive' else f"{output_dir}/"
+    total_feedbacks = 0
+
+    with writer:
+        print("📡 Conectando a base de datos Turso...")
+
+        try:
+            with CachedTursoClient(cache=cache) as client:
+                # 1. Estadísticas agregadas en Turso (pocos KB, sin textos)
+                groups = get_feedback_statistics_2025(client)
+
+                # 2. Textos completos solo para los grupos nuevos o con cambios
+                changed_groups, unchanged_groups = select_changed_groups(groups, manifest, output_dir)
+                print(f"⏭️  {unchanged_groups} grupos sin cambios desde la última exportación")
+
+                total_students = len({group['studentId'] for group in groups})
+
+                print(f"✅ Encontrados {total_students} estudiantes")
+                print(f"✅ Total de combinaciones alumno-materia: {len(groups)}")
+                print(f"✅ Combinaciones a regenerar: {len(changed_groups)}")
+                print()
+
+                if args.partitions > 1 and changed_groups:
+                    partition_count = len(student_partitions(changed_groups, args.partitions))
+                    print(f"📡 Descargando {partition_count} particiones de studentId "
+                          f"con hasta {args.connections} requests simultáneos")
+                print(f"📁 Descargando en páginas de {args.page_size} filas y creando JSONs en '{destination}'...")
+                print()
+
+                # Si cambió todo (primera corrida o --force) se recorre el año
+                # completo sin lista de grupos
+                changed_by_key = {(group['studentId'], group['subject']): group for group in changed_groups}
+                fetch_groups = None if len(changed_groups) == len(groups) else changed_groups
+                if args.partitions > 1 and changed_groups:
+                    feedback_groups = iter_partitioned_feedback_groups(
+                        changed_groups, fetch_groups is None, args.page_size,
+                        args.partitions, args.connections, cache
+                    )
+                elif changed_groups:
+                    feedback_groups = iter_feedback_groups(itertools.chain.from_iterable(
+                        iter_feedback_pages(client, fetch_groups, args.page_size)
+                    ))
+                else:
+                    feedback_groups = iter([])
+
+                # Generar JSONs a medida que se completa cada grupo (escritura
+                # atómica en el pool o en el archivo empaquetado)
+                for (student_id, subject), feedbacks in feedback_groups:
+                    total_feedbacks += len(feedbacks)
+                    group = changed_by_key.get((student_id, subject))
+                    if group is None:
+                        # Grupo creado entre la query de estadísticas y la de detalle
+                        continue
+
+                    student_name = group['studentName'] or f"Student_{student_id[:8]}"
+
+                    # Crear JSON con las estadísticas calculadas en Turso
+                    json_data = create_student_subject_json(
+                        student_id,
+                        student_name,
+                        subject,
+                        feedbacks,
+                        stats=group['statistics']
+                    )
+
+                    # Se omite si el contenido no cambió desde la última exportación
+                    writer.submit(group_filepath(output_dir, group), json_data,
+                                  key=f"{student_id}|{subject}",
+                                  payload=json_data['feedbacks'],
+                                  source=source_fingerprint(group))
+        except TursoError as e:
+            # Los grupos ya escritos quedan en el manifest: la próxima corrida retoma desde ahí
+            print(f"❌ Error al consultar Turso: {e}")
+            print("💾 Los grupos ya escritos quedan registrados y se omiten al reintentar")
+            sys.exit(1)
+
+    files_created = writer.report.written
+    if not writer.report.ok:
+        print()
+        writer.report.print_errors()
+        sys.exit(1)
 
     print()
     print("=" * 80)
@@ -264,10 +773,17 @@ def main():
     print()
     print(f"📊 Resumen:")
     print(f"  • Total de estudiantes: {total_students}")
+    print(f"  • Feedbacks descargados: {total_feedbacks}")
     print(f"  • Total de archivos JSON creados: {files_created}")
-    print(f"  • Directorio de salida: {output_dir}/")
+    print(f"  • Archivos sin cambios (omitidos): {unchanged_groups + writer.report.skipped}")
+    print(f"  • Salida: {destination}")
+    if cache:
+        print(f"  • {cache.summary()}")
     print()
-    print(f"📁 Los archivos tienen el formato: Nombre_Apellido_Materia.json")
+    if args.format == 'archive':
+        print(f"📦 Documentos indexados por (studentId, subject) en {args.archive}")
+    else:
+        print(f"📁 Los archivos tienen el formato: Nombre_Apellido_Materia.json")
     print()
     print("🎯 Próximos pasos:")
     print("  1. Revisa los archivos en el directorio de salida")
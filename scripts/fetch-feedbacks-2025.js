@@ -46,7 +46,7 @@ async function main() {
       FROM Feedback f
       JOIN User u ON f.studentId = u.id
       WHERE f.weekStart >= '2025-01-01' AND f.weekStart < '2026-01-01'
-      ORDER BY u.name, f.subject, f.weekStart
+      ORDER BY u.name, f.studentId, f.subject, f.weekStart
     `;
 
     console.log('🔍 Ejecutando query SQL...');
@@ -40,7 +40,7 @@ SELECT
 FROM Feedback f
 JOIN User u ON f.studentId = u.id
 WHERE f.weekStart >= '2025-01-01' AND f.weekStart < '2026-01-01'
-ORDER BY u.name, f.subject, f.weekStart
+ORDER BY u.name, f.studentId, f.subject, f.weekStart
 """
 
     print(sql_query)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Lectura incremental de resultados JSON - Intellego Platform
+
+Los scripts de exportación reciben por stdin el resultado de una query
+({"columns": [...], "rows": [...]}) y antes lo cargaban entero con
+sys.stdin.read() + json.loads(). Este módulo recorre el array "rows" fila por
+fila sobre un buffer de tamaño acotado, así en memoria solo vive la fila
+actual (más lo que el llamador decida conservar).
+
+Formatos aceptados (detectados automáticamente):
+- Documento con clave "rows": {"columns": [...], "rows": [{...}, ...]}
+- Array de filas:            [{...}, {...}]
+- NDJSON:                    una fila JSON por línea
+
+Un único objeto sin clave "rows" se interpreta como documento sin filas (igual
+que data.get('rows', [])); para NDJSON de una sola línea usar ndjson=True.
+
+Si "columns" aparece antes que "rows" y las filas vienen como listas, se
+convierten a dicts con esos nombres de columna.
+
+Uso:
+    from json_stream import iter_json_rows
+
+    for row in iter_json_rows(sys.stdin):
+        ...
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+# Caracteres que pueden seguir a un número parcial (fracción o exponente)
+_NUMBER_CONTINUATION = '.eE+-0123456789'
+
+
+class _StreamBuffer:
+    """Buffer deslizante sobre un stream de texto, con decodificación JSON por valor"""
+
+    def __init__(self, stream: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Descarta lo ya consumido y agrega el siguiente bloque. False en EOF"""
+        if self.eof:
+            return False
+
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Primer carácter no blanco sin consumirlo ('' en EOF)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char: str) -> None:
+        """Consume `char` o lanza JSONDecodeError"""
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Se esperaba '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def decode(self) -> Any:
+        """Decodifica el siguiente valor JSON completo, leyendo más datos si hace falta"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Valor cortado por el final del buffer: leer más y reintentar
+                if self.fill():
+                    continue
+                raise
+
+            # Un número cortado por el final del buffer puede continuar en el
+            # próximo bloque, también después de '.', 'e' o un signo del exponente
+            # ('1500.' + '0' o '1e' + '-5' no son números completos)
+            if not self.eof and (
+                end == len(self.buffer) or self.buffer[end] in _NUMBER_CONTINUATION
+            ) and self.fill():
+                continue
+
+            self.pos = end
+            return value
+
+
+def _as_row(value: Any, columns: Optional[List[str]]) -> Any:
+    """Convierte filas en formato lista a dict cuando se conocen las columnas"""
+    if columns and isinstance(value, list):
+        return dict(zip(columns, value))
+    return value
+
+
+def _iter_array(reader: _StreamBuffer, columns: Optional[List[str]] = None) -> Iterator[Any]:
+    """Recorre los elementos de un array JSON (el '[' ya fue consumido)"""
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+
+    while True:
+        yield _as_row(reader.decode(), columns)
+
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise json.JSONDecodeError("Se esperaba ',' o ']'", reader.buffer, reader.pos - 1)
+
+
+def _iter_object(reader: _StreamBuffer, rows_key: str) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre un objeto de nivel superior ('{' ya consumido)
+
+    Si contiene `rows_key`, emite sus elementos. Si el objeto termina sin esa
+    clave y le siguen más valores, era la primera fila de un NDJSON: se emite
+    completo y se siguen leyendo filas.
+    """
+    fields: Dict[str, Any] = {}
+    found_rows = False
+
+    if reader.peek() == '}':
+        reader.pos += 1
+    else:
+        while True:
+            key = reader.decode()
+            reader.expect(':')
+
+            if key == rows_key and reader.peek() == '[':
+                reader.pos += 1
+                columns = fields.get('columns')
+                yield from _iter_array(reader, columns if isinstance(columns, list) else None)
+                found_rows = True
+                fields = {}
+            else:
+                value = reader.decode()
+                if not found_rows:
+                    fields[key] = value
+
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == '}':
+                break
+            if separator != ',':
+                raise json.JSONDecodeError("Se esperaba ',' o '}'", reader.buffer, reader.pos - 1)
+
+    if found_rows or not reader.peek():
+        return
+
+    # NDJSON: el primer objeto era una fila, el resto se decodifica valor por valor
+    yield fields
+    yield from _iter_values(reader)
+
+
+def _iter_values(reader: _StreamBuffer) -> Iterator[Any]:
+    """Decodifica valores JSON consecutivos hasta EOF (NDJSON)"""
+    while reader.peek():
+        yield reader.decode()
+
+
+def iter_json_rows(stream: TextIO, rows_key: str = 'rows', ndjson: bool = False,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Itera las filas de un resultado JSON sin cargar el documento completo
+
+    Args:
+        stream: Stream de texto (sys.stdin o archivo abierto)
+        rows_key: Clave del array de filas en el documento
+        ndjson: Forzar NDJSON (cada valor de la entrada es una fila)
+        chunk_size: Tamaño de cada lectura del stream
+
+    Yields:
+        Cada fila (dict) en el orden en que aparece en la entrada
+
+    Raises:
+        json.JSONDecodeError: Si la entrada no es JSON/NDJSON válido
+    """
+    reader = _StreamBuffer(stream, chunk_size)
+
+    if ndjson:
+        yield from _iter_values(reader)
+        return
+
+    first = reader.peek()
+    if not first:
+        return
+
+    reader.pos += 1
+    if first == '[':
+        yield from _iter_array(reader)
+    elif first == '{':
+        yield from _iter_object(reader, rows_key)
+    else:
+        raise json.JSONDecodeError("Se esperaba un objeto o un array JSON", reader.buffer, reader.pos - 1)
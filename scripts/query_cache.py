@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Caché en disco de resultados de queries a Turso - Intellego Platform
+
+Los scripts de análisis y exportación vuelven a descargar las mismas tablas
+(User, Evaluation, Feedback) en cada corrida. Este módulo guarda el resultado
+de cada SELECT en disco, comprimido con gzip, indexado por la base, el SQL
+normalizado y los parámetros:
+
+- TTL: una entrada más vieja que `ttl` segundos se vuelve a descargar
+- LRU: si el caché supera `max_bytes`, se borran las entradas usadas hace más
+  tiempo (el uso se registra en el mtime del archivo)
+- Invalidación por tabla (opcional): con `depends_on=('Feedback',)` la entrada
+  guarda COUNT(*) + MAX(updatedAt) de esas tablas y se descarta si cambiaron.
+  La verificación es una query mínima por tabla y por corrida
+- --refresh ignora el caché (y lo actualiza); --no-cache lo desactiva
+
+Solo se cachean lecturas (SELECT / WITH); el resto pasa directo a Turso.
+
+Uso:
+    from query_cache import CachedTursoClient, add_cache_arguments, cache_from_args
+
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+
+    with CachedTursoClient(cache=cache_from_args(args)) as client:
+        users = client.execute_columnar("SELECT id, name FROM User", depends_on=('User',))
+
+Variables de entorno:
+    TURSO_CACHE_DIR    Directorio del caché (default: ~/.cache/intellego-turso)
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from turso_http import ColumnarResult, Params, TursoHttpClient, decode_value
+
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'TURSO_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'intellego-turso')
+)
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+CACHE_SUFFIX = '.json.gz'
+
+# Huella de una tabla para invalidar: cambia si se agregan, borran o actualizan filas
+TABLE_VERSION_QUERY = 'SELECT COUNT(*), MAX(updatedAt) FROM "{table}"'
+
+_CACHEABLE = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+_TABLE_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def normalize_sql(sql: str) -> str:
+    """SQL con espacios colapsados fuera de literales (misma query → misma clave)"""
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip())
+    return ''.join(
+        part if index % 2 else re.sub(r'\s+', ' ', part)
+        for index, part in enumerate(parts)
+    )
+
+
+def is_cacheable(sql: str) -> bool:
+    """True si el statement es una lectura"""
+    return bool(_CACHEABLE.match(sql))
+
+
+class QueryCache:
+    """Resultados de queries comprimidos en disco, con TTL y desalojo LRU"""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES, refresh: bool = False):
+        """
+        Args:
+            cache_dir: Directorio del caché (se crea si no existe)
+            ttl: Antigüedad máxima de una entrada en segundos
+            max_bytes: Tamaño máximo del caché en disco
+            refresh: Ignorar las entradas existentes (se reescriben)
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        # Huellas de tabla ya consultadas en esta corrida: (base, tabla) → huella
+        self.table_tokens: Dict[Tuple[str, str], Any] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(database_url: str, sql: str, params: Params = None) -> str:
+        """Clave estable de una query: base + SQL normalizado + parámetros"""
+        material = json.dumps(
+            [CACHE_FORMAT_VERSION, database_url, normalize_sql(sql), params],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + CACHE_SUFFIX)
+
+    def get(self, key: str, token: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Resultado guardado para `key`, o None si no existe, venció o cambió la huella
+
+        Args:
+            key: Clave de make_key
+            token: Huella actual de las tablas de las que depende la query
+        """
+        if self.refresh:
+            self._count(hit=False)
+            return None
+
+        path = self._path(key)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, EOFError, ValueError):
+            self._count(hit=False)
+            return None
+
+        if (
+            entry.get('version') != CACHE_FORMAT_VERSION
+            or time.time() - entry.get('createdAt', 0) > self.ttl
+            or entry.get('token') != token
+        ):
+            self._count(hit=False)
+            return None
+
+        # Uso reciente para el desalojo LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        self._count(hit=True)
+        return entry['result']
+
+    def put(self, key: str, result: Dict[str, Any], token: Any = None,
+            sql: Optional[str] = None) -> None:
+        """Guarda un resultado (escritura atómica) y desaloja si se excede max_bytes"""
+        entry = {
+            'version': CACHE_FORMAT_VERSION,
+            'createdAt': time.time(),
+            'token': token,
+            'sql': normalize_sql(sql) if sql else None,
+            'result': result
+        }
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Borra las entradas usadas hace más tiempo hasta quedar bajo max_bytes
+
+        Returns:
+            Cantidad de entradas borradas
+        """
+        entries: List[Tuple[float, int, str]] = []
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+
+        return removed
+
+    def clear(self) -> None:
+        """Borra todas las entradas"""
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(CACHE_SUFFIX):
+                try:
+                    os.unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def summary(self) -> str:
+        """Resumen de aciertos para imprimir al final de un script"""
+        return f"💾 Caché de queries: {self.hits} aciertos, {self.misses} descargas ({self.cache_dir})"
+
+
+class CachedTursoClient(TursoHttpClient):
+    """
+    TursoHttpClient que sirve los SELECT desde un QueryCache
+
+    execute_raw, execute_columnar y execute aceptan `depends_on` (tablas cuya
+    huella COUNT(*) + MAX(updatedAt) invalida la entrada). Sin caché se
+    comporta igual que TursoHttpClient.
+    """
+
+    def __init__(self, database_url: Optional[str] = None, auth_token: Optional[str] = None,
+                 cache: Optional[QueryCache] = None, **kwargs):
+        """
+        Args:
+            database_url: URL de la base. Por defecto TURSO_DATABASE_URL
+            auth_token: Token de autenticación. Por defecto TURSO_AUTH_TOKEN
+            cache: Caché a usar (None = sin caché)
+            **kwargs: Resto de opciones de TursoHttpClient
+        """
+        super().__init__(database_url, auth_token, **kwargs)
+        self.cache = cache
+
+    def table_token(self, table: str) -> Any:
+        """Huella actual de una tabla (una consulta por corrida, compartida entre clientes del mismo caché)"""
+        if not _TABLE_NAME.match(table):
+            raise ValueError(f"Nombre de tabla inválido: {table}")
+
+        tokens = self.cache.table_tokens
+        if (self.url, table) not in tokens:
+            result = super().execute_raw(TABLE_VERSION_QUERY.format(table=table))
+            tokens[(self.url, table)] = [decode_value(value) for value in result['rows'][0]]
+        return tokens[(self.url, table)]
+
+    def execute_raw(self, sql: str, params: Params = None,
+                    depends_on: Sequence[str] = ()) -> Dict[str, Any]:
+        """
+        Ejecuta un statement, usando el caché para lecturas
+
+        Args:
+            sql: Query SQL
+            params: Parámetros posicionales o nombrados
+            depends_on: Tablas cuya huella invalida la entrada (vacío = solo TTL)
+        """
+        if self.cache is None or not is_cacheable(sql):
+            return super().execute_raw(sql, params)
+
+        key = QueryCache.make_key(self.url, sql, params)
+        token = {table: self.table_token(table) for table in sorted(depends_on)} or None
+
+        result = self.cache.get(key, token)
+        if result is None:
+            result = super().execute_raw(sql, params)
+            self.cache.put(key, result, token, sql)
+        return result
+
+    def execute_columnar(self, sql: str, params: Params = None,
+                         depends_on: Sequence[str] = ()) -> ColumnarResult:
+        """Ejecuta un statement y devuelve el resultado por columnas"""
+        return ColumnarResult.from_hrana(self.execute_raw(sql, params, depends_on))
+
+    def execute(self, sql: str, params: Params = None,
+                depends_on: Sequence[str] = ()) -> List[List[Any]]:
+        """Ejecuta un statement parametrizado y devuelve filas con valores tipados"""
+        result = self.execute_raw(sql, params, depends_on)
+        return [[decode_value(value) for value in row] for row in result['rows']]
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Agrega --refresh, --no-cache, --cache-ttl y --cache-dir a un parser"""
+    group = parser.add_argument_group('caché de queries')
+    group.add_argument('--refresh', action='store_true',
+                       help='Ignorar el caché y volver a descargar (el caché se actualiza)')
+    group.add_argument('--no-cache', action='store_true',
+                       help='No leer ni escribir el caché')
+    group.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                       help=f'Antigüedad máxima de una entrada en segundos (default: {DEFAULT_TTL})')
+    group.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                       help=f'Directorio del caché (default: {DEFAULT_CACHE_DIR})')
+
+
+def cache_from_args(args: argparse.Namespace) -> Optional[QueryCache]:
+    """QueryCache configurado desde los argumentos de add_cache_arguments (None con --no-cache)"""
+    if args.no_cache:
+        return None
+    return QueryCache(args.cache_dir, ttl=args.cache_ttl, refresh=args.refresh)
@@ -6,60 +6,16 @@ Genera contraseñas temporales seguras y las actualiza en la base de datos
 
 import os
 import json
-import requests
 import secrets
 import string
 from datetime import datetime
 
+from turso_http import TursoError, TursoHttpClient
+
 # Configuración
 TURSO_DATABASE_URL = os.environ.get("TURSO_DATABASE_URL")
 TURSO_AUTH_TOKEN = os.environ.get("TURSO_AUTH_TOKEN")
 
-def get_turso_http_url():
-    """Convierte la URL de WebSocket a HTTP"""
-    if not TURSO_DATABASE_URL:
-        raise ValueError("TURSO_DATABASE_URL no está configurada")
-
-    url = TURSO_DATABASE_URL.replace("libsql://", "https://").replace("wss://", "https://")
-    if not url.endswith("/v2/pipeline"):
-        if url.endswith("/"):
-            url = url[:-1]
-        url = url + "/v2/pipeline"
-    return url
-
-def execute_query(query, params=None):
-    """Ejecuta una query usando el API REST de Turso"""
-    url = get_turso_http_url()
-
-    headers = {
-        "Authorization": f"Bearer {TURSO_AUTH_TOKEN}",
-        "Content-Type": "application/json"
-    }
-
-    stmt = {"sql": query}
-    if params:
-        # Convertir parámetros a formato Turso (con tipos)
-        args = []
-        for param in params:
-            args.append({"type": "text", "value": str(param)})
-        stmt["args"] = args
-
-    payload = {
-        "requests": [
-            {
-                "type": "execute",
-                "stmt": stmt
-            }
-        ]
-    }
-
-    response = requests.post(url, headers=headers, json=payload)
-
-    if response.status_code != 200:
-        raise Exception(f"Error en query: {response.status_code} - {response.text}")
-
-    return response.json()
-
 def generate_temporary_password(length=12):
     """Genera una contraseña temporal segura"""
     # Incluir mayúsculas, minúsculas, números y símbolos
@@ -99,16 +55,39 @@ def hash_password_bcrypt(password):
         hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
 
-def update_user_password(user_id, hashed_password):
-    """Actualiza la contraseña de un usuario en la base de datos"""
-    query = """
+UPDATE_PASSWORD_QUERY = """
     UPDATE User
     SET password = ?, updatedAt = CURRENT_TIMESTAMP
     WHERE id = ?
     """
 
-    result = execute_query(query, [hashed_password, user_id])
-    return result
+def update_user_passwords(client, updates):
+    """
+    Actualiza varias contraseñas en un único request del pipeline
+
+    Args:
+        client: TursoHttpClient
+        updates: Lista de tuplas (user_id, hashed_password)
+
+    Returns:
+        Lista de StatementResult, uno por actualización
+
+    Raises:
+        TursoError: Si Turso devolvió una cantidad de resultados distinta a la
+            de actualizaciones (no se sabe qué contraseñas se aplicaron)
+    """
+    statements = [
+        (UPDATE_PASSWORD_QUERY, [hashed_password, user_id])
+        for user_id, hashed_password in updates
+    ]
+    results = client.batch(statements)
+
+    if len(results) != len(statements):
+        raise TursoError(
+            f"Turso devolvió {len(results)} resultados para {len(statements)} actualizaciones; "
+            f"volver a ejecutar el script para todo el lote"
+        )
+    return results
 
 def main():
     """Función principal"""
@@ -139,6 +118,7 @@ def main():
     ]
 
     results = []
+    pending = []
 
     print("\n🔑 Generando contraseñas temporales seguras...")
     print("")
@@ -153,27 +133,39 @@ def main():
         print(f"   🔒 Generando hash bcrypt...")
         hashed_password = hash_password_bcrypt(temp_password)
 
-        # Actualizar en la base de datos
-        print(f"   💾 Actualizando en base de datos...")
-        try:
-            update_user_password(student['id'], hashed_password)
+        pending.append((student, temp_password, hashed_password))
+        print("")
+
+    # Actualizar todas las contraseñas en un solo round trip
+    print(f"💾 Actualizando {len(pending)} contraseñas en base de datos...")
+    try:
+        with TursoHttpClient(TURSO_DATABASE_URL, TURSO_AUTH_TOKEN) as client:
+            batch_results = update_user_passwords(
+                client,
+                [(student['id'], hashed_password) for student, _, hashed_password in pending]
+            )
+    except Exception as e:
+        batch_results = [None] * len(pending)
+        batch_error = str(e)
 
+    for (student, temp_password, _), batch_result in zip(pending, batch_results):
+        if batch_result is not None and batch_result.ok:
             results.append({
                 "success": True,
                 "student": student,
                 "temporary_password": temp_password
             })
-
-            print(f"   ✅ Contraseña actualizada exitosamente")
-        except Exception as e:
+            print(f"   ✅ {student['name']}: contraseña actualizada exitosamente")
+        else:
+            error = batch_result.error if batch_result is not None else batch_error
             results.append({
                 "success": False,
                 "student": student,
-                "error": str(e)
+                "error": error
             })
-            print(f"   ❌ Error: {str(e)}")
+            print(f"   ❌ {student['name']}: {error}")
 
-        print("")
+    print("")
 
     # Resumen
     print("=" * 70)
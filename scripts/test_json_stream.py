@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Pruebas de regresión de json_stream - Intellego Platform
+
+Cada caso se lee con todos los tamaños de bloque de 1 a len(entrada) + 1, así
+cualquier valor (en particular un número como 1500.0 o 1e-5) queda cortado por
+el final del buffer en todas las posiciones posibles.
+
+Uso:
+    python3 scripts/test_json_stream.py
+    python3 -m pytest scripts/test_json_stream.py
+"""
+
+import io
+import json
+
+from json_stream import iter_json_rows
+
+CASES = [
+    # (entrada, ndjson, filas esperadas)
+    ('{"a": 0, "n": 1500.0}\n{"a": 1}', False, [{"a": 0, "n": 1500.0}, {"a": 1}]),
+    ('{"n": 1e-5}\n{"n": -2.5E+10}\n{"n": 12}', False, [{"n": 1e-5}, {"n": -2.5e10}, {"n": 12}]),
+    ('1500.25\n-3\n6.02e23', True, [1500.25, -3, 6.02e23]),
+    ('[10.5, 2e3, -0.125, 7]', False, [10.5, 2e3, -0.125, 7]),
+    ('{"columns": ["id", "score"], "rows": [["a", 99.5], ["b", 100]]}', False,
+     [{"id": "a", "score": 99.5}, {"id": "b", "score": 100}]),
+    ('{"rows": [{"x": "1.5"}, {"x": null}, {"x": true}]}', False,
+     [{"x": "1.5"}, {"x": None}, {"x": True}]),
+]
+
+
+def read_all(text, ndjson, chunk_size):
+    return list(iter_json_rows(io.StringIO(text), ndjson=ndjson, chunk_size=chunk_size))
+
+
+def test_every_chunk_size():
+    """Las filas no dependen de dónde cae el corte de bloque"""
+    for text, ndjson, expected in CASES:
+        for chunk_size in range(1, len(text) + 2):
+            rows = read_all(text, ndjson, chunk_size)
+            assert rows == expected, f"chunk_size={chunk_size}: {text!r} → {rows!r}"
+
+
+def test_invalid_input_still_fails():
+    """Un número inválido sigue fallando aunque se lea en bloques de un carácter"""
+    for text in ('{"n": 1500.}\n{"a": 1}', '[1, 2'):
+        for chunk_size in (1, 2, 64):
+            try:
+                read_all(text, False, chunk_size)
+            except json.JSONDecodeError:
+                continue
+            raise AssertionError(f"Se esperaba JSONDecodeError: {text!r} (chunk_size={chunk_size})")
+
+
+if __name__ == "__main__":
+    test_every_chunk_size()
+    test_invalid_input_still_fails()
+    print("✅ json_stream: todas las pruebas pasaron")
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Temas de examen canónicos - Intellego Platform
+
+El examTopic se carga a mano y el mismo examen aparece con variantes
+('Termodinámica', 'termodinamica', 'Termoedinámica'). Normalizar tildes y
+mayúsculas no alcanza para los typos, y comparar todos los temas contra todos
+con distancia de edición es cuadrático.
+
+Este módulo agrupa los temas casi iguales dentro de cada materia con un índice
+invertido de trigramas:
+
+- Cada tema se pliega (sin tildes, minúsculas, solo letras y dígitos) y se
+  descompone en trigramas
+- Los temas se recorren de más a menos frecuente; cada uno se compara solo con
+  los representantes de grupo que comparten suficientes trigramas (índice
+  invertido + filtro por cantidad: k ediciones borran a lo sumo 4k trigramas)
+- Los candidatos se confirman con distancia de edición acotada (con
+  transposiciones): una edición cada `chars_per_edit` caracteres del tema más
+  corto ('Termoedinámica' ~ 'Termodinámica', pero 'MRU' ≠ 'MRUV' y
+  'Soluciones' ≠ 'Disoluciones')
+- Temas con números distintos nunca se unen ('Parcial 1' ≠ 'Parcial 2')
+- Temas sin letras ni dígitos ('???', '...') quedan con su escritura original
+- El nombre canónico de cada grupo es la escritura más usada de su forma
+  plegada más frecuente
+
+El mapeo tema → canónico se guarda en disco por materia, con una huella de los
+temas de esa materia: en la corrida siguiente solo se reagrupan las materias
+que tienen temas nuevos.
+
+Uso:
+    from topic_index import TopicCanonicalizer
+
+    topics = TopicCanonicalizer(cache_dir='~/.cache/intellego-turso')
+    topics.fit((e.subject, e.topic) for e in evaluations)
+    topics.canonical('Física 4to A', 'Termoedinámica')   # 'Termodinámica'
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+TOPIC_CACHE_VERSION = 2
+TOPIC_CACHE_FILENAME = 'topic_clusters.json'
+
+# Ediciones toleradas: una cada tantos caracteres del tema más corto
+DEFAULT_CHARS_PER_EDIT = 8
+
+_WORD = re.compile(r'[a-z0-9]+')
+_DIGITS = re.compile(r'\d+')
+
+
+@lru_cache(maxsize=None)
+def fold_topic(topic: str) -> str:
+    """Tema sin tildes, en minúsculas y con solo letras, dígitos y espacios simples"""
+    text = unicodedata.normalize('NFKD', topic or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD.findall(text.lower()))
+
+
+@lru_cache(maxsize=None)
+def topic_trigrams(folded: str) -> FrozenSet[str]:
+    """Trigramas de un tema plegado (con relleno, para pesar el comienzo de palabra)"""
+    padded = f"  {folded} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distancia de edición con transposiciones (OSA), acotada
+
+    Returns:
+        La distancia, o limit + 1 si supera `limit` (corta apenas se pasa)
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+
+    return min(previous[-1], limit + 1)
+
+
+def cluster_topics(topic_counts: Mapping[str, int],
+                   chars_per_edit: int = DEFAULT_CHARS_PER_EDIT) -> Dict[str, str]:
+    """
+    Agrupa los temas de una materia y elige el nombre canónico de cada grupo
+
+    Args:
+        topic_counts: Tema (escritura original) → cantidad de evaluaciones
+        chars_per_edit: Ediciones toleradas = largo del tema más corto // chars_per_edit
+
+    Returns:
+        Tema → nombre canónico (cada tema de la entrada aparece como clave)
+    """
+    folded_counts: Counter = Counter()
+    spellings: Dict[str, Counter] = defaultdict(Counter)
+    for topic, count in topic_counts.items():
+        folded = fold_topic(topic)
+        if not folded:
+            # Nada que comparar: no se une ni con otros temas vacíos al plegar
+            continue
+        folded_counts[folded] += count
+        spellings[folded][topic] += count
+
+    # Representante (tema plegado) de cada grupo y sus trigramas
+    representatives: List[str] = []
+    grams_of: List[FrozenSet[str]] = []
+    postings: Dict[str, List[int]] = defaultdict(list)
+    cluster_of: Dict[str, int] = {}
+
+    for folded in sorted(folded_counts, key=lambda f: (-folded_counts[f], f)):
+        grams = topic_trigrams(folded)
+
+        # Trigramas compartidos con cada representante (temas cortos no toleran ediciones)
+        max_edits = len(folded) // chars_per_edit
+        shared: Counter = Counter()
+        if max_edits:
+            for gram in grams:
+                shared.update(postings.get(gram, ()))
+
+        # Filtro por cantidad antes de mirar cada candidato
+        min_common = len(grams) - 4 * max_edits
+        candidates = [cluster for cluster, common in shared.items() if common >= min_common]
+
+        best, best_distance = None, None
+        digits = _DIGITS.findall(folded)
+        for cluster in candidates:
+            common = shared[cluster]
+            representative = representatives[cluster]
+            limit = min(len(folded), len(representative)) // chars_per_edit
+            if best_distance is not None:
+                limit = min(limit, best_distance - 1)
+            if limit < 1 or common < max(len(grams), len(grams_of[cluster])) - 4 * limit:
+                continue
+            if _DIGITS.findall(representative) != digits:
+                continue
+
+            distance = edit_distance(folded, representative, limit)
+            if distance <= limit:
+                best, best_distance = cluster, distance
+
+        if best is None:
+            best = len(representatives)
+            representatives.append(folded)
+            grams_of.append(grams)
+            for gram in grams:
+                postings[gram].append(best)
+
+        cluster_of[folded] = best
+
+    # Nombre canónico: la escritura más usada del representante (la forma plegada
+    # más frecuente del grupo; empate: orden alfabético)
+    canonical = {}
+    for cluster, representative in enumerate(representatives):
+        counts = spellings[representative]
+        canonical[cluster] = min(counts, key=lambda topic: (-counts[topic], topic))
+
+    return {
+        topic: canonical[cluster_of[fold_topic(topic)]] if fold_topic(topic) else topic
+        for topic in topic_counts
+    }
+
+
+def _fingerprint(topics: Iterable[str]) -> str:
+    """Huella del conjunto de temas distintos de una materia"""
+    material = json.dumps(sorted(topics), ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class TopicCanonicalizer:
+    """Mapeo (materia, tema) → tema canónico, con caché en disco por materia"""
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 chars_per_edit: int = DEFAULT_CHARS_PER_EDIT, refresh: bool = False):
+        """
+        Args:
+            cache_dir: Directorio donde guardar el mapeo (None = sin caché)
+            chars_per_edit: Ediciones toleradas = largo del tema más corto // chars_per_edit
+            refresh: Ignorar el mapeo guardado (se reescribe)
+        """
+        self.cache_path = (
+            os.path.join(os.path.expanduser(cache_dir), TOPIC_CACHE_FILENAME) if cache_dir else None
+        )
+        self.chars_per_edit = chars_per_edit
+        self.refresh = refresh
+        self.mapping: Dict[str, Dict[str, str]] = {}
+        self.reused = 0
+        self.clustered = 0
+
+    def fit(self, pairs: Iterable[Tuple[str, str]]) -> "TopicCanonicalizer":
+        """
+        Agrupa los temas de cada materia
+
+        Args:
+            pairs: (materia, tema) de cada evaluación (los repetidos suman frecuencia)
+
+        Returns:
+            self, para encadenar
+        """
+        counts: Dict[str, Counter] = defaultdict(Counter)
+        for subject, topic in pairs:
+            if topic is not None:
+                counts[subject][topic] += 1
+
+        subjects = self._load()
+        changed = False
+
+        for subject, topic_counts in counts.items():
+            fingerprint = _fingerprint(topic_counts)
+            entry = subjects.get(subject)
+
+            if entry is not None and entry.get('fingerprint') == fingerprint:
+                self.reused += 1
+            else:
+                entry = subjects[subject] = {
+                    'fingerprint': fingerprint,
+                    'mapping': cluster_topics(topic_counts, self.chars_per_edit)
+                }
+                self.clustered += 1
+                changed = True
+
+            self.mapping[subject] = entry['mapping']
+
+        if changed:
+            self._save(subjects)
+        return self
+
+    def canonical(self, subject: str, topic: str) -> str:
+        """Tema canónico (el mismo tema si no se vio en fit)"""
+        return self.mapping.get(subject, {}).get(topic, topic)
+
+    def variants(self) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Grupos con más de una escritura
+
+        Returns:
+            (materia, tema canónico) → escrituras distintas que se unieron
+        """
+        groups: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for subject, mapping in self.mapping.items():
+            for topic, canonical in mapping.items():
+                groups[(subject, canonical)].append(topic)
+
+        return {
+            key: sorted(topics)
+            for key, topics in sorted(groups.items())
+            if len(topics) > 1
+        }
+
+    def _load(self) -> Dict[str, Dict]:
+        """Mapeo guardado por materia (vacío si no hay, cambió la tolerancia o se pidió refresh)"""
+        if not self.cache_path or self.refresh:
+            return {}
+
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if data.get('version') != TOPIC_CACHE_VERSION or data.get('charsPerEdit') != self.chars_per_edit:
+            return {}
+        return data.get('subjects', {})
+
+    def _save(self, subjects: Dict[str, Dict]) -> None:
+        """Guarda el mapeo (escritura atómica)"""
+        if not self.cache_path:
+            return
+
+        directory = os.path.dirname(self.cache_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': TOPIC_CACHE_VERSION,
+                    'charsPerEdit': self.chars_per_edit,
+                    'subjects': subjects
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+def canonicalizer_for(cache: Any) -> TopicCanonicalizer:
+    """
+    TopicCanonicalizer que comparte directorio y --refresh con un QueryCache
+
+    Args:
+        cache: QueryCache de la corrida, o None (--no-cache: mapeo solo en memoria)
+    """
+    if cache is None:
+        return TopicCanonicalizer()
+    return TopicCanonicalizer(cache.cache_dir, refresh=cache.refresh)
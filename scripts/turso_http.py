@@ -0,0 +1,572 @@
+#!/usr/bin/env python3
+"""
+Cliente HTTP compartido para Turso (API /v2/pipeline, protocolo Hrana)
+
+Todos los scripts de Python que hablan con Turso por HTTP usan este módulo en
+lugar de tener su propio `execute_query`:
+
+- Una única `requests.Session` por cliente, con pool de conexiones keep-alive
+  (se reutiliza la misma conexión TCP+TLS entre queries)
+- Timeouts configurables de conexión y lectura
+- Reintentos con backoff exponencial y jitter ante errores 5xx, 429 y fallas
+  de red (respetando `Retry-After` si el servidor lo envía). Los requests con
+  escrituras solo se reintentan si la conexión falló antes de enviarlos: un
+  timeout de lectura o un 5xx pudo haber llegado después del COMMIT
+- Batching: varios statements en un único request del pipeline, con
+  argumentos posicionales o nombrados y, opcionalmente, dentro de una
+  transacción (`batch`)
+
+Uso:
+    from turso_http import TursoHttpClient
+
+    with TursoHttpClient() as client:
+        rows = client.execute("SELECT id, name FROM User WHERE role = ?", ["STUDENT"])
+
+        results = client.batch([
+            ("UPDATE User SET password = ? WHERE id = ?", [hash_1, id_1]),
+            ("UPDATE User SET password = :pwd WHERE id = :id", {"pwd": hash_2, "id": id_2}),
+        ], transaction=True)
+
+Variables de entorno:
+    TURSO_DATABASE_URL    URL de la base (libsql://, wss:// o https://)
+    TURSO_AUTH_TOKEN      Token de autenticación
+"""
+
+import base64
+import os
+import random
+import re
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Statements que se pueden repetir sin efecto (lecturas y control de transacción)
+_READ_ONLY_SQL = re.compile(r'^\s*(SELECT|WITH|EXPLAIN|VALUES|BEGIN|COMMIT|END|ROLLBACK)\b', re.IGNORECASE)
+_WRITE_SQL = re.compile(r'\b(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE)
+
+
+class TursoError(Exception):
+    """Error devuelto por Turso o por la conexión HTTP"""
+
+
+def get_turso_http_url(database_url: Optional[str] = None) -> str:
+    """
+    Convierte la URL de la base (libsql:// o wss://) a la URL HTTP del pipeline
+
+    Args:
+        database_url: URL de la base. Por defecto TURSO_DATABASE_URL
+
+    Returns:
+        URL terminada en /v2/pipeline
+    """
+    url = database_url or os.environ.get("TURSO_DATABASE_URL")
+    if not url:
+        raise ValueError("TURSO_DATABASE_URL no está configurada")
+
+    url = url.replace("libsql://", "https://").replace("wss://", "https://")
+    if not url.endswith("/v2/pipeline"):
+        url = url.rstrip("/") + "/v2/pipeline"
+    return url
+
+
+def _payload_sql(payload: Dict[str, Any]) -> Iterator[Optional[str]]:
+    """SQL de cada statement de un payload del pipeline (None si no se reconoce)"""
+    for request in payload.get("requests", []):
+        request_type = request.get("type")
+        if request_type == "execute":
+            yield request.get("stmt", {}).get("sql")
+        elif request_type == "batch":
+            for step in request.get("batch", {}).get("steps", []):
+                yield step.get("stmt", {}).get("sql")
+        elif request_type != "close":
+            yield None
+
+
+def is_idempotent(payload: Dict[str, Any]) -> bool:
+    """True si todos los statements del payload son lecturas (repetirlo es seguro)"""
+    return all(
+        sql is not None and _READ_ONLY_SQL.match(sql) and not _WRITE_SQL.search(sql)
+        for sql in _payload_sql(payload)
+    )
+
+
+def request_not_sent(error: requests.RequestException) -> bool:
+    """True si la conexión falló antes de enviar el request (no pudo aplicarse)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    # NewConnectionError es subclase de ConnectTimeoutError
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def encode_value(value: Any) -> Dict[str, Any]:
+    """Convierte un valor de Python al formato de argumento de Hrana"""
+    if value is None:
+        return {"type": "null"}
+    if isinstance(value, (bool, int)):
+        return {"type": "integer", "value": str(int(value))}
+    if isinstance(value, float):
+        return {"type": "float", "value": value}
+    if isinstance(value, bytes):
+        return {"type": "blob", "base64": base64.b64encode(value).decode("ascii")}
+    return {"type": "text", "value": str(value)}
+
+
+def decode_value(value: Any) -> Any:
+    """Convierte un valor de Hrana a su tipo nativo de Python"""
+    if not isinstance(value, dict):
+        return value
+
+    value_type = value.get("type")
+    if value_type == "null":
+        return None
+    if value_type == "integer":
+        return int(value["value"])
+    if value_type == "float":
+        return float(value["value"])
+    if value_type == "blob":
+        return base64.b64decode(value["base64"])
+    return value.get("value")
+
+
+Params = Optional[Union[Sequence[Any], Dict[str, Any]]]
+StatementLike = Union[str, Tuple[str, Params]]
+
+
+def build_statement(sql: str, params: Params = None) -> Dict[str, Any]:
+    """
+    Arma un statement de Hrana
+
+    Args:
+        sql: Query SQL
+        params: Lista de argumentos posicionales (`?`) o dict de argumentos
+            nombrados (`:nombre`, `@nombre` o `$nombre`)
+    """
+    stmt = {"sql": sql}
+    if isinstance(params, dict):
+        stmt["named_args"] = [
+            {"name": name, "value": encode_value(value)}
+            for name, value in params.items()
+        ]
+    elif params:
+        stmt["args"] = [encode_value(p) for p in params]
+    return stmt
+
+
+def normalize_statement(statement: StatementLike) -> Tuple[str, Params]:
+    """Acepta "SQL" o (SQL, params) y devuelve siempre (SQL, params)"""
+    if isinstance(statement, str):
+        return statement, None
+    sql, params = statement
+    return sql, params
+
+
+@dataclass
+class StatementResult:
+    """Resultado de un statement dentro de un batch"""
+    columns: List[str] = field(default_factory=list)
+    rows: List[List[Any]] = field(default_factory=list)
+    affected_row_count: int = 0
+    last_insert_rowid: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @classmethod
+    def from_hrana(cls, result: Dict[str, Any]) -> "StatementResult":
+        """Construye el resultado a partir de un StmtResult de Hrana"""
+        last_insert_rowid = result.get("last_insert_rowid")
+        return cls(
+            columns=[col.get("name") for col in result.get("cols", [])],
+            rows=[[decode_value(value) for value in row] for row in result.get("rows", [])],
+            affected_row_count=result.get("affected_row_count", 0),
+            last_insert_rowid=int(last_insert_rowid) if last_insert_rowid is not None else None
+        )
+
+
+def _decode_column(cells: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Decodifica una columna completa de valores de Hrana
+
+    Los tipos presentes se determinan una sola vez por columna y los enteros y
+    floats se convierten en bloque con `map`, en lugar de inspeccionar cada
+    celda por separado.
+    """
+    types = {cell.get("type") for cell in cells}
+    values = [cell.get("value") for cell in cells]
+
+    if types <= {"text", "null"}:
+        return values
+    if types == {"integer"}:
+        return list(map(int, values))
+    if types == {"float"}:
+        return list(map(float, values))
+    if types == {"integer", "null"}:
+        return [None if value is None else int(value) for value in values]
+    if types <= {"float", "null"}:
+        return [None if value is None else float(value) for value in values]
+
+    # Columnas con tipos mezclados (o blobs): celda por celda
+    return [decode_value(cell) for cell in cells]
+
+
+class RowView(Mapping):
+    """Vista de solo lectura de una fila de un ColumnarResult (sin copiar datos)"""
+
+    __slots__ = ("_result", "_index")
+
+    def __init__(self, result: "ColumnarResult", index: int):
+        self._result = result
+        self._index = index
+
+    def __getitem__(self, name: str) -> Any:
+        return self._result.columns[name][self._index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._result.names)
+
+    def __len__(self) -> int:
+        return len(self._result.names)
+
+    def __repr__(self) -> str:
+        return f"RowView({dict(self)!r})"
+
+
+class ColumnarResult:
+    """
+    Resultado de una query almacenado por columnas
+
+    Los nombres de columna se resuelven una vez y cada columna se decodifica en
+    bloque a una lista de valores nativos. Para quienes necesitan filas, `rows()`
+    devuelve vistas livianas (RowView) y `to_dicts()` materializa dicts.
+
+        result = ColumnarResult.from_hrana(client.execute_raw(query))
+        roles = result.columns["role"]
+        for row in result.rows():
+            print(row["name"])
+    """
+
+    def __init__(self, names: List[str], columns: Dict[str, List[Any]], row_count: int):
+        self.names = names
+        self.columns = columns
+        self.row_count = row_count
+
+    @classmethod
+    def from_hrana(cls, result: Dict[str, Any]) -> "ColumnarResult":
+        """Construye el resultado a partir de un StmtResult de Hrana (cols + rows)"""
+        names = [col.get("name") or f"col_{i}" for i, col in enumerate(result.get("cols", []))]
+        rows = result.get("rows", [])
+
+        # Transponer filas a columnas una sola vez
+        raw_columns = list(zip(*rows)) if rows else [() for _ in names]
+
+        columns = {
+            name: _decode_column(list(cells))
+            for name, cells in zip(names, raw_columns)
+        }
+        return cls(names, columns, len(rows))
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def column(self, name: str) -> List[Any]:
+        """Valores de una columna"""
+        return self.columns[name]
+
+    def rows(self) -> Iterator[RowView]:
+        """Itera las filas como vistas livianas"""
+        for index in range(self.row_count):
+            yield RowView(self, index)
+
+    def tuples(self) -> Iterator[Tuple[Any, ...]]:
+        """Itera las filas como tuplas, en el orden de `names`"""
+        return zip(*(self.columns[name] for name in self.names))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Materializa todas las filas como dicts"""
+        return [dict(zip(self.names, values)) for values in self.tuples()]
+
+
+class TursoHttpClient:
+    """
+    Cliente HTTP reutilizable para Turso
+
+    Cada instancia mantiene su propia sesión (y pool de conexiones). Es seguro
+    reutilizarla para muchas queries; para trabajar desde varios threads a la
+    vez conviene crear un cliente por thread.
+    """
+
+    def __init__(
+        self,
+        database_url: Optional[str] = None,
+        auth_token: Optional[str] = None,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        pool_size: int = 4
+    ):
+        """
+        Args:
+            database_url: URL de la base. Por defecto TURSO_DATABASE_URL
+            auth_token: Token de autenticación. Por defecto TURSO_AUTH_TOKEN
+            connect_timeout: Timeout de conexión en segundos
+            read_timeout: Timeout de lectura en segundos
+            max_retries: Reintentos ante 5xx/429/errores de red (0 = sin reintentos;
+                las escrituras solo se reintentan si el request no llegó a enviarse)
+            backoff_base: Espera base del backoff exponencial en segundos
+            backoff_max: Espera máxima entre reintentos en segundos
+            pool_size: Conexiones keep-alive que mantiene la sesión
+        """
+        auth_token = auth_token or os.environ.get("TURSO_AUTH_TOKEN")
+        if not auth_token:
+            raise ValueError("TURSO_AUTH_TOKEN no está configurada")
+
+        self.url = get_turso_http_url(database_url)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {auth_token}",
+            "Content-Type": "application/json"
+        })
+
+    def __enter__(self) -> "TursoHttpClient":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Cierra la sesión HTTP y sus conexiones"""
+        self.session.close()
+
+    # -------------------------------------------------------------------------
+    # Transporte
+    # -------------------------------------------------------------------------
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Espera antes del próximo intento (full jitter, o Retry-After)"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Envía un payload al pipeline con reintentos
+
+        Un payload con escrituras solo se reintenta si la conexión falló antes
+        de enviarlo; ante un timeout de lectura o un 5xx el servidor pudo
+        haberlo aplicado y repetirlo duplicaría el INSERT/UPDATE.
+
+        Args:
+            payload: Cuerpo del request
+
+        Returns:
+            Cuerpo JSON de la respuesta
+        """
+        attempt = 0
+        idempotent = is_idempotent(payload)
+
+        while True:
+            try:
+                response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries or not (idempotent or request_not_sent(e)):
+                    raise TursoError(f"Error de conexión con Turso: {e}") from e
+                time.sleep(self._backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+
+            if response.status_code in RETRY_STATUS_CODES and idempotent and attempt < self.max_retries:
+                time.sleep(self._backoff_delay(attempt, response.headers.get("Retry-After")))
+                attempt += 1
+                continue
+
+            raise TursoError(f"Error en query: {response.status_code} - {response.text}")
+
+    def pipeline(self, requests_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Envía varios requests de Hrana en un solo round trip
+
+        El stream se cierra al final del pipeline, por lo que no queda estado
+        del lado del servidor entre llamadas.
+
+        Args:
+            requests_list: Requests de Hrana ({"type": "execute", ...}, {"type": "batch", ...})
+
+        Returns:
+            Lista de respuestas, una por request
+
+        Raises:
+            TursoError: Si algún request devolvió error
+        """
+        data = self._post({"requests": requests_list + [{"type": "close"}]})
+        results = data.get("results", [])[:len(requests_list)]
+
+        for result in results:
+            if result.get("type") == "error":
+                raise TursoError(result.get("error", {}).get("message", "Error desconocido"))
+
+        return [result["response"] for result in results]
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def execute_raw(self, sql: str, params: Params = None) -> Dict[str, Any]:
+        """
+        Ejecuta un statement y devuelve el resultado de Hrana sin decodificar
+
+        Returns:
+            Dict con "cols", "rows", "affected_row_count" y "last_insert_rowid"
+        """
+        response = self.pipeline([{"type": "execute", "stmt": build_statement(sql, params)}])[0]
+        return response["result"]
+
+    def execute_columnar(self, sql: str, params: Params = None) -> ColumnarResult:
+        """Ejecuta un statement y devuelve el resultado por columnas"""
+        return ColumnarResult.from_hrana(self.execute_raw(sql, params))
+
+    def execute(self, sql: str, params: Params = None) -> List[List[Any]]:
+        """
+        Ejecuta un statement parametrizado
+
+        Args:
+            sql: Query SQL (con placeholders `?` o `:nombre`)
+            params: Valores posicionales (lista) o nombrados (dict)
+
+        Returns:
+            Lista de filas con valores tipados (int, float, str, bytes, None)
+        """
+        result = self.execute_raw(sql, params)
+        return [[decode_value(value) for value in row] for row in result["rows"]]
+
+    def batch(
+        self,
+        statements: Sequence[StatementLike],
+        transaction: bool = False
+    ) -> List[StatementResult]:
+        """
+        Ejecuta muchos statements en un único request del pipeline
+
+        - transaction=False: cada statement es un `execute` independiente del
+          mismo pipeline; un error en uno no impide que corran los demás.
+        - transaction=True: un request `batch` de Hrana con BEGIN/COMMIT. Cada
+          paso solo corre si el anterior fue exitoso, el COMMIT solo si todos
+          lo fueron y, si algo falla, se hace ROLLBACK (todo o nada). Los
+          statements que no llegaron a ejecutarse se informan con error.
+
+        En ambos casos cuesta un solo round trip.
+
+        Args:
+            statements: Lista de "SQL" o (SQL, params); params puede ser una
+                lista (posicionales) o un dict (nombrados)
+            transaction: Ejecutar todo dentro de una transacción
+
+        Returns:
+            Un StatementResult por statement, en el mismo orden
+        """
+        statements = [normalize_statement(statement) for statement in statements]
+
+        if not statements:
+            return []
+
+        if not transaction:
+            data = self._post({
+                "requests": [
+                    {"type": "execute", "stmt": build_statement(sql, params)}
+                    for sql, params in statements
+                ] + [{"type": "close"}]
+            })
+
+            results = []
+            for result in data.get("results", [])[:len(statements)]:
+                if result.get("type") == "error":
+                    message = result.get("error", {}).get("message", "Error desconocido")
+                    results.append(StatementResult(error=message))
+                else:
+                    results.append(StatementResult.from_hrana(result["response"]["result"]))
+            return results
+
+        steps = [{"stmt": {"sql": "BEGIN"}}]
+        for sql, params in statements:
+            steps.append({
+                "condition": {"type": "ok", "step": len(steps) - 1},
+                "stmt": build_statement(sql, params)
+            })
+
+        commit_step = len(steps)
+        steps.append({
+            "condition": {"type": "ok", "step": commit_step - 1},
+            "stmt": {"sql": "COMMIT"}
+        })
+        steps.append({
+            "condition": {"type": "not", "cond": {"type": "ok", "step": commit_step}},
+            "stmt": {"sql": "ROLLBACK"}
+        })
+
+        response = self.pipeline([{"type": "batch", "batch": {"steps": steps}}])[0]
+        step_results = response["result"]["step_results"]
+        step_errors = response["result"]["step_errors"]
+        committed = step_results[commit_step] is not None
+
+        first_error = next(
+            (error.get("message", "Error desconocido") for error in step_errors if error),
+            "Transacción revertida"
+        )
+
+        results = []
+        for index in range(1, commit_step):
+            if step_errors[index]:
+                results.append(StatementResult(error=step_errors[index].get("message", "Error desconocido")))
+            elif not committed:
+                results.append(StatementResult(error=f"ROLLBACK: {first_error}"))
+            else:
+                results.append(StatementResult.from_hrana(step_results[index]))
+        return results
+
+    def transaction(self, statements: Sequence[StatementLike]) -> bool:
+        """
+        Ejecuta varios statements en una sola transacción y un solo round trip
+
+        Args:
+            statements: Lista de "SQL" o (SQL, params)
+
+        Returns:
+            True si la transacción se confirmó (COMMIT)
+
+        Raises:
+            TursoError: Si algún statement falló (la transacción se revirtió)
+        """
+        results = self.batch(statements, transaction=True)
+
+        for result in results:
+            if not result.ok:
+                raise TursoError(f"Transacción revertida: {result.error}")
+
+        return True
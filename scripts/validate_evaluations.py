@@ -7,27 +7,38 @@ This script checks if evaluations are assigned to the correct students based on:
 - Sede (location) consistency
 
 Usage:
-    python3 scripts/validate_evaluations.py [--fix-mode]
+    python3 scripts/validate_evaluations.py [--fix-mode] [--refresh] [--exact-topics]
 
 Options:
-    --fix-mode    Enable interactive mode to fix misassigned evaluations
+    --fix-mode      Enable interactive mode to fix misassigned evaluations
+    --refresh       Ignore the query cache and re-download User/Evaluation
+    --exact-topics  Don't canonicalize near-duplicate exam topics
+
+Query results are cached on disk (see query_cache.py) and invalidated when the
+User or Evaluation tables change, so repeated runs don't hit the network.
+
+Exam topics are canonicalized per subject (see topic_index.py): issues carry
+the canonical topic, and topic variants (typos) are listed for cleanup.
 """
 
+import argparse
 import os
 import sys
 import json
 import re
-from typing import List, Dict, Optional, Tuple
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
 try:
-    import libsql_experimental as libsql
+    from query_cache import CachedTursoClient, QueryCache, add_cache_arguments, cache_from_args
 except ImportError:
-    print("Error: libsql_experimental not installed")
-    print("Install with: pip3 install libsql-experimental")
+    print("Error: requests not installed")
+    print("Install with: pip3 install -r scripts/requirements.txt")
     sys.exit(1)
 
+from topic_index import TopicCanonicalizer, canonicalizer_for
+
 
 @dataclass
 class Student:
@@ -65,17 +76,18 @@ class ValidationIssue:
     score: int
     issue_type: str  # "year_mismatch", "division_mismatch", "sede_mismatch"
     details: str
+    canonical_topic: str = ''  # exam_topic with typos merged (see topic_index.py)
 
 
-def get_db_connection():
-    """Create database connection using environment variables."""
+def get_db_connection(cache: Optional[QueryCache] = None) -> CachedTursoClient:
+    """Create database client using environment variables."""
     url = os.getenv('TURSO_DATABASE_URL')
     auth_token = os.getenv('TURSO_AUTH_TOKEN')
 
     if not url or not auth_token:
         raise ValueError("TURSO_DATABASE_URL and TURSO_AUTH_TOKEN must be set")
 
-    return libsql.connect(database=url, auth_token=auth_token)
+    return CachedTursoClient(url, auth_token, cache=cache)
 
 
 def parse_subject(subject: str) -> Tuple[Optional[str], Optional[str]]:
@@ -104,18 +116,17 @@ def parse_subject(subject: str) -> Tuple[Optional[str], Optional[str]]:
     return None, None
 
 
-def fetch_all_students(conn) -> List[Student]:
+def fetch_all_students(conn: CachedTursoClient) -> List[Student]:
     """Fetch all students from the database."""
-    cursor = conn.cursor()
-    cursor.execute("""
+    rows = conn.execute("""
         SELECT id, name, studentId, sede, academicYear, division, email
         FROM User
         WHERE role = 'STUDENT'
         ORDER BY academicYear, division, name
-    """)
+    """, depends_on=('User',))
 
     students = []
-    for row in cursor.fetchall():
+    for row in rows:
         students.append(Student(
             id=row[0],
             name=row[1],
@@ -129,17 +140,16 @@ def fetch_all_students(conn) -> List[Student]:
     return students
 
 
-def fetch_all_evaluations(conn) -> List[Evaluation]:
+def fetch_all_evaluations(conn: CachedTursoClient) -> List[Evaluation]:
     """Fetch all evaluations from the database."""
-    cursor = conn.cursor()
-    cursor.execute("""
+    rows = conn.execute("""
         SELECT id, studentId, subject, examDate, examTopic, score, createdBy, createdAt
         FROM Evaluation
         ORDER BY examDate DESC
-    """)
+    """, depends_on=('Evaluation',))
 
     evaluations = []
-    for row in cursor.fetchall():
+    for row in rows:
         evaluations.append(Evaluation(
             id=row[0],
             student_id=row[1],
@@ -156,16 +166,25 @@ def fetch_all_evaluations(conn) -> List[Evaluation]:
 
 def validate_evaluations(
     students: List[Student],
-    evaluations: List[Evaluation]
+    evaluations: List[Evaluation],
+    topics: Optional[TopicCanonicalizer] = None
 ) -> List[ValidationIssue]:
     """
     Validate all evaluations against student data.
 
+    Args:
+        students: All students
+        evaluations: All evaluations
+        topics: Fitted topic canonicalizer (None = canonical topic is the exam topic)
+
     Returns list of validation issues found.
     """
     # Create student lookup by ID
     student_by_id = {s.id: s for s in students}
 
+    def canonical_topic(eval: Evaluation) -> str:
+        return topics.canonical(eval.subject, eval.exam_topic) if topics else eval.exam_topic
+
     issues = []
 
     for eval in evaluations:
@@ -184,7 +203,8 @@ def validate_evaluations(
                 exam_date=eval.exam_date,
                 score=eval.score,
                 issue_type="student_not_found",
-                details=f"Student ID {eval.student_id} not found in database"
+                details=f"Student ID {eval.student_id} not found in database",
+                canonical_topic=canonical_topic(eval)
             ))
             continue
 
@@ -227,7 +247,8 @@ def validate_evaluations(
                 exam_date=eval.exam_date,
                 score=eval.score,
                 issue_type=", ".join(issue_types),
-                details="; ".join(issue_details)
+                details="; ".join(issue_details),
+                canonical_topic=canonical_topic(eval)
             ))
 
     return issues
@@ -263,6 +284,8 @@ def print_summary(issues: List[ValidationIssue]):
             print(f"  Exam Subject: {issue.subject}")
             print(f"  Expected Course: {issue.expected_course}")
             print(f"  Exam Topic: {issue.exam_topic}")
+            if issue.canonical_topic and issue.canonical_topic != issue.exam_topic:
+                print(f"  Canonical Topic: {issue.canonical_topic}")
             print(f"  Date: {issue.exam_date} | Score: {issue.score}")
             print(f"  Details: {issue.details}")
 
@@ -272,6 +295,24 @@ def print_summary(issues: List[ValidationIssue]):
     print("\n" + "=" * 80)
 
 
+def print_topic_variants(topics: TopicCanonicalizer):
+    """Print exam topics that were merged into one canonical topic."""
+    variants = topics.variants()
+    if not variants:
+        return
+
+    print("\n" + "=" * 80)
+    print("TOPIC VARIANTS")
+    print("=" * 80)
+    print(f"\n🔤 {len(variants)} topics have more than one spelling:\n")
+
+    for (subject, canonical), spellings in variants.items():
+        others = [topic for topic in spellings if topic != canonical]
+        print(f"  {subject} - {canonical}: {', '.join(repr(topic) for topic in others)}")
+
+    print("\n" + "=" * 80)
+
+
 def export_issues_to_json(issues: List[ValidationIssue], filename: str = "evaluation_issues.json"):
     """Export issues to JSON file for further analysis."""
     data = []
@@ -284,6 +325,7 @@ def export_issues_to_json(issues: List[ValidationIssue], filename: str = "evalua
             "expected_course": issue.expected_course,
             "subject": issue.subject,
             "exam_topic": issue.exam_topic,
+            "canonical_topic": issue.canonical_topic,
             "exam_date": issue.exam_date,
             "score": issue.score,
             "issue_type": issue.issue_type,
@@ -299,13 +341,22 @@ def export_issues_to_json(issues: List[ValidationIssue], filename: str = "evalua
 
 def main():
     """Main execution function."""
+    parser = argparse.ArgumentParser(description="Validate evaluation assignments")
+    parser.add_argument('--fix-mode', action='store_true',
+                        help='Enable interactive mode to fix misassigned evaluations')
+    parser.add_argument('--exact-topics', action='store_true',
+                        help="Don't canonicalize near-duplicate exam topics")
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    cache = cache_from_args(args)
+
     print("🔍 Intellego Platform - Evaluation Validator")
     print("=" * 80)
 
     # Connect to database
     print("\n📡 Connecting to database...")
     try:
-        conn = get_db_connection()
+        conn = get_db_connection(cache)
     except Exception as e:
         print(f"❌ Failed to connect to database: {e}")
         sys.exit(1)
@@ -320,13 +371,22 @@ def main():
     print("\n📥 Fetching evaluations...")
     evaluations = fetch_all_evaluations(conn)
     print(f"✅ Loaded {len(evaluations)} evaluations")
+    if cache:
+        print(f"💾 Query cache: {cache.hits} hits, {cache.misses} downloads ({cache.cache_dir})")
+
+    # Canonical topics per subject
+    topics = None
+    if not args.exact_topics:
+        topics = canonicalizer_for(cache).fit((e.subject, e.exam_topic) for e in evaluations)
 
     # Validate
     print("\n🔍 Validating evaluations...")
-    issues = validate_evaluations(students, evaluations)
+    issues = validate_evaluations(students, evaluations, topics)
 
     # Print results
     print_summary(issues)
+    if topics:
+        print_topic_variants(topics)
 
     # Export to JSON
     if issues:
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Claves de semana canónicas - Intellego Platform
+
+En la base conviven dos formatos de weekStart: fechas ('2025-08-11') y
+timestamps UTC ('2025-11-10T03:00:00.000Z' = lunes 00:00 en Argentina).
+Comparados como strings, la misma semana cuenta dos veces y el orden depende
+del formato.
+
+Este módulo convierte cualquier weekStart (una sola vez, al ingresar la fila)
+en un entero: el número de semana lunes-a-domingo en hora de Argentina,
+contado desde 0001-01-01 (que fue lunes). Ordenar, agrupar, contar semanas
+distintas y filtrar rangos pasa a ser aritmética de enteros.
+
+Misma convención que src/lib/timezone-utils.ts (getWeekStartInArgentina):
+semanas que empiezan el lunes y offset fijo UTC-3 (Argentina no usa horario
+de verano).
+
+Uso:
+    from week_keys import week_key, week_label
+
+    key = week_key('2025-11-10T03:00:00.000Z')   # 105652
+    week_label(key)                              # '2025-11-10'
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Optional
+
+ARGENTINA_TZ = timezone(timedelta(hours=-3), 'America/Argentina/Buenos_Aires')
+
+# Timestamps numéricos mayores a esto se interpretan en milisegundos (Prisma)
+_EPOCH_MS_THRESHOLD = 10 ** 11
+
+
+def local_date(value: Any) -> Optional[date]:
+    """
+    Fecha calendario en Argentina de un weekStart en cualquier formato
+
+    Acepta 'YYYY-MM-DD', ISO 8601 con hora (con o sin zona; sin zona se asume
+    UTC, como guarda SQLite), epoch en segundos o milisegundos, date y datetime.
+
+    Raises:
+        ValueError: Si el valor no se puede interpretar como fecha
+    """
+    if value is None or value == '':
+        return None
+
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        return value
+    elif isinstance(value, (int, float)):
+        seconds = value / 1000 if abs(value) >= _EPOCH_MS_THRESHOLD else value
+        moment = datetime.fromtimestamp(seconds, tz=timezone.utc)
+    elif isinstance(value, str):
+        return _parse_local_date(value.strip())
+    else:
+        raise ValueError(f"weekStart inválido: {value!r}")
+
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(ARGENTINA_TZ).date()
+
+
+@lru_cache(maxsize=8192)
+def _parse_local_date(text: str) -> date:
+    """Parseo de strings cacheado (los mismos weekStart se repiten en miles de filas)"""
+    if len(text) == 10:
+        return date.fromisoformat(text)
+
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    moment = datetime.fromisoformat(text.replace(' ', 'T', 1))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(ARGENTINA_TZ).date()
+
+
+def week_key_for_date(day: date) -> int:
+    """Número de semana (lunes a domingo) que contiene `day`"""
+    return (day.toordinal() - 1) // 7
+
+
+def week_key(value: Any) -> Optional[int]:
+    """
+    Clave entera de la semana de un weekStart en cualquier formato
+
+    Returns:
+        Entero creciente con la semana, o None si el valor es nulo
+
+    Raises:
+        ValueError: Si el valor no se puede interpretar como fecha
+    """
+    day = local_date(value)
+    return None if day is None else week_key_for_date(day)
+
+
+def week_start_date(key: int) -> date:
+    """Lunes de la semana `key`"""
+    return date.fromordinal(key * 7 + 1)
+
+
+def week_label(key: Optional[int]) -> Optional[str]:
+    """Lunes de la semana `key` como 'YYYY-MM-DD' (formato canónico de salida)"""
+    return None if key is None else week_start_date(key).isoformat()
+
+
+def sql_week_key(column: str) -> str:
+    """
+    Expresión SQLite equivalente a week_key() para agregados server-side
+
+    Fechas 'YYYY-MM-DD' se toman como fecha local; timestamps ISO se pasan a
+    UTC-3; enteros se interpretan como epoch en milisegundos.
+
+    Args:
+        column: Columna o expresión SQL con el weekStart (por ejemplo 'f.weekStart')
+    """
+    local = (
+        f"CASE"
+        f" WHEN typeof({column}) = 'integer' THEN date({column} / 1000, 'unixepoch', '-3 hours')"
+        f" WHEN length({column}) = 10 THEN {column}"
+        f" ELSE date({column}, '-3 hours')"
+        f" END"
+    )
+    return f"CAST((julianday({local}) - julianday('0001-01-01')) / 7 AS INTEGER)"